@@ -0,0 +1,174 @@
+"""
+测量下载写入路径的吞吐量和CPU开销
+
+在另一个进程中启动本机HTTP服务器（用sendfile发送，不限速），分别用原来的写入方式
+（iter_content逐块读取、每块新分配bytes、追加写入）和ResumableDownloader的不同
+读取大小、刷盘策略下载同一个文件，报告速度（MB/s）和每GB数据消耗的CPU时间
+（本进程所有线程的用户态加内核态时间，不含服务器进程）。
+
+用法:
+    python benchmarks/download_throughput.py [--size 256] [--repeat 3]
+"""
+import os
+import sys
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from modules.http_session import HttpSessionPool
+from modules.host_policy import HostPolicy
+from modules.downloader import ResumableDownloader
+
+GB = 1024 * 1024 * 1024
+MB = 1024 * 1024
+
+
+def make_handler(path):
+    size = os.path.getsize(path)
+    etag = f'"{size:x}-{int(os.path.getmtime(path)):x}"'
+
+    class FileHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            start, end = 0, size - 1
+            status = 200
+            range_header = self.headers.get('Range')
+            if_range = self.headers.get('If-Range')
+            if range_header and (if_range is None or if_range == etag):
+                first, _, last = range_header[len('bytes='):].partition('-')
+                start = int(first)
+                end = min(int(last) if last else size - 1, size - 1)
+                status = 206
+
+            self.send_response(status)
+            self.send_header('Content-Type', 'audio/flac')
+            self.send_header('Content-Length', str(end - start + 1))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('ETag', etag)
+            if status == 206:
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+            self.end_headers()
+            self.wfile.flush()
+
+            with open(path, 'rb') as f:
+                try:
+                    self.connection.sendfile(f, start, end - start + 1)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+    return FileHandler
+
+
+def serve(path, port_queue):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(path))
+    server.daemon_threads = True
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def cpu_time():
+    times = os.times()
+    return times.user + times.system
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(MB), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_content_download(url, target, chunk_size):
+    """原来的写入方式：每块数据新分配bytes，追加写入并计算哈希"""
+    digest = hashlib.sha256()
+    with requests.get(url, headers={'Accept-Encoding': 'identity'}, stream=True) as response:
+        response.raise_for_status()
+        with open(target, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    f.write(chunk)
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def downloader_download(url, target, chunk_size, fsync):
+    http = HttpSessionPool(pool_size=1)
+    downloader = ResumableDownloader(
+        http, HostPolicy(rate=100, burst=100), max_segments=1, chunk_size=chunk_size, fsync=fsync
+    )
+    try:
+        return downloader.download(url, target)[1]
+    finally:
+        http.close()
+
+
+def measure(label, download, target, size, expected, repeat):
+    best_elapsed = best_cpu = None
+    for _ in range(repeat):
+        began, cpu_began = time.perf_counter(), cpu_time()
+        digest = download(target)
+        elapsed, cpu = time.perf_counter() - began, cpu_time() - cpu_began
+        assert digest == expected and file_digest(target) == expected, "下载的文件与原文件不一致"
+        os.remove(target)
+        if best_elapsed is None or elapsed < best_elapsed:
+            best_elapsed, best_cpu = elapsed, cpu
+    print(f"{label:<32} {size / best_elapsed / MB:8.1f} MB/s  {best_cpu / (size / GB):6.2f} CPU秒/GB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=256, help="文件大小（MB）")
+    parser.add_argument('--repeat', type=int, default=3, help="每种方式重复次数，取最快的一次")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='download-throughput-')
+    server = None
+    try:
+        source = os.path.join(workdir, 'source.flac')
+        with open(source, 'wb') as f:
+            for _ in range(args.size):
+                f.write(os.urandom(MB))
+        expected = file_digest(source)
+        size = os.path.getsize(source)
+
+        port_queue = multiprocessing.Queue()
+        server = multiprocessing.Process(target=serve, args=(source, port_queue), daemon=True)
+        server.start()
+        url = f'http://127.0.0.1:{port_queue.get()}/source.flac'
+        target = os.path.join(workdir, 'target.flac')
+
+        print(f"文件大小: {args.size} MB，每种方式 {args.repeat} 次取最快")
+        cases = [
+            ("iter_content 8KB", lambda path: iter_content_download(url, path, 8 * 1024)),
+            ("iter_content 64KB", lambda path: iter_content_download(url, path, 64 * 1024)),
+        ]
+        for chunk_size in (64 * 1024, MB, 4 * MB):
+            cases.append((f"readinto {chunk_size // 1024}KB, fsync=end",
+                          lambda path, chunk_size=chunk_size: downloader_download(
+                              url, path, chunk_size, ResumableDownloader.FSYNC_END)))
+        for fsync in (ResumableDownloader.FSYNC_NONE, ResumableDownloader.FSYNC_JOURNAL):
+            cases.append((f"readinto 1024KB, fsync={fsync}",
+                          lambda path, fsync=fsync: downloader_download(url, path, MB, fsync)))
+
+        for label, download in cases:
+            measure(label, download, target, size, expected, args.repeat)
+    finally:
+        if server is not None:
+            server.terminate()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
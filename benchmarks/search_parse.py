@@ -0,0 +1,101 @@
+"""
+测量解析大的搜索响应取一页结果的耗时和内存
+
+生成一个包含大量歌曲的搜索响应，分别用原来的方式（response.json()解析整个响应，
+提取所有歌曲的信息后取前20条）和边接收边解析、取到一页后停止的方式处理，
+报告耗时、解析时内存的峰值和实际读取的数据量。
+
+用法:
+    python benchmarks/search_parse.py [--items 50000] [--repeat 5]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.online_music_manager import OnlineMusicManager
+
+PAGE_SIZE = 20
+
+
+class FakeResponse:
+    """只提供解析需要的接口，记录读取了多少数据"""
+
+    def __init__(self, body):
+        self.body = body
+        self.consumed = 0
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.body), chunk_size):
+            chunk = self.body[i:i + chunk_size]
+            self.consumed += len(chunk)
+            yield chunk
+
+    def json(self):
+        self.consumed = len(self.body)
+        return json.loads(self.body)
+
+
+def parse_whole(manager, response):
+    """原来的方式：解析整个响应，提取所有歌曲后取前20条"""
+    data = response.json()
+    results = []
+    for item in data["songs"]:
+        result = manager._extract_music_info(item)
+        if result:
+            results.append(result)
+    return results[:PAGE_SIZE]
+
+
+def parse_streaming(manager, response):
+    return manager._parse_api_response(response, PAGE_SIZE)
+
+
+def measure(label, parse, manager, body, repeat):
+    best = None
+    for _ in range(repeat):
+        response = FakeResponse(body)
+        began = time.perf_counter()
+        results = parse(manager, response)
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+
+    response = FakeResponse(body)
+    tracemalloc.start()
+    parse(manager, response)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert [r['title'] for r in results] == [f"歌曲{i}" for i in range(PAGE_SIZE)]
+    print(f"{label:<12} {best * 1000:8.2f} ms  内存峰值 {peak / 1024 / 1024:7.2f} MB  "
+          f"读取 {response.consumed / 1024:9.0f} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=50000, help="响应中的歌曲数")
+    parser.add_argument('--repeat', type=int, default=5, help="重复次数，取最快的一次")
+    args = parser.parse_args()
+
+    songs = [
+        {"name": f"歌曲{i}", "singer": ["歌手甲", "歌手乙"], "time": "04:01",
+         "songid": i, "url": f"https://music.example.com/{i}.mp3", "album": f"专辑{i % 97}"}
+        for i in range(args.items)
+    ]
+    body = json.dumps({"code": 0, "total": args.items, "songs": songs}, ensure_ascii=False).encode('utf-8')
+
+    manager = OnlineMusicManager()
+    try:
+        print(f"响应大小: {len(body) / 1024 / 1024:.1f} MB（{args.items} 首），取前 {PAGE_SIZE} 条")
+        measure("整个解析", parse_whole, manager, body, args.repeat)
+        measure("边接收边解析", parse_streaming, manager, body, args.repeat)
+    finally:
+        manager.close()
+
+
+if __name__ == '__main__':
+    main()
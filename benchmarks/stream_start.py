@@ -0,0 +1,129 @@
+"""
+测量"立即播放"从点击到开始出声的耗时
+
+在本机启动一个每个连接限速的HTTP服务器，提供一个WAV文件，用OnlineMusicManager.stream_music
+边下载边播放，记录缓冲足够的时刻、pygame开始出声的时刻和播放中因缓冲不足暂停的次数，
+并与下载完成的时刻（普通下载最早能开始播放的时刻）比较。下载完成后核对文件内容。
+
+默认使用SDL的disk音频驱动（输出到/dev/null），不需要声卡；--audio使用系统的音频设备。
+
+用法:
+    python benchmarks/stream_start.py [--seconds 60] [--rate 0.5] [--audio]
+"""
+import os
+import sys
+import math
+import time
+import array
+import wave
+import shutil
+import argparse
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.segmented_download import make_handler, file_digest
+from modules.online_music_manager import OnlineMusicManager
+from modules.download_manifest import DownloadManifest
+
+
+def write_tone(path, seconds, rate=44100):
+    """生成一个双声道16位的正弦波WAV文件"""
+    period = array.array('h', (int(8000 * math.sin(2 * math.pi * 440 * i / rate)) for i in range(rate // 440 * 10)))
+    frames = array.array('h')
+    for sample in period:
+        frames.extend((sample, sample))
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        block = frames.tobytes()
+        repeat = seconds * rate // (len(period))
+        for _ in range(repeat):
+            f.writeframes(block)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=int, default=60, help="音频长度（秒）")
+    parser.add_argument('--rate', type=float, default=0.5, help="每个连接的限速（MB/s）")
+    parser.add_argument('--audio', action='store_true', help="使用系统的音频设备播放")
+    args = parser.parse_args()
+
+    if not args.audio:
+        os.environ.setdefault('SDL_AUDIODRIVER', 'disk')
+        os.environ.setdefault('SDL_DISKAUDIOFILE', os.devnull)
+    import pygame
+    pygame.mixer.init()
+
+    workdir = tempfile.mkdtemp(prefix='stream-start-')
+    manager = None
+    try:
+        source = os.path.join(workdir, 'source.wav')
+        write_tone(source, args.seconds)
+        expected = file_digest(source)
+        size = os.path.getsize(source)
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(source, args.rate * 1024 * 1024))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        manager = OnlineMusicManager()
+        # 不使用用户目录中的下载记录
+        manager.manifest.close()
+        manager.manifest = DownloadManifest(':memory:')
+        music_info = {
+            'id': f'{time.time():.0f}', 'source': 'benchmark', 'title': 'tone', 'artist': 'benchmark',
+            'url': f'http://127.0.0.1:{server.server_address[1]}/source.wav',
+        }
+        print(f"文件大小: {size / 1024 / 1024:.1f} MB（{args.seconds} 秒），每个连接限速 {args.rate} MB/s")
+
+        download_folder = os.path.join(workdir, 'downloads')
+        job, stream = manager.stream_music(music_info, download_folder)
+        while not stream.ready:
+            if stream.error is not None:
+                raise stream.error
+            time.sleep(0.005)
+
+        reader = stream.open()
+        pygame.mixer.music.load(reader)
+        pygame.mixer.music.play()
+        while pygame.mixer.music.get_pos() <= 0:
+            time.sleep(0.005)
+        first_sound = time.perf_counter() - pygame.mixer.music.get_pos() / 1000.0
+
+        # 与播放器相同的水位检查，直到下载完成
+        stalls = 0
+        stalled = False
+        while not job.future.done():
+            position = reader.tell()
+            if stalled and stream.can_resume(position):
+                pygame.mixer.music.unpause()
+                stalled = False
+            elif not stalled and stream.should_pause(position):
+                pygame.mixer.music.pause()
+                stalled = True
+                stalls += 1
+            time.sleep(0.1)
+        file_path = job.future.result()
+        downloaded = time.perf_counter()
+        pygame.mixer.music.stop()
+        reader.close()
+
+        assert file_digest(file_path) == expected, "下载的文件与原文件不一致"
+        print(f"立即播放: 缓冲 {(stream.ready_at - stream.requested_at) * 1000:.0f} ms，"
+              f"{(first_sound - stream.requested_at) * 1000:.0f} ms 后开始出声，"
+              f"播放中缓冲不足暂停 {stalls} 次")
+        print(f"下载完成: {(downloaded - stream.requested_at) * 1000:.0f} ms（先下载再播放最早在这时开始）")
+        server.shutdown()
+    finally:
+        if manager is not None:
+            manager.close()
+        pygame.mixer.quit()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+比较播放列表使用完整路径字符串列表和TrackStore时的内存占用，
+以及播放器按路径保存元数据字典和按歌曲ID保存（TrackMetadata）时的内存占用
+
+用法:
+    python benchmarks/track_store_memory.py [--tracks 1000000]
+
+内存使用tracemalloc统计，开启后分配速度会明显变慢，100万首歌需要几分钟。
+"""
+import os
+import sys
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.track_store import TrackStore
+from modules.playlist import Playlist
+from modules.track_metadata import TrackMetadata
+
+
+def generate_paths(count, files_per_dir=40):
+    """生成类似真实音乐库的路径：较长的公共前缀，按艺术家/专辑分目录"""
+    root = os.path.join(os.sep, "home", "user", "Music", "Library")
+    for i in range(count):
+        artist = i // (files_per_dir * 5)
+        album = i // files_per_dir
+        yield os.path.join(
+            root, f"Artist {artist:05d}", f"Album {album:06d} (Deluxe Edition)",
+            f"{i % files_per_dir + 1:02d} - Artist {artist:05d} - Track Title {i:07d}.mp3"
+        )
+
+
+def measure(label, build):
+    tracemalloc.start()
+    result = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} 常驻 {current / 1024 / 1024:8.1f} MB   峰值 {peak / 1024 / 1024:8.1f} MB")
+    return result, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tracks', type=int, default=1000000, help="歌曲数量")
+    args = parser.parse_args()
+
+    print(f"歌曲数量: {args.tracks}")
+
+    paths, list_size = measure("路径字符串列表", lambda: list(generate_paths(args.tracks)))
+    del paths
+
+    store, store_size = measure("TrackStore", lambda: _build_store(args.tracks))
+    del store
+
+    playlist, playlist_size = measure("Playlist (含TrackStore)", lambda: Playlist(generate_paths(args.tracks)))
+    # 确认路径按需拼接后与原路径一致
+    samples = {0, args.tracks // 2, args.tracks - 1}
+    for index, path in enumerate(generate_paths(args.tracks)):
+        if index in samples:
+            assert playlist[index] == path
+
+    print(f"TrackStore 内存为字符串列表的 {store_size / list_size:.0%}，"
+          f"完整播放列表为 {playlist_size / list_size:.0%}")
+
+    # 元数据只统计播放器额外保存的部分，路径已在播放列表的TrackStore中
+    store = playlist.store
+    dicts, dict_size = measure("元数据字典（按路径）", lambda: {
+        path: metadata for path, metadata in generate_metadata(args.tracks)
+    })
+    del dicts
+    columns, column_size = measure("TrackMetadata", lambda: _build_metadata(store, args.tracks))
+    assert columns.get(store.path(0)) == (generate_title(0), generate_artist(0), 240.0)
+    print(f"TrackMetadata 内存为元数据字典的 {column_size / dict_size:.0%}")
+
+
+def generate_title(i):
+    return f"Track Title {i:07d}"
+
+
+def generate_artist(i):
+    return f"Artist {i // 200:05d}"
+
+
+def generate_metadata(count):
+    """与generate_paths对应的标签，时长统一为4分钟"""
+    for i, path in enumerate(generate_paths(count)):
+        yield path, {'title': generate_title(i), 'artist': generate_artist(i), 'album': None, 'duration': 240.0}
+
+
+def _build_metadata(store, count, batch_size=4096):
+    # 与播放器一样分批写入
+    metadata = TrackMetadata(store)
+    batch = {}
+    for path, info in generate_metadata(count):
+        batch[path] = info
+        if len(batch) >= batch_size:
+            metadata.update(batch)
+            batch = {}
+    metadata.update(batch)
+    return metadata
+
+
+def _build_store(count):
+    store = TrackStore()
+    store.add_many(generate_paths(count))
+    return store
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import os
+import json
+import stat
+import time
+import tempfile
+import threading
+
+
+class ConfigStore:
+    """
+    配置存储
+
+    配置在启动时读入内存，之后的读取都不访问磁盘。save() 只标记配置已修改，
+    由后台线程合并写入：两次写入之间至少间隔 min_interval 秒，拖动音量条等
+    连续的修改只会写一次。写入时先写临时文件再原子替换，写到一半时崩溃也不会
+    损坏原来的配置文件。close() 会把尚未写入的修改立即写入。
+    """
+
+    def __init__(self, path, defaults=None, min_interval=1.0, fsync=False):
+        """
+        Args:
+            path: 配置文件路径
+            defaults: 默认配置，配置文件中缺少的项使用默认值
+            min_interval: 两次写入之间的最小间隔（秒）
+            fsync: 为True时替换前把数据刷到磁盘
+        """
+        self.path = path
+        self.min_interval = min_interval
+        self.fsync = fsync
+
+        # 配置文件在启动时是否存在
+        self.existed = os.path.exists(path)
+        self._data = dict(defaults or {})
+        if self.existed:
+            self._data.update(self._load())
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._last_write = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                return data
+            print(f"配置文件格式错误: {self.path}")
+        except (OSError, ValueError) as e:
+            print(f"读取配置文件失败: {str(e)}")
+        return {}
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = value
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def save(self):
+        """标记配置已修改，由后台线程稍后写入"""
+        with self._lock:
+            self._dirty = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            if self._stop.is_set():
+                return
+            # 距离上次写入不足最小间隔时先等待，期间的修改合并到同一次写入
+            delay = self._last_write + self.min_interval - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                return
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """立即写入尚未保存的修改"""
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                text = json.dumps(self._data, ensure_ascii=False, indent=4)
+                self._dirty = False
+            try:
+                self._write(text)
+            except OSError as e:
+                print(f"保存配置文件失败: {str(e)}")
+                with self._lock:
+                    self._dirty = True
+            self._last_write = time.monotonic()
+
+    def _file_mode(self):
+        """配置文件应有的权限：沿用原文件的权限，文件不存在时按umask创建普通文件的权限"""
+        try:
+            return stat.S_IMODE(os.stat(self.path).st_mode)
+        except OSError:
+            umask = os.umask(0)
+            os.umask(umask)
+            return 0o666 & ~umask
+
+    def _write(self, text):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(prefix='.config-', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            # mkstemp创建的文件权限为0600，替换前改成原配置文件的权限
+            os.chmod(temp_path, self._file_mode())
+            os.replace(temp_path, self.path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+        if self.fsync and hasattr(os, 'O_DIRECTORY'):
+            # 同时刷新目录项，保证替换本身也已落盘
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def close(self):
+        """停止后台线程并写入尚未保存的修改"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+        self.flush()
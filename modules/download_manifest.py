@@ -0,0 +1,157 @@
+import os
+import time
+import sqlite3
+import threading
+from modules.library_index import DEFAULT_CACHE_DIR
+
+
+class DownloadManifest:
+    """
+    下载记录
+
+    按"来源:歌曲ID"记录每首歌下载到的路径、文件大小和内容的SHA-256，并按哈希建立索引。
+    同一首歌再次下载时直接返回已下载的文件；内容相同的文件只保留一份。
+    未完成的下载也会记录路径，再次下载时使用同一路径，从.part文件继续。
+
+    文件名通过独占创建 文件名.part 预留：所有下载都先创建自己的.part文件，
+    创建成功才使用这个文件名，同时进行的下载不会选中同一个文件名。
+    """
+
+    PART_SUFFIX = '.part'
+
+    def __init__(self, db_path=None):
+        if db_path is None:
+            db_path = os.path.join(DEFAULT_CACHE_DIR, "downloads.db")
+
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # (目录, 文件名) -> 上次使用的编号，重名较多时不必从(1)开始逐个尝试
+        self._next_suffix = {}
+
+        try:
+            if db_path != ":memory:":
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        except (OSError, sqlite3.Error) as e:
+            print(f"无法打开下载记录 {db_path}: {str(e)}")
+            self.db_path = ":memory:"
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS downloads ("
+                "key TEXT PRIMARY KEY, path TEXT, size INTEGER, sha256 TEXT, "
+                "complete INTEGER, updated REAL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_downloads_sha256 ON downloads(sha256)"
+            )
+
+    def _get(self, key):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT path, size, complete FROM downloads WHERE key = ?", (key,)
+            ).fetchone()
+
+    @staticmethod
+    def _is_intact(path, size):
+        try:
+            return os.path.getsize(path) == size
+        except OSError:
+            return False
+
+    def find_complete(self, key):
+        """
+        查找已下载完成且文件仍然存在的歌曲
+
+        Returns:
+            str: 文件路径，没有时返回None
+        """
+        row = self._get(key)
+        if row and row[2] and self._is_intact(row[0], row[1]):
+            return row[0]
+        return None
+
+    def find_partial(self, key):
+        """
+        查找未完成的下载
+
+        Returns:
+            str: 上次使用的目标路径（其.part文件仍然存在），没有时返回None
+        """
+        row = self._get(key)
+        if row and not row[2] and os.path.exists(row[0] + self.PART_SUFFIX):
+            return row[0]
+        return None
+
+    def find_by_hash(self, sha256, size):
+        """
+        查找内容相同且文件仍然存在的已下载文件
+
+        Returns:
+            str: 文件路径，没有时返回None
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT path FROM downloads WHERE sha256 = ? AND size = ? AND complete = 1",
+                (sha256, size)
+            ).fetchall()
+        for (path,) in rows:
+            if self._is_intact(path, size):
+                return path
+        return None
+
+    def reserve_path(self, folder, filename):
+        """
+        预留一个不与现有文件重名的路径：独占创建其.part文件
+
+        Args:
+            folder: 目录
+            filename: 期望的文件名，已被使用时依次尝试 名称(1)、名称(2)……
+
+        Returns:
+            str: 预留的路径，调用方负责写入或删除其.part文件
+        """
+        base_name, ext = os.path.splitext(os.path.join(folder, filename))
+        hint_key = (os.path.abspath(folder), filename)
+        with self._lock:
+            counter = self._next_suffix.get(hint_key, 0)
+
+        while True:
+            path = f"{base_name}({counter}){ext}" if counter else f"{base_name}{ext}"
+            if not os.path.exists(path):
+                try:
+                    fd = os.open(path + self.PART_SUFFIX, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+                except FileExistsError:
+                    pass
+                else:
+                    os.close(fd)
+                    # 目标文件可能在检查之后才出现（例如另一个下载刚好完成）
+                    if not os.path.exists(path):
+                        with self._lock:
+                            self._next_suffix[hint_key] = counter
+                        return path
+                    os.remove(path + self.PART_SUFFIX)
+            counter += 1
+
+    def begin(self, key, path):
+        """记录开始下载到path"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO downloads (key, path, size, sha256, complete, updated) "
+                "VALUES (?, ?, NULL, NULL, 0, ?)",
+                (key, path, time.time())
+            )
+
+    def complete(self, key, path, size, sha256):
+        """记录下载完成"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO downloads (key, path, size, sha256, complete, updated) "
+                "VALUES (?, ?, ?, ?, 1, ?)",
+                (key, path, size, sha256, time.time())
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,247 @@
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+import requests
+from modules.host_policy import TokenBucket
+
+
+class DownloadJob:
+    """调度器中的一个下载任务"""
+
+    def __init__(self, job_id, music_info, download_folder, priority):
+        self.id = job_id
+        self.music_info = music_info
+        self.download_folder = download_folder
+        self.priority = priority
+        # 已下载的字节数，第一次报告进度前为None
+        self.received = None
+        self.total = None
+        # 完成时得到下载后的文件路径，失败时得到异常
+        self.future = Future()
+
+
+class DownloadScheduler:
+    """
+    下载调度器
+
+    所有下载（单个下载和批量下载）都提交到这里，按优先级排队，由固定的
+    工作线程执行，同时进行的下载数不超过当前并发上限。并发上限按AIMD调整：
+    队列中有等待的任务且已用满并发时，每隔adjust_interval秒把上限加一，
+    加一后总速度没有提高5%以上就退回并停止增加；下载因连接失败或超时出错时
+    上限减半。可以设置所有下载共用的带宽上限。
+
+    下载进度和完成的任务通过poll_events()取出：进度只保留每个任务最新的值，
+    完成的任务按完成顺序排列，界面线程定期取一次即可。
+    """
+
+    def __init__(self, download, max_concurrency=6, initial_concurrency=3,
+                 bandwidth_limit=None, adjust_interval=2.0):
+        """
+        Args:
+            download: 执行下载的函数，参数为 (music_info, download_folder, progress)，
+                      返回下载后的文件路径
+            max_concurrency: 并发上限的最大值，也是工作线程数
+            initial_concurrency: 开始时的并发上限
+            bandwidth_limit: 所有下载共用的带宽上限（字节/秒），None表示不限
+            adjust_interval: 测量速度、调整并发上限的间隔（秒）
+        """
+        if max_concurrency < 1:
+            raise ValueError(f"并发数必须大于0: {max_concurrency}")
+
+        self._download = download
+        self.max_concurrency = max_concurrency
+        self.adjust_interval = adjust_interval
+        self._limit = max(1, min(initial_concurrency, max_concurrency))
+        self._bandwidth = None
+        self.set_bandwidth_limit(bandwidth_limit)
+
+        self._queue = []                    # (-优先级, 序号, 任务)
+        self._ids = itertools.count(1)
+        self._running = 0
+        self._workers = []
+        self._closed = False
+        self._cond = threading.Condition()
+
+        # 等待界面线程取走的进度和完成的任务
+        self._progress = {}                 # 任务ID -> (已下载字节数, 总字节数)
+        self._finished = []                 # 按完成顺序排列，poll_events()取走
+
+        # 速度测量
+        self.throughput = 0.0
+        self._window_bytes = 0
+        self._window_start = time.monotonic()
+        self._probe_base = None             # 上次增加并发上限前的速度
+        self._plateau = False               # 增加并发已不能提高速度
+
+    def set_bandwidth_limit(self, bytes_per_second):
+        """设置带宽上限（字节/秒），None表示不限"""
+        if bytes_per_second:
+            self._bandwidth = TokenBucket(bytes_per_second, bytes_per_second)
+        else:
+            self._bandwidth = None
+
+    def submit(self, music_info, download_folder, priority=0):
+        """
+        提交下载任务
+
+        Args:
+            music_info: 音乐信息字典
+            download_folder: 下载目录
+            priority: 优先级，数值大的先下载，相同优先级按提交顺序
+
+        Returns:
+            DownloadJob: 下载任务，job.future在下载完成后得到结果
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("下载调度器已关闭")
+            job = DownloadJob(next(self._ids), music_info, download_folder, priority)
+            heapq.heappush(self._queue, (-priority, job.id, job))
+            if len(self._workers) < self.max_concurrency:
+                self._start_worker()
+            self._cond.notify()
+        return job
+
+    def _start_worker(self):
+        worker = threading.Thread(target=self._work, name=f"download-{len(self._workers) + 1}")
+        worker.daemon = True
+        self._workers.append(worker)
+        worker.start()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._closed and (not self._queue or self._running >= self._limit):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                job = heapq.heappop(self._queue)[2]
+                self._running += 1
+
+            # job.future是公开的，排队时可能已被调用方取消
+            if not job.future.set_running_or_notify_cancel():
+                self._release(job)
+                continue
+
+            try:
+                path = self._download(
+                    job.music_info, job.download_folder,
+                    lambda received, total: self._on_progress(job, received, total)
+                )
+            except Exception as e:
+                # 网络错误（包括传输中断）可能被包装过，检查原始异常
+                cause = e.__cause__ or e
+                if isinstance(cause, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                                      requests.exceptions.ChunkedEncodingError)):
+                    self._decrease()
+                self._finish(job, None, e)
+            else:
+                self._finish(job, path, None)
+
+    def _finish(self, job, path, error):
+        # 设置结果出错时也要归还并发名额；结果设置后才放入完成列表，
+        # 界面线程取到的任务都已有结果
+        try:
+            if error is None:
+                job.future.set_result(path)
+            else:
+                job.future.set_exception(error)
+        finally:
+            self._release(job)
+
+    def _release(self, job):
+        with self._cond:
+            self._running -= 1
+            self._progress.pop(job.id, None)
+            self._finished.append(job)
+            self._cond.notify_all()
+
+    def _on_progress(self, job, received, total):
+        with self._cond:
+            if job.received is None:
+                # 续传时第一次报告的是已有的部分，不是这次下载的数据，
+                # 不计入速度和带宽
+                job.received = received
+            # 分段下载时多个线程同时报告，只记录增加的部分
+            count = max(0, received - job.received)
+            if count:
+                job.received = received
+            job.total = total
+            self._progress[job.id] = (job.received, total)
+            self._window_bytes += count
+            now = time.monotonic()
+            if now - self._window_start >= self.adjust_interval:
+                self._adjust(now)
+
+        # 超过带宽上限时在下载线程中等待，读取变慢后TCP会让服务器降低发送速度
+        bandwidth = self._bandwidth
+        if bandwidth is not None and count:
+            bandwidth.acquire(count=count)
+
+    def _adjust(self, now):
+        """根据这一段时间的总速度调整并发上限（调用时已持有锁）"""
+        rate = self._window_bytes / (now - self._window_start)
+        self._window_bytes = 0
+        self._window_start = now
+        self.throughput = rate
+
+        if self._probe_base is not None:
+            if rate < self._probe_base * 1.05:
+                # 增加并发没有提高速度，退回并不再增加
+                self._limit = max(1, self._limit - 1)
+                self._plateau = True
+            self._probe_base = None
+        elif (not self._plateau and self._queue and self._running >= self._limit
+              and self._limit < self.max_concurrency):
+            self._probe_base = rate
+            self._limit += 1
+            self._cond.notify()
+
+    def _decrease(self):
+        with self._cond:
+            self._limit = max(1, self._limit // 2)
+            self._probe_base = None
+            # 减半后允许再次逐步增加
+            self._plateau = False
+
+    def poll_events(self):
+        """
+        取出自上次调用以来的进度和完成的任务
+
+        Returns:
+            tuple: (进度字典 {任务ID: (已下载字节数, 总字节数)}, 按完成顺序排列的任务列表)
+        """
+        with self._cond:
+            progress = self._progress
+            self._progress = {}
+            finished = self._finished
+            self._finished = []
+        return progress, finished
+
+    def stats(self):
+        """
+        调度器的状态
+
+        Returns:
+            dict: concurrency为当前并发上限，running为正在下载的任务数，
+                  queued为排队的任务数，throughput为最近测得的总速度（字节/秒）
+        """
+        with self._cond:
+            return {
+                'concurrency': self._limit,
+                'running': self._running,
+                'queued': len(self._queue),
+                'throughput': self.throughput,
+            }
+
+    def close(self):
+        """停止调度，排队中的任务取消，正在进行的下载在后台线程中继续到结束"""
+        with self._cond:
+            self._closed = True
+            queued = [entry[2] for entry in self._queue]
+            self._queue = []
+            self._cond.notify_all()
+        for job in queued:
+            job.future.cancel()
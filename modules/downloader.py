@@ -0,0 +1,711 @@
+import os
+import re
+import ssl
+import errno
+import json
+import time
+import heapq
+import itertools
+import hashlib
+import threading
+import http.client
+import requests
+from urllib3.exceptions import ProtocolError, ReadTimeoutError, SSLError
+
+_CONTENT_RANGE = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)')
+
+
+def parse_content_range(value):
+    """
+    解析Content-Range响应头
+
+    Returns:
+        tuple: (起始字节, 总大小)，总大小未知时为None；无法解析时返回None
+    """
+    match = _CONTENT_RANGE.match(value or '')
+    if not match:
+        return None
+    total = match.group(3)
+    return int(match.group(1)), (None if total == '*' else int(total))
+
+
+def _write_at(fd, data, offset, lock):
+    """把数据写到文件的指定位置，多个线程可以同时写入不同位置"""
+    if hasattr(os, 'pwrite'):
+        while data:
+            written = os.pwrite(fd, data, offset)
+            data = data[written:]
+            offset += written
+    else:
+        # Windows没有pwrite，定位和写入必须一起完成
+        with lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            while data:
+                data = data[os.write(fd, data):]
+
+
+def _preallocate(fd, size):
+    """
+    预先为文件分配size字节的磁盘空间，文件大小同时变为size
+
+    posix_fallocate真正分配磁盘块，文件更不容易产生碎片，磁盘空间不足时立即报错；
+    系统或文件系统不支持时只设置文件大小。
+    """
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                raise
+    os.ftruncate(fd, size)
+
+
+def _read_chunks(response, buffer):
+    """
+    逐块读取响应内容
+
+    数据直接读入buffer，每次返回buffer中已填入部分的memoryview，不为每块数据
+    分配新的对象。buffer在各次读取之间复用，调用方必须在读取下一块之前用完当前这块。
+    响应经过压缩时由requests解压，每块数据是新的对象。
+    响应不完整时不会抛出异常，调用方需要自己核对收到的字节数。
+
+    读取中途的连接断开、超时和SSL错误都转换为ChunkedEncodingError，
+    与发出请求时的连接错误区分：后者已由HostPolicy重试并计入熔断。
+    """
+    raw = response.raw
+    encoding = response.headers.get('Content-Encoding', 'identity').strip().lower()
+    if encoding != 'identity' or not hasattr(raw, 'readinto'):
+        try:
+            for chunk in response.iter_content(chunk_size=len(buffer)):
+                if chunk:
+                    yield memoryview(chunk)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            raise requests.exceptions.ChunkedEncodingError(e)
+        return
+
+    # urllib3的readinto先读出bytes再复制到buffer，
+    # 直接从它底层的http.client响应读取，数据从socket直接进入buffer
+    fp = getattr(raw, '_fp', None)
+    direct = isinstance(fp, http.client.HTTPResponse)
+    readinto = fp.readinto if direct else raw.readinto
+
+    view = memoryview(buffer)
+    while True:
+        try:
+            count = readinto(view)
+        except (ProtocolError, http.client.HTTPException, SSLError, ssl.SSLError,
+                ReadTimeoutError, OSError) as e:
+            raise requests.exceptions.ChunkedEncodingError(e)
+        if not count:
+            break
+        yield view[:count]
+
+    if direct and fp.isclosed():
+        # 响应已完整读取，连接可以复用；绕过了urllib3，由这里把连接还给连接池
+        raw.release_conn()
+
+
+class _ContentHasher:
+    """
+    边写入边计算文件内容的SHA-256
+
+    哈希必须按文件顺序计算。写在当前位置的数据直接计算；分段下载时写在后面的
+    数据先复制一份保存在内存中，前面的数据到齐后再按顺序计算，不需要从文件读回。
+    保存的数据超过max_buffer字节时放弃计算哈希（hexdigest返回None），
+    不为了哈希占用更多内存。续传时上次已下载的部分只能从文件读回。
+    计算到的位置也就是从文件开头起已连续写入的字节数。
+    """
+
+    def __init__(self, path, on_advance=None, max_buffer=32 * 1024 * 1024):
+        """
+        Args:
+            path: 正在写入的文件
+            on_advance: 计算到的位置前进时以新的位置调用（持有锁，按顺序调用）；
+                        创建时以0调用，表示文件从头开始
+            max_buffer: 最多在内存中保存的、尚未轮到计算的数据字节数
+        """
+        self._path = path
+        self._hash = hashlib.sha256()
+        self.position = 0
+        self.max_buffer = max_buffer
+        # 已写入但尚未计算的 (起始, 结束, 序号, 数据)，数据为None表示需要从文件读回
+        self._pending = []
+        self._seq = itertools.count()
+        self._buffered = 0
+        self._lock = threading.Lock()
+        self._on_advance = on_advance or (lambda position: None)
+        self._on_advance(0)
+
+    def update(self, offset, data):
+        """data已写到文件的offset位置（data可以是之后会被覆盖的缓冲区）"""
+        end = offset + len(data)
+        with self._lock:
+            if offset <= self.position < end:
+                if self._hash is not None:
+                    self._hash.update(memoryview(data)[self.position - offset:])
+                self.position = end
+                self._absorb()
+                self._on_advance(self.position)
+            elif offset > self.position:
+                if self._hash is not None and self._buffered + len(data) > self.max_buffer:
+                    self._give_up()
+                if self._hash is not None:
+                    heapq.heappush(self._pending, (offset, end, next(self._seq), bytes(data)))
+                    self._buffered += len(data)
+                else:
+                    heapq.heappush(self._pending, (offset, end, next(self._seq), None))
+
+    def mark_written(self, start, end):
+        """文件中start到end之间已有数据（例如上次下载的部分）"""
+        if start < end:
+            with self._lock:
+                position = self.position
+                heapq.heappush(self._pending, (start, end, next(self._seq), None))
+                self._absorb()
+                if self.position != position:
+                    self._on_advance(self.position)
+
+    def _give_up(self):
+        """不再计算哈希，只记录已连续写入的位置（调用时已持有锁）"""
+        self._hash = None
+        self._pending = [(start, end, seq, None) for start, end, seq, _ in self._pending]
+        heapq.heapify(self._pending)
+        self._buffered = 0
+
+    def _absorb(self):
+        """按顺序计算与当前位置相接的已写入范围"""
+        pending = self._pending
+        while pending and pending[0][0] <= self.position:
+            start, end, _, data = heapq.heappop(pending)
+            if data is not None:
+                self._buffered -= len(data)
+            if end <= self.position:
+                continue
+            if self._hash is None:
+                self.position = end
+            elif data is not None:
+                self._hash.update(memoryview(data)[self.position - start:])
+                self.position = end
+            else:
+                self._read_back(end)
+
+    def _read_back(self, end):
+        with open(self._path, 'rb') as f:
+            f.seek(self.position)
+            while self.position < end:
+                data = f.read(min(1024 * 1024, end - self.position))
+                if not data:
+                    raise requests.exceptions.ChunkedEncodingError("读回已下载的数据失败")
+                self._hash.update(data)
+                self.position += len(data)
+
+    def hexdigest(self, size):
+        """
+        确认文件的前size个字节都已计算后返回哈希值
+
+        Returns:
+            str: 十六进制的SHA-256，放弃计算时为None
+        """
+        with self._lock:
+            if self.position != size:
+                raise requests.exceptions.ChunkedEncodingError(f"文件内容不完整: {self.position}/{size} 字节")
+            return self._hash.hexdigest() if self._hash is not None else None
+
+
+class _FileChanged(Exception):
+    """分段下载期间服务器上的文件发生了变化"""
+
+
+class _Segment:
+    """分段下载中的一段：pos是下一个要写入的位置，end之前的数据由这一段负责"""
+
+    def __init__(self, pos, end):
+        self.pos = pos
+        self.end = end
+
+
+class ResumableDownloader:
+    """
+    可以断点续传的下载器
+
+    下载中的数据写入 目标文件.part，同时在 目标文件.part.json 中记录URL、
+    服务器返回的ETag/Last-Modified和文件总大小。传输中断、重试或程序重启后
+    用Range请求从.part的末尾继续，并用If-Range保证服务器上的文件没有变化；
+    文件变化时服务器返回完整内容，从头重新下载。全部下载完成后才改名为目标文件。
+
+    已知文件大小时.part文件预先分配到完整大小，数据按位置写入，续传记录中保存
+    已写入的范围。每个连接使用一个固定的缓冲区，数据直接读入缓冲区再写入文件。
+    """
+
+    PART_SUFFIX = '.part'
+    JOURNAL_SUFFIX = '.part.json'
+    # 边下载边读取时每次读取的最大字节数
+    STREAM_CHUNK_SIZE = 64 * 1024
+
+    # 刷盘策略
+    FSYNC_NONE = 'none'         # 不主动刷盘，由系统决定何时写入磁盘
+    FSYNC_END = 'end'           # 下载完成、改名之前刷盘一次
+    FSYNC_JOURNAL = 'journal'   # 每次保存续传记录前也刷盘，断电后记录的进度不会超过磁盘上的数据
+
+    def __init__(self, http, host_policy, max_retries=3, chunk_size=1024 * 1024,
+                 max_segments=4, segment_threshold=8 * 1024 * 1024, min_segment_size=1024 * 1024,
+                 probe_interval=1.0, fsync=FSYNC_JOURNAL, hash_buffer_size=32 * 1024 * 1024):
+        """
+        Args:
+            http: HttpSessionPool
+            host_policy: HostPolicy，连接失败和服务器错误由它重试
+            max_retries: 传输中断后的最多重试次数
+            chunk_size: 每次读取的字节数，也是每个连接的缓冲区大小
+            max_segments: 分段下载时最多同时使用的连接数，为1时不分段
+            segment_threshold: 文件不小于此大小（字节）且服务器支持Range时分段下载
+            min_segment_size: 剩余部分小于此大小的两倍时不再拆分
+            probe_interval: 分段下载时测量速度、决定是否增加连接的间隔（秒），
+                            也是保存续传记录的间隔
+            fsync: 刷盘策略，FSYNC_NONE、FSYNC_END或FSYNC_JOURNAL
+            hash_buffer_size: 分段下载时为按顺序计算哈希最多在内存中保存的数据（字节），
+                              超过时这个文件不计算哈希
+        """
+        if chunk_size < 1:
+            raise ValueError(f"读取大小必须大于0: {chunk_size}")
+        if fsync not in (self.FSYNC_NONE, self.FSYNC_END, self.FSYNC_JOURNAL):
+            raise ValueError(f"未知的刷盘策略: {fsync}")
+
+        self.http = http
+        self.host_policy = host_policy
+        self.max_retries = max_retries
+        self.chunk_size = chunk_size
+        self.fsync = fsync
+        self.max_segments = max_segments
+        self.segment_threshold = segment_threshold
+        self.min_segment_size = min_segment_size
+        self.probe_interval = probe_interval
+        self.hash_buffer_size = hash_buffer_size
+
+    def has_partial(self, file_path):
+        """目标文件是否有未完成的下载"""
+        return os.path.exists(file_path + self.PART_SUFFIX)
+
+    def can_resume(self, file_path):
+        """是否有可以续传的数据：续传记录存在且.part文件不为空"""
+        try:
+            return (os.path.exists(file_path + self.JOURNAL_SUFFIX)
+                    and os.path.getsize(file_path + self.PART_SUFFIX) > 0)
+        except OSError:
+            return False
+
+    def discard(self, file_path):
+        """删除未完成的下载"""
+        for path in (file_path + self.PART_SUFFIX, file_path + self.JOURNAL_SUFFIX):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def download(self, url, file_path, progress=None, available=None):
+        """
+        下载文件，已有未完成的下载时继续下载
+
+        Args:
+            url: 文件URL
+            file_path: 目标文件路径
+            progress: 每写入一块数据后以 (已下载字节数, 总字节数) 调用，
+                      总字节数未知时为None；分段下载时会在多个线程中调用
+            available: 以.part文件从开头起已连续写入的字节数调用，可以据此边下载边读取；
+                       重新从头下载时数值会变小
+
+        Returns:
+            tuple: (下载后的文件路径, 文件内容的SHA-256)，哈希在写入时计算，不需要再读一遍文件；
+                   分段下载中等待计算的数据超过hash_buffer_size时为None
+        """
+        progress = progress or (lambda received, total: None)
+        for retry in range(self.max_retries + 1):
+            try:
+                digest = self._transfer(url, file_path, progress, available)
+                break
+            except requests.exceptions.ChunkedEncodingError as e:
+                # 这里只重试传输中断；发出请求时的连接错误和服务器错误已由HostPolicy
+                # 重试并计入熔断，熔断中的CircuitOpenError也直接交给调用方
+                print(f"下载请求异常: {str(e)}")
+                if retry >= self.max_retries:
+                    raise
+                delay = self.host_policy.backoff(retry)
+                print(f"{delay:.1f}秒后从断点继续下载 ({retry+1}/{self.max_retries})...")
+                time.sleep(delay)
+
+        part_path = file_path + self.PART_SUFFIX
+        if os.path.getsize(part_path) == 0:
+            self.discard(file_path)
+            raise Exception("文件下载失败，文件大小为0")
+        os.replace(part_path, file_path)
+        self.discard(file_path)
+        if self.fsync != self.FSYNC_NONE and hasattr(os, 'O_DIRECTORY'):
+            # 同时刷新目录项，保证改名本身也已落盘
+            dir_fd = os.open(os.path.dirname(os.path.abspath(file_path)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        return file_path, digest
+
+    def _load_journal(self, url, file_path):
+        """读取续传记录，与URL不符或.part文件不存在时返回None"""
+        try:
+            with open(file_path + self.JOURNAL_SUFFIX, 'r', encoding='utf-8') as f:
+                journal = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(journal, dict) or journal.get('url') != url or not self.has_partial(file_path):
+            return None
+        return journal
+
+    def _save_journal(self, file_path, journal):
+        journal_path = file_path + self.JOURNAL_SUFFIX
+        temp_path = journal_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(journal, f)
+        os.replace(temp_path, journal_path)
+
+    def _transfer(self, url, file_path, progress, available):
+        """
+        发出一次请求并把数据写入.part文件，传输中断时抛出异常
+
+        Returns:
+            str: 完整文件的SHA-256
+        """
+        part_path = file_path + self.PART_SUFFIX
+        journal = self._load_journal(url, file_path)
+        if journal and journal.get('segments') is not None:
+            # 继续未完成的分段下载
+            return self._transfer_segments(url, file_path, journal, progress, available)
+
+        offset = os.path.getsize(part_path) if journal else 0
+        validator = journal.get('validator') if journal else None
+
+        # 音频数据已经压缩过，不再请求gzip，字节位置与文件位置一致
+        headers = {'Accept-Encoding': 'identity'}
+        if offset and validator:
+            headers['Range'] = f'bytes={offset}-'
+            headers['If-Range'] = validator
+        else:
+            # 没有校验信息时无法确认服务器上的文件没有变化，从头下载。
+            # 从头请求整个范围：服务器返回206说明支持Range，可以续传和分段下载
+            offset = 0
+            headers['Range'] = 'bytes=0-'
+
+        hasher = _ContentHasher(part_path, available)
+        response = self.host_policy.request(url, lambda: self.http.get(url, headers=headers, stream=True))
+        with response:
+            if response.status_code == 416 and offset:
+                if offset == journal.get('size'):
+                    # 上次已经全部下载，只是没来得及改名
+                    hasher.mark_written(0, offset)
+                    return hasher.hexdigest(offset)
+                self._restart(file_path, "已下载的部分超出了文件大小")
+            response.raise_for_status()
+
+            if response.status_code == 206:
+                content_range = parse_content_range(response.headers.get('Content-Range'))
+                if content_range is None or content_range[0] != offset:
+                    self._restart(file_path, f"服务器返回的范围与请求不符: {response.headers.get('Content-Range')}")
+                total = content_range[1]
+            else:
+                # 文件已变化或服务器不支持Range，从头重新下载
+                offset = 0
+                length = response.headers.get('Content-Length')
+                total = int(length) if length and length.isdigit() else None
+
+            new_validator = self._validator(response)
+            if not offset and total and new_validator:
+                # 大小已知时预分配文件、按位置写入，这个响应作为第一段继续读取；
+                # 服务器支持Range时，大文件的其余部分由新的连接并行下载
+                return self._transfer_segments(url, file_path, {
+                    'url': url,
+                    'validator': new_validator,
+                    'size': total,
+                    'segments': [[0, total]],
+                }, progress, available, response)
+
+            self._save_journal(file_path, {
+                'url': url,
+                # 206响应可能不带校验信息，沿用原来的
+                'validator': new_validator or (validator if offset else None),
+                'size': total,
+            })
+
+            # 续传时先计算已下载部分的哈希
+            hasher.mark_written(0, offset)
+            received = offset
+            progress(received, total)
+            buffer = bytearray(self._buffer_size(available))
+            with open(part_path, 'ab' if offset else 'wb') as f:
+                if total and not offset:
+                    # 没有校验信息时不会按文件大小续传，可以预分配
+                    _preallocate(f.fileno(), total)
+                for chunk in _read_chunks(response, buffer):
+                    f.write(chunk)
+                    hasher.update(received, chunk)
+                    received += len(chunk)
+                    progress(received, total)
+                if total is None or received == total:
+                    self._sync(f)
+
+        if total is not None and received > total:
+            self._restart(file_path, f"下载的数据超出了文件大小: {received}/{total} 字节")
+        if total is not None and received < total:
+            # 保留已下载的部分，重试时从断点继续
+            raise requests.exceptions.ChunkedEncodingError(f"下载不完整: {received}/{total} 字节")
+        return hasher.hexdigest(received)
+
+    def _buffer_size(self, available):
+        """
+        每次读取的字节数
+
+        读取要等缓冲区填满才返回，边下载边读取时用较小的缓冲区，及时报告已写入的数据
+        """
+        if available is None:
+            return self.chunk_size
+        return min(self.chunk_size, self.STREAM_CHUNK_SIZE)
+
+    def _sync(self, f, journal=False):
+        """
+        按刷盘策略把文件数据写入磁盘
+
+        Args:
+            f: 文件对象或文件描述符
+            journal: 是否是保存续传记录前的刷盘
+        """
+        if self.fsync == self.FSYNC_NONE or (journal and self.fsync != self.FSYNC_JOURNAL):
+            return
+        if isinstance(f, int):
+            os.fsync(f)
+        else:
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _transfer_segments(self, url, file_path, journal, progress, available, first_response=None):
+        """
+        按位置写入的下载，大文件分段并行下载
+
+        文件预先分配到完整大小，每一段用一个连接下载，用pwrite写到各自的位置。
+        开始时只有一段（first_response是对整个文件的请求，作为第一段继续读取）。
+        服务器支持Range且文件不小于segment_threshold时，每隔probe_interval秒
+        测量一次总速度，速度比上次增加连接前提高10%以上时把连接数加倍（每个新连接
+        从剩余最多的一段中拆出后一半），增加连接不再提高速度或达到max_segments时停止。
+        某一段完成后，它的连接接手剩余最多的一段的后一半。各段的进度记录在续传记录中，
+        中断后从每一段的断点继续。
+        """
+        part_path = file_path + self.PART_SUFFIX
+        total = journal['size']
+        segments = [_Segment(pos, end) for pos, end in journal['segments'] if pos < end]
+        received = [total - sum(seg.end - seg.pos for seg in segments)]
+        lock = threading.Lock()
+        hasher = _ContentHasher(part_path, available, self.hash_buffer_size)
+        errors = []
+        # 续传时超出连接数、还没有连接下载的段
+        waiting = []
+        # 仍在运行的连接数，全部结束时设置finished
+        active = [0]
+        finished = threading.Event()
+
+        fd = os.open(part_path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if first_response is not None:
+                _preallocate(fd, total)
+            elif size != total:
+                os.close(fd)
+                fd = None
+                self._restart(file_path, "已下载的部分与文件大小不符")
+
+            def save_journal():
+                # 先刷盘再记录进度，记录中的已下载范围都已在磁盘上
+                self._sync(fd, journal=True)
+                with lock:
+                    journal['segments'] = [[seg.pos, seg.end] for seg in segments if seg.pos < seg.end]
+                self._save_journal(file_path, journal)
+
+            def split():
+                """从剩余最多的一段拆出后一半作为新的一段，剩余太少时返回None"""
+                with lock:
+                    largest = max(segments, key=lambda seg: seg.end - seg.pos, default=None)
+                    if largest is None or largest.end - largest.pos < 2 * self.min_segment_size:
+                        return None
+                    middle = largest.pos + (largest.end - largest.pos) // 2
+                    segment = _Segment(middle, largest.end)
+                    largest.end = middle
+                    segments.append(segment)
+                    return segment
+
+            def next_segment():
+                """连接空闲后接手的下一段：先取续传时还没有连接的段，没有时拆分"""
+                with lock:
+                    if waiting:
+                        return waiting.pop()
+                return split()
+
+            def fetch(segment, response, buffer):
+                if response is None:
+                    with lock:
+                        start, end = segment.pos, segment.end
+                    if start >= end:
+                        return
+                    headers = {
+                        'Accept-Encoding': 'identity',
+                        'Range': f'bytes={start}-{end - 1}',
+                        'If-Range': journal['validator'],
+                    }
+                    response = self.host_policy.request(url, lambda: self.http.get(url, headers=headers, stream=True))
+                with response:
+                    if response is first_response and response.status_code == 200:
+                        # 服务器不支持Range，整个文件只有这一段
+                        position = 0
+                    elif response.status_code != 206:
+                        response.raise_for_status()
+                        raise _FileChanged()
+                    else:
+                        content_range = parse_content_range(response.headers.get('Content-Range'))
+                        if content_range is None or content_range[1] != total:
+                            raise _FileChanged()
+                        position = content_range[0]
+                    with lock:
+                        if position != segment.pos:
+                            raise requests.exceptions.ChunkedEncodingError(
+                                f"服务器返回的范围与请求不符: {response.headers.get('Content-Range')}")
+                    for chunk in _read_chunks(response, buffer):
+                        with lock:
+                            # 这一段可能已经被拆分，只写到新的结束位置
+                            count = min(len(chunk), segment.end - segment.pos)
+                        if count > 0:
+                            data = chunk[:count]
+                            _write_at(fd, data, position, lock)
+                            hasher.update(position, data)
+                            position += count
+                            with lock:
+                                segment.pos = position
+                                received[0] += count
+                                done = received[0]
+                            progress(done, total)
+                        with lock:
+                            if segment.pos >= segment.end:
+                                # 提前结束时连接不能复用，由连接池关闭
+                                return
+                with lock:
+                    if segment.pos < segment.end:
+                        raise requests.exceptions.ChunkedEncodingError(
+                            f"分段下载不完整: {segment.pos}/{segment.end} 字节")
+
+            def work(segment, response=None):
+                try:
+                    download_segments(segment, response)
+                finally:
+                    with lock:
+                        active[0] -= 1
+                        if not active[0]:
+                            finished.set()
+
+            def download_segments(segment, response):
+                # 每个连接一个缓冲区，整个下载期间复用
+                buffer = bytearray(self._buffer_size(available))
+                failures = 0
+                while segment is not None:
+                    try:
+                        fetch(segment, response, buffer)
+                    except requests.exceptions.ChunkedEncodingError as e:
+                        # 只重试传输中断，请求失败已由HostPolicy重试
+                        failures += 1
+                        if failures > self.max_retries:
+                            errors.append(e)
+                            return
+                        time.sleep(self.host_policy.backoff(failures - 1))
+                        response = None
+                        continue
+                    except Exception as e:
+                        errors.append(e)
+                        return
+                    response = None
+                    segment = next_segment() if not errors else None
+
+            def start(segment, response=None):
+                with lock:
+                    active[0] += 1
+                thread = threading.Thread(target=work, args=(segment, response))
+                thread.daemon = True
+                thread.start()
+
+            save_journal()
+            # 已下载的部分（各段之间的空隙）等计算到时再从文件读回
+            covered = 0
+            for segment in sorted(segments, key=lambda seg: seg.pos):
+                hasher.mark_written(covered, segment.pos)
+                covered = segment.end
+            hasher.mark_written(covered, total)
+            progress(received[0], total)
+            if first_response is not None:
+                start(segments[0], first_response)
+            else:
+                for segment in segments[:self.max_segments]:
+                    start(segment)
+                waiting.extend(segments[self.max_segments:])
+            if not segments:
+                # 上次已经全部下载，只是没来得及改名
+                finished.set()
+
+            # 逐步增加连接，直到速度不再明显提高
+            growing = self.max_segments > 1 and total >= self.segment_threshold
+            if first_response is not None and first_response.status_code != 206:
+                growing = False
+            best_rate = 0
+            last_done = total - sum(seg.end - seg.pos for seg in segments)
+            last_time = time.monotonic()
+            while not finished.wait(self.probe_interval):
+                save_journal()
+
+                now = time.monotonic()
+                with lock:
+                    done = total - sum(seg.end - seg.pos for seg in segments)
+                    running = active[0]
+                rate = (done - last_done) / max(now - last_time, 1e-6)
+                last_done, last_time = done, now
+                if growing and not errors and running < self.max_segments:
+                    if rate > best_rate * 1.1:
+                        # 连接数加倍：1、2、4……
+                        best_rate = rate
+                        for _ in range(min(max(running, 1), self.max_segments - running)):
+                            segment = split()
+                            if segment is None:
+                                growing = False
+                                break
+                            start(segment)
+                    else:
+                        growing = False
+
+            save_journal()
+            if errors:
+                if any(isinstance(e, _FileChanged) for e in errors):
+                    os.close(fd)
+                    fd = None
+                    self._restart(file_path, "下载期间服务器上的文件发生了变化")
+                raise errors[0]
+
+            # 确认每一段都已完整写入
+            if journal['segments'] or os.fstat(fd).st_size != total:
+                raise requests.exceptions.ChunkedEncodingError("分段下载不完整")
+            digest = hasher.hexdigest(total)
+            self._sync(fd)
+            return digest
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def _restart(self, file_path, reason):
+        """已下载的部分无法继续使用，删除后由重试从头下载"""
+        self.discard(file_path)
+        raise requests.exceptions.ChunkedEncodingError(reason)
+
+    def _validator(self, response):
+        """用于If-Range的校验信息：强ETag，没有时使用Last-Modified"""
+        etag = response.headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            return etag
+        return response.headers.get('Last-Modified')
@@ -0,0 +1,138 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def list_audio_directory(dir_path, is_audio_file):
+    """
+    使用os.scandir列出单个目录中的音频文件和子目录
+
+    Args:
+        dir_path: 目录路径
+        is_audio_file: 判断文件名是否为音频文件的函数
+
+    Returns:
+        tuple: (音频文件列表, 子目录列表)，文件为 (路径, 大小, 修改时间) 元组；
+               目录无法读取时返回None
+    """
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        # 与os.walk一致，不进入符号链接指向的目录
+                        if not entry.is_symlink():
+                            subdirs.append(os.path.join(dir_path, entry.name))
+                        continue
+                    if not is_audio_file(entry.name):
+                        continue
+                    stats = entry.stat()
+                except OSError:
+                    continue
+                files.append((os.path.join(dir_path, entry.name), stats.st_size, stats.st_mtime))
+    except OSError:
+        return None
+
+    return files, subdirs
+
+
+class FolderScanner:
+    """
+    并行、流式的文件夹扫描器
+
+    使用有界线程池并发遍历子目录，同一设备上同时读取的目录数受到限制，
+    避免机械硬盘因随机寻道而变慢。扫描结果通过生成器分批返回，
+    调用方可以在扫描完成前就开始处理第一批结果。
+    """
+
+    def __init__(self, max_workers=8, per_device_limit=2, batch_size=500):
+        self.max_workers = max_workers
+        self.per_device_limit = per_device_limit
+        self.batch_size = batch_size
+
+        self._device_locks = {}
+        self._device_locks_lock = threading.Lock()
+
+    def _device_semaphore(self, device):
+        with self._device_locks_lock:
+            semaphore = self._device_locks.get(device)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_device_limit)
+                self._device_locks[device] = semaphore
+            return semaphore
+
+    def _visit(self, dir_path, list_directory, results, stopped):
+        """在工作线程中读取单个目录，结果放入队列"""
+        if stopped.is_set():
+            return
+
+        try:
+            try:
+                dir_stat = os.stat(dir_path)
+            except OSError:
+                # 目录已被删除，交给list_directory清理
+                listing = list_directory(dir_path, None)
+            else:
+                with self._device_semaphore(dir_stat.st_dev):
+                    listing = list_directory(dir_path, dir_stat)
+        except Exception as e:
+            print(f"扫描目录 {dir_path} 失败: {str(e)}")
+            listing = None
+
+        results.put(listing)
+
+    def scan(self, folder_path, list_directory):
+        """
+        扫描文件夹，分批返回音频文件
+
+        Args:
+            folder_path: 根文件夹路径
+            list_directory: 列出单个目录的函数，参数为 (目录路径, 目录stat结果)，
+                            返回 (文件列表, 子目录列表) 或 None；
+                            目录不存在时stat结果为None
+
+        Yields:
+            list: 一批 (路径, 大小, 修改时间) 元组
+        """
+        results = queue.Queue()
+        stopped = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        pending = 1
+        batch = []
+
+        try:
+            executor.submit(self._visit, folder_path, list_directory, results, stopped)
+
+            while pending:
+                try:
+                    listing = results.get_nowait()
+                except queue.Empty:
+                    # 暂时没有新结果时先交出已有的部分，让第一批结果尽快到达调用方
+                    if batch:
+                        yield batch
+                        batch = []
+                    listing = results.get()
+
+                pending -= 1
+                if listing is None:
+                    continue
+
+                files, subdirs = listing
+                for subdir in subdirs:
+                    executor.submit(self._visit, subdir, list_directory, results, stopped)
+                pending += len(subdirs)
+
+                batch.extend(files)
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+
+            if batch:
+                yield batch
+        finally:
+            # 调用方提前停止迭代时，尚未开始的目录任务直接跳过
+            stopped.set()
+            executor.shutdown(wait=False)
@@ -0,0 +1,322 @@
+import os
+import sys
+import errno
+import select
+import struct
+import threading
+import time
+import ctypes
+import ctypes.util
+
+# inotify事件掩码（见 <sys/inotify.h>）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+              IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR)
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_libc():
+    """加载libc中的inotify函数，不支持时返回None"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        libc.inotify_rm_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class _PollFallback(Exception):
+    """inotify不可用或监视数量达到上限，需要改用定时轮询"""
+
+
+class FolderWatcher:
+    """
+    监视音乐文件夹的变化
+
+    在Linux上使用inotify接收文件的新增、删除和重命名事件，短时间内的大量事件
+    （例如批量复制）合并后一次性交给回调函数。inotify不可用或监视数量达到
+    系统上限时，改为定时调用poll_callback做增量扫描（只检查目录修改时间）。
+
+    回调函数在监视线程中调用，参数为变化字典：
+        added: 新增的音频文件路径
+        removed: 删除的音频文件路径
+        renamed: (旧路径, 新路径) 元组
+        removed_dirs: 被删除或移走的目录，其中的文件都应视为已删除
+    """
+
+    def __init__(self, is_audio_file, on_change, poll_callback,
+                 debounce=0.5, max_delay=3.0, poll_interval=10.0):
+        self.is_audio_file = is_audio_file
+        self.on_change = on_change
+        self.poll_callback = poll_callback
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+
+        # 当前使用的监视方式: 'inotify' 或 'poll'
+        self.mode = None
+
+        self._roots = []
+        self._libc = _load_libc()
+        self._fd = None
+        self._watches = {}          # 监视描述符 -> 目录路径
+        self._stop_event = threading.Event()
+        self._wake_read, self._wake_write = os.pipe()
+        self._thread = None
+        self._reset_pending()
+
+    def _reset_pending(self):
+        self._pending = {}          # 文件路径 -> 'added' / 'removed'
+        self._renamed = []
+        self._moved_from = {}       # cookie -> (路径, 是否为目录)
+        self._new_dirs = []
+        self._removed_dirs = []
+        self._resync = False
+        self._first_event_time = None
+        self._last_event_time = None
+
+    def start(self, roots, directories=None):
+        """
+        开始监视
+
+        Args:
+            roots: 要监视的根文件夹列表
+            directories: 已知的子目录列表（例如来自音乐库索引），为None时自行遍历
+        """
+        # 去掉重复或嵌套的根目录
+        roots = sorted(set(os.path.abspath(root) for root in roots if os.path.isdir(root)))
+        for root in roots:
+            if not any(root.startswith(other.rstrip(os.sep) + os.sep) for other in self._roots):
+                self._roots.append(root)
+
+        self._thread = threading.Thread(target=self._run, args=(directories,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """停止监视"""
+        self._stop_event.set()
+        os.write(self._wake_write, b'x')
+        if self._thread and self._thread.is_alive():
+            self._thread.join(1.0)
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+
+    def _run(self, directories):
+        try:
+            self._start_inotify(directories)
+            self.mode = 'inotify'
+            self._run_inotify()
+        except _PollFallback as e:
+            print(f"文件监视改为定时轮询: {str(e)}")
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._watches = {}
+            self.mode = 'poll'
+            self._run_poll()
+
+    def _start_inotify(self, directories):
+        if self._libc is None:
+            raise _PollFallback("当前系统不支持inotify")
+
+        fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise _PollFallback(os.strerror(ctypes.get_errno()))
+        self._fd = fd
+
+        if directories is None:
+            for root in self._roots:
+                self._add_tree(root)
+        else:
+            for path in list(self._roots) + list(directories):
+                self._add_watch(path)
+
+    def _add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOSPC, errno.EMFILE, errno.ENOMEM):
+                raise _PollFallback(f"inotify监视数量达到上限 ({os.strerror(err)})")
+            # 目录已被删除等情况直接忽略
+            return
+        self._watches[wd] = path
+
+    def _add_tree(self, root):
+        """为目录及其所有子目录添加监视，返回其中的音频文件"""
+        files = []
+        stack = [root]
+        while stack:
+            dir_path = stack.pop()
+            self._add_watch(dir_path)
+            try:
+                with os.scandir(dir_path) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif self.is_audio_file(entry.name):
+                                files.append(entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return files
+
+    def _remove_tree_watches(self, dir_path):
+        prefix = dir_path.rstrip(os.sep) + os.sep
+        for wd, path in list(self._watches.items()):
+            if path == dir_path or path.startswith(prefix):
+                del self._watches[wd]
+                self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _flush_deadline(self):
+        """事件停止到来debounce秒后，或第一个事件到来max_delay秒后提交"""
+        return min(self._last_event_time + self.debounce,
+                   self._first_event_time + self.max_delay)
+
+    def _run_inotify(self):
+        while not self._stop_event.is_set():
+            if self._first_event_time is None:
+                timeout = None
+            else:
+                timeout = max(0, self._flush_deadline() - time.monotonic())
+
+            readable, _, _ = select.select([self._fd, self._wake_read], [], [], timeout)
+            if self._stop_event.is_set():
+                return
+
+            if self._fd in readable:
+                try:
+                    data = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    data = b''
+                if data:
+                    now = time.monotonic()
+                    if self._first_event_time is None:
+                        self._first_event_time = now
+                    self._last_event_time = now
+                    self._handle_events(data)
+
+            # 持续不断的事件（例如批量复制）最多延迟max_delay秒提交
+            if self._first_event_time is not None and time.monotonic() >= self._flush_deadline():
+                self._flush()
+
+    def _handle_events(self, data):
+        pos = 0
+        while pos + _EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, pos)
+            name = data[pos + _EVENT_HEADER.size:pos + _EVENT_HEADER.size + length].rstrip(b'\x00')
+            pos += _EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # 事件队列溢出，部分变化已丢失，提交时做一次增量扫描
+                self._resync = True
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+
+            dir_path = self._watches.get(wd)
+            if dir_path is None or mask & IN_DELETE_SELF:
+                continue
+
+            path = os.path.join(dir_path, os.fsdecode(name))
+            is_dir = bool(mask & IN_ISDIR)
+
+            if mask & IN_MOVED_FROM:
+                self._moved_from[cookie] = (path, is_dir)
+            elif mask & IN_MOVED_TO:
+                old = self._moved_from.pop(cookie, None)
+                if is_dir:
+                    if old is not None:
+                        self._removed_dirs.append(old[0])
+                    self._new_dirs.append(path)
+                elif old is not None and self.is_audio_file(old[0]) and self.is_audio_file(path):
+                    self._renamed.append((old[0], path))
+                else:
+                    if old is not None and self.is_audio_file(old[0]):
+                        self._pending[old[0]] = 'removed'
+                    if self.is_audio_file(path):
+                        self._pending[path] = 'added'
+            elif is_dir:
+                if mask & IN_CREATE:
+                    self._new_dirs.append(path)
+                elif mask & IN_DELETE:
+                    self._removed_dirs.append(path)
+            elif self.is_audio_file(path):
+                # 文件写入完成后才算新增，避免把正在下载的文件加入播放列表
+                if mask & IN_CLOSE_WRITE:
+                    self._pending[path] = 'added'
+                elif mask & IN_DELETE:
+                    self._pending[path] = 'removed'
+
+    def _flush(self):
+        """把一段时间内累积的事件合并成一次变化通知"""
+        # 没有配对的移出事件说明文件被移到了监视范围之外
+        for path, is_dir in self._moved_from.values():
+            if is_dir:
+                self._removed_dirs.append(path)
+            elif self.is_audio_file(path):
+                self._pending[path] = 'removed'
+
+        for dir_path in self._removed_dirs:
+            self._remove_tree_watches(dir_path)
+        for dir_path in self._new_dirs:
+            # 监视添加之前已经写入的文件只能通过列出目录得到
+            for path in self._add_tree(dir_path):
+                self._pending[path] = 'added'
+
+        delta = {
+            'added': [path for path, kind in self._pending.items() if kind == 'added'],
+            'removed': [path for path, kind in self._pending.items() if kind == 'removed'],
+            'renamed': self._renamed,
+            'removed_dirs': self._removed_dirs,
+        }
+        resync = self._resync
+        self._reset_pending()
+
+        if resync:
+            self._merge_poll_results(delta)
+        self._emit(delta)
+
+    def _merge_poll_results(self, delta):
+        for root in self._roots:
+            try:
+                result = self.poll_callback(root)
+            except Exception as e:
+                print(f"增量扫描 {root} 失败: {str(e)}")
+                continue
+            delta['added'].extend(result['added'])
+            delta['removed'].extend(result['removed'])
+
+    def _emit(self, delta):
+        if any(delta.values()):
+            try:
+                self.on_change(delta)
+            except Exception as e:
+                print(f"处理文件变化失败: {str(e)}")
+
+    def _run_poll(self):
+        while not self._stop_event.wait(self.poll_interval):
+            delta = {'added': [], 'removed': [], 'renamed': [], 'removed_dirs': []}
+            self._merge_poll_results(delta)
+            self._emit(delta)
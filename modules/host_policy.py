@@ -0,0 +1,287 @@
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import requests
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """主机连续失败后暂停访问，请求不会发出"""
+
+
+class TokenBucket:
+    """
+    令牌桶限速
+
+    每秒补充rate个令牌，最多积累burst个，每个请求消耗一个令牌
+    （按字节限速时每个字节一个令牌）。服务器要求等待（Retry-After）时暂停发放令牌。
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"无效的限速设置: rate={rate}, burst={burst}")
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self, count):
+        """取走count个令牌，返回需要等待的秒数（令牌可以预支，等待后即可使用）"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= count
+            wait = max(0, -self._tokens / self.rate)
+            return max(wait, self._paused_until - now)
+
+    def acquire(self, timeout=None, count=1):
+        """
+        等待并取得令牌
+
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+            count: 需要的令牌数，可以大于burst
+
+        Returns:
+            bool: 是否取得令牌，超时时不消耗令牌
+        """
+        wait = self._reserve(count)
+        if timeout is not None and wait > timeout:
+            with self._lock:
+                self._tokens += count
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def pause(self, seconds):
+        """在接下来的seconds秒内不发放令牌"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    连续失败failure_threshold次后断开，reset_timeout秒内的请求直接失败；
+    之后放行一个试探请求，成功则恢复，失败则再断开reset_timeout秒。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """当前是否可以发出请求"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                # 只放行一个试探请求，结果返回前其他请求仍然直接失败
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def cancel_probe(self):
+        """放行的试探请求没有发出时调用，下一个请求可以立即试探"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            # 已断开时不再推迟试探的时间，断开前发出的请求陆续失败也不会一直断开
+            if self.state == self.OPEN:
+                return
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = self._clock()
+
+
+def parse_retry_after(value):
+    """
+    解析Retry-After响应头
+
+    Returns:
+        float: 需要等待的秒数，无法解析时返回None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class HostPolicy:
+    """
+    按主机的请求策略
+
+    同一主机的所有请求（搜索和下载）共用一个令牌桶和一个熔断器。
+    失败的请求按指数退避加随机抖动重试，服务器返回429或503时
+    按Retry-After等待，并在等待期间暂停该主机的所有请求。
+    """
+
+    # 可以重试的状态码
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(self, rate=5, burst=10, max_retries=3, base_delay=0.5, max_delay=30,
+                 failure_threshold=5, reset_timeout=30, rng=None):
+        """
+        Args:
+            rate: 每个主机每秒的请求数
+            burst: 每个主机允许的突发请求数
+            max_retries: 最多重试次数
+            base_delay: 第一次重试前的最长等待时间（秒），之后每次加倍
+            max_delay: 重试等待时间的上限（秒）
+            failure_threshold: 熔断前允许的连续失败次数
+            reset_timeout: 熔断后再次试探的间隔（秒）
+            rng: 随机数生成器
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._rng = rng or random.Random()
+        self._hosts = {}    # 主机 -> (TokenBucket, CircuitBreaker)
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = (
+                    TokenBucket(self.rate, self.burst),
+                    CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                )
+            return state
+
+    def backoff(self, attempt):
+        """第attempt次重试（从0开始）前的等待时间：指数退避加完全随机抖动"""
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def before_request(self, url, deadline=None):
+        """
+        发出请求前检查熔断器并等待令牌
+
+        Args:
+            url: 请求的URL
+            deadline: time.monotonic()表示的截止时间，None表示不限
+
+        Raises:
+            CircuitOpenError: 主机处于熔断状态
+            requests.exceptions.Timeout: 截止时间前等不到令牌
+        """
+        bucket, breaker = self._host(url)
+        if not breaker.allow():
+            raise CircuitOpenError(f"主机暂时不可用: {urlsplit(url).netloc}")
+        timeout = None if deadline is None else max(0, deadline - time.monotonic())
+        if not bucket.acquire(timeout):
+            breaker.cancel_probe()
+            raise requests.exceptions.Timeout(f"等待限速超时: {urlsplit(url).netloc}")
+
+    def record_success(self, url):
+        self._host(url)[1].record_success()
+
+    def record_failure(self, url):
+        self._host(url)[1].record_failure()
+
+    def request(self, url, send, deadline=None):
+        """
+        按策略发送请求，失败时重试
+
+        Args:
+            url: 请求的URL，用于区分主机
+            send: 没有参数的函数，发出请求并返回响应
+            deadline: time.monotonic()表示的截止时间，None表示不限
+
+        Returns:
+            requests.Response: 成功的响应；重试用完时返回最后一次的响应
+
+        Raises:
+            requests.exceptions.RequestException: 请求失败且重试用完
+        """
+        bucket, breaker = self._host(url)
+        attempt = 0
+        while True:
+            self.before_request(url, deadline)
+            try:
+                response = send()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.record_failure(url)
+                delay = self.backoff(attempt)
+                if attempt >= self.max_retries or not self._can_wait(delay, deadline):
+                    raise
+            except BaseException:
+                # 其他错误（例如URL无效）不说明主机故障，但放行的试探请求必须归还，
+                # 否则熔断器一直停在半开状态，之后的请求全部被拒绝
+                breaker.cancel_probe()
+                raise
+            else:
+                if response.status_code not in self.RETRY_STATUS:
+                    # 4xx说明主机正常，只是请求本身有问题
+                    self.record_success(url)
+                    return response
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if response.status_code == 429:
+                    # 限速不是主机故障，不计入熔断
+                    self.record_success(url)
+                else:
+                    self.record_failure(url)
+                if retry_after is not None:
+                    bucket.pause(retry_after)
+                    delay = retry_after
+                else:
+                    delay = self.backoff(attempt)
+                if attempt >= self.max_retries or delay > self.max_delay or not self._can_wait(delay, deadline):
+                    return response
+                response.close()
+
+            print(f"请求 {url} 失败，{delay:.1f}秒后重试 ({attempt + 1}/{self.max_retries})...")
+            time.sleep(delay)
+            attempt += 1
+
+    def _can_wait(self, delay, deadline):
+        return deadline is None or time.monotonic() + delay < deadline
+
+    def stats(self):
+        """
+        各主机的状态
+
+        Returns:
+            dict: 主机 -> 熔断器状态（closed、open或half_open）
+        """
+        with self._lock:
+            return {host: breaker.state for host, (bucket, breaker) in self._hosts.items()}
@@ -0,0 +1,124 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+
+
+class _CountingAdapter(HTTPAdapter):
+    """记录被淘汰的连接池的统计数据，保证统计结果不会因为淘汰而变小"""
+
+    def __init__(self, *args, **kwargs):
+        self.retired_requests = 0
+        self.retired_connections = 0
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        pools = self.poolmanager.pools
+        dispose = pools.dispose_func
+
+        def retire(pool):
+            self.retired_requests += pool.num_requests
+            self.retired_connections += pool.num_connections
+            if dispose:
+                dispose(pool)
+
+        pools.dispose_func = retire
+
+
+class HttpSessionPool:
+    """
+    线程共享的HTTP连接池
+
+    每个线程使用自己的requests.Session（Session本身不保证线程安全），
+    所有Session挂载同一个适配器，因此共用urllib3的连接池：同一主机的请求
+    复用已经建立的TCP/TLS连接，不需要每次重新握手。
+    """
+
+    def __init__(self, pool_size=4, max_hosts=10, connect_timeout=5, read_timeout=30, headers=None):
+        """
+        Args:
+            pool_size: 每个主机保留的最大连接数，应不小于并发下载数
+            max_hosts: 保留连接池的最大主机数
+            connect_timeout: 建立连接的超时时间（秒）
+            read_timeout: 等待响应数据的超时时间（秒）
+            headers: 额外的默认请求头
+        """
+        if pool_size < 1:
+            raise ValueError(f"连接池大小必须大于0: {pool_size}")
+
+        self.timeout = (connect_timeout, read_timeout)
+        self.headers = dict(DEFAULT_HEADERS)
+        if headers:
+            self.headers.update(headers)
+
+        # 重试由调用方控制，适配器本身不重试
+        self._adapter = _CountingAdapter(pool_connections=max_hosts, pool_maxsize=pool_size, max_retries=0)
+        self._local = threading.local()
+        self._closed = False
+
+    @property
+    def session(self):
+        """当前线程使用的Session"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            if self._closed:
+                raise RuntimeError("连接池已关闭")
+            session = requests.Session()
+            session.headers.update(self.headers)
+            session.mount('http://', self._adapter)
+            session.mount('https://', self._adapter)
+            self._local.session = session
+        return session
+
+    def get(self, url, **kwargs):
+        """发送GET请求，未指定timeout时使用连接池的连接和读取超时"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def stats(self):
+        """
+        连接池的统计数据
+
+        Returns:
+            dict: requests为发出的请求数，connections为新建的连接数，
+                  reuse_ratio为复用已有连接的请求比例，
+                  open_connections为当前空闲保持的连接数，hosts为保留连接池的主机数
+        """
+        adapter = self._adapter
+        total_requests = adapter.retired_requests
+        total_connections = adapter.retired_connections
+        open_connections = 0
+
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            try:
+                pool = pools[key]
+            except KeyError:
+                # 读取期间已被淘汰
+                continue
+            total_requests += pool.num_requests
+            total_connections += pool.num_connections
+            queue = pool.pool
+            if queue is not None:
+                # 队列中的None是尚未建立连接的空位
+                open_connections += sum(1 for conn in list(queue.queue) if conn is not None and conn.sock is not None)
+
+        reused = max(0, total_requests - total_connections)
+        return {
+            'requests': total_requests,
+            'connections': total_connections,
+            'reuse_ratio': reused / total_requests if total_requests else 0.0,
+            'open_connections': open_connections,
+            'hosts': len(pools),
+        }
+
+    def close(self):
+        """关闭所有连接"""
+        self._closed = True
+        self._adapter.close()
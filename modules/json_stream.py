@@ -0,0 +1,126 @@
+import re
+import json
+import codecs
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# 数字后面可能接着出现的字符，值在这些字符之后结束时不能确定数字已经完整
+_NUMBER_TAIL = re.compile(r'[0-9+\-.eE]*')
+
+
+def iter_array_items(chunks, keys, encoding='utf-8-sig'):
+    """
+    从分块到达的JSON数据中逐个取出顶层对象里某个数组的元素
+
+    只解析到需要的位置：调用方停止迭代后不再读取后面的数据，
+    内存中只保留当前元素和未解析完的一块数据。顶层对象中排在数组前面的
+    其他字段要完整解析一遍才能跳过。
+
+    Args:
+        chunks: bytes块的可迭代对象，例如response.iter_content()
+        keys: 要读取的数组的字段名，取文档中第一个值为数组的字段
+        encoding: 数据的编码
+
+    Yields:
+        (字段名, 元素)：元素是json.loads得到的对象
+
+    Raises:
+        ValueError: JSON格式错误或数据不完整（已取出的元素仍然有效）
+    """
+    reader = _JsonReader(chunks, encoding)
+    # 顶层不是对象时没有要找的字段
+    if reader.peek() != '{':
+        return
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise ValueError(f"JSON格式错误: 字段名不是字符串: {key!r}")
+        reader.expect(':')
+        if key in keys and reader.peek() == '[':
+            reader.expect('[')
+            if reader.peek() == ']':
+                return
+            while True:
+                yield key, reader.value()
+                if reader.next_char() == ']':
+                    return
+                reader.unread()
+                reader.expect(',')
+        reader.value()
+        if reader.next_char() == '}':
+            return
+        reader.unread()
+        reader.expect(',')
+
+
+class _JsonReader:
+    """按需从bytes块中解码文本，逐个解析JSON值"""
+
+    def __init__(self, chunks, encoding):
+        self._chunks = iter(chunks)
+        self._text_decoder = codecs.getincrementaldecoder(encoding)()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """丢弃已解析的文本，再读入一块数据"""
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self._buffer += self._text_decoder.decode(chunk)
+                return
+        self._buffer += self._text_decoder.decode(b'', final=True)
+        self._eof = True
+
+    def peek(self):
+        """跳过空白，返回下一个字符但不取出"""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if self._eof:
+                raise ValueError("JSON数据不完整")
+            self._fill()
+
+    def next_char(self):
+        """跳过空白，取出下一个字符"""
+        char = self.peek()
+        self._pos += 1
+        return char
+
+    def unread(self):
+        """放回刚取出的字符"""
+        self._pos -= 1
+
+    def expect(self, char):
+        found = self.next_char()
+        if found != char:
+            raise ValueError(f"JSON格式错误: 应为 {char!r}，实际为 {found!r}")
+
+    def value(self):
+        """解析下一个完整的JSON值"""
+        self.peek()
+        retry_at = 0
+        while True:
+            pending = len(self._buffer) - self._pos
+            # 值还没读完时，等数据量翻倍再重新解析，重复解析的总量不超过值长度的常数倍
+            if pending >= retry_at or self._eof:
+                try:
+                    value, end = self._json_decoder.raw_decode(self._buffer, self._pos)
+                except ValueError:
+                    if self._eof:
+                        raise
+                else:
+                    # 数字可能在"1."、"1e"这样的位置被分块截断，解析出的值后面直到文本末尾
+                    # 都可能是数字的一部分时，要多读一块再确定
+                    if self._eof or _NUMBER_TAIL.match(self._buffer, end).end() < len(self._buffer):
+                        self._pos = end
+                        return value
+                retry_at = pending * 2
+            self._fill()
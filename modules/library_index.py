@@ -0,0 +1,304 @@
+import os
+import sqlite3
+import threading
+from modules.folder_scanner import list_audio_directory
+
+# 默认缓存目录，用于存放音乐库索引等持久化数据
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".music_player")
+
+
+class LibraryIndex:
+    """
+    基于SQLite的本地音乐库索引
+
+    以文件路径为键记录每个音频文件的大小和修改时间，并记录每个目录的修改时间。
+    增量扫描时，修改时间未变化的目录直接使用索引中的内容，不再列出目录，
+    只有新增、修改或删除的条目才会写入数据库。
+    """
+
+    def __init__(self, db_path=None):
+        if db_path is None:
+            db_path = os.path.join(DEFAULT_CACHE_DIR, "library.db")
+
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        try:
+            if db_path != ":memory:":
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        except (OSError, sqlite3.Error) as e:
+            # 缓存目录不可写时退化为内存索引，仍然可以在本次运行中加速
+            print(f"无法打开音乐库索引 {db_path}: {str(e)}")
+            self.db_path = ":memory:"
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+
+        self._create_tables()
+
+    def _create_tables(self):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS directories ("
+                "path TEXT PRIMARY KEY, parent TEXT, mtime REAL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tracks ("
+                "path TEXT PRIMARY KEY, directory TEXT, size INTEGER, mtime REAL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_tracks_directory ON tracks(directory)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime REAL, "
+                "title TEXT, artist TEXT, album TEXT, duration REAL)"
+            )
+
+    @staticmethod
+    def _subtree_bounds(folder_path):
+        """返回用于范围查询的子路径前缀上下界"""
+        prefix = folder_path.rstrip("\\/") + os.sep
+        # 以prefix开头的路径都小于把末尾的分隔符换成下一个字符的字符串；
+        # 用prefix + "\uffff"作上界会漏掉下一个字符在BMP之外（例如emoji）的路径
+        return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+    def begin_refresh(self, folder_path, is_audio_file, full=False):
+        """
+        开始一次增量更新
+
+        返回的会话对象提供list_directory方法，可以交给FolderScanner并发调用；
+        遍历结束后调用finish提交变化。
+
+        Args:
+            folder_path: 根文件夹路径（应为绝对路径）
+            is_audio_file: 判断文件名是否为音频文件的函数
+            full: 为True时忽略目录修改时间，重新检查所有文件
+
+        Returns:
+            IndexRefresh: 增量更新会话
+        """
+        return IndexRefresh(self, folder_path, is_audio_file, full)
+
+    def _remove_subtree(self, dir_path, delta):
+        """从索引中删除目录及其所有子目录和文件（调用方需持有锁）"""
+        low, high = self._subtree_bounds(dir_path)
+        removed = [
+            row[0] for row in self._conn.execute(
+                "SELECT path FROM tracks WHERE directory = ? OR (directory >= ? AND directory < ?)",
+                (dir_path, low, high)
+            )
+        ]
+        self._conn.execute(
+            "DELETE FROM tracks WHERE directory = ? OR (directory >= ? AND directory < ?)",
+            (dir_path, low, high)
+        )
+        self._conn.execute(
+            "DELETE FROM directories WHERE path = ? OR (path >= ? AND path < ?)",
+            (dir_path, low, high)
+        )
+        delta['removed'].extend(removed)
+
+    def get_tracks(self, folder_path):
+        """
+        从索引中读取文件夹下的所有音乐文件
+
+        Args:
+            folder_path: 根文件夹路径
+
+        Returns:
+            list: (路径, 大小, 修改时间) 元组列表
+        """
+        low, high = self._subtree_bounds(folder_path)
+        with self._lock:
+            return self._conn.execute(
+                "SELECT path, size, mtime FROM tracks "
+                "WHERE directory = ? OR (directory >= ? AND directory < ?)",
+                (folder_path, low, high)
+            ).fetchall()
+
+    def get_directories(self, folder_path):
+        """
+        从索引中读取文件夹下的所有子目录
+
+        Args:
+            folder_path: 根文件夹路径
+
+        Returns:
+            list: 子目录路径列表，文件夹尚未扫描时为空列表
+        """
+        low, high = self._subtree_bounds(folder_path)
+        with self._lock:
+            return [
+                row[0] for row in self._conn.execute(
+                    "SELECT path FROM directories WHERE path >= ? AND path < ?", (low, high)
+                )
+            ]
+
+    def get_metadata(self, entries):
+        """
+        读取缓存的音频元数据，文件大小或修改时间变化的条目视为未命中
+
+        Args:
+            entries: (路径, 大小, 修改时间) 元组列表
+
+        Returns:
+            dict: 以路径为键、元数据字典为值的字典，只包含命中的条目
+        """
+        results = {}
+        with self._lock:
+            for path, size, mtime in entries:
+                row = self._conn.execute(
+                    "SELECT size, mtime, title, artist, album, duration FROM metadata WHERE path = ?",
+                    (path,)
+                ).fetchone()
+                if row and row[0] == size and row[1] == mtime:
+                    results[path] = {
+                        'title': row[2], 'artist': row[3], 'album': row[4], 'duration': row[5]
+                    }
+        return results
+
+    def store_metadata(self, records):
+        """
+        缓存音频元数据
+
+        Args:
+            records: (路径, 大小, 修改时间, 元数据字典) 元组列表
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO metadata "
+                "(path, size, mtime, title, artist, album, duration) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (path, size, mtime, m['title'], m['artist'], m['album'], m['duration'])
+                    for path, size, mtime, m in records
+                ]
+            )
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+class IndexRefresh:
+    """
+    LibraryIndex的一次增量更新会话
+
+    list_directory可以在多个线程中并发调用：目录读取在锁外进行，
+    只有写入索引时才持有锁。所有写入在finish时一次性提交。
+    """
+
+    def __init__(self, index, folder_path, is_audio_file, full):
+        self.index = index
+        self.folder_path = folder_path
+        self.is_audio_file = is_audio_file
+        self.full = full
+        self.delta = {'added': [], 'changed': [], 'removed': []}
+
+        # 一次性读出该文件夹下所有已知目录，避免逐个查询
+        self._known_dirs = {}
+        self._children = {}
+        low, high = index._subtree_bounds(folder_path)
+        with index._lock:
+            rows = index._conn.execute(
+                "SELECT path, parent, mtime FROM directories "
+                "WHERE path = ? OR (path >= ? AND path < ?)",
+                (folder_path, low, high)
+            )
+            for path, parent, mtime in rows:
+                self._known_dirs[path] = mtime
+                self._children.setdefault(parent, []).append(path)
+
+    def list_directory(self, dir_path, dir_stat):
+        """
+        列出单个目录：未变化的目录从索引读取，否则重新读取并更新索引
+
+        Args:
+            dir_path: 目录路径
+            dir_stat: 目录的stat结果，目录不存在时为None
+
+        Returns:
+            tuple: (文件列表, 子目录列表)，目录不存在时返回None
+        """
+        conn = self.index._conn
+
+        if dir_stat is None:
+            with self.index._lock:
+                self.index._remove_subtree(dir_path, self.delta)
+            return None
+
+        if not self.full and self._known_dirs.get(dir_path) == dir_stat.st_mtime:
+            # 目录内容未变化，直接沿用索引中的文件和子目录
+            with self.index._lock:
+                files = conn.execute(
+                    "SELECT path, size, mtime FROM tracks WHERE directory = ?", (dir_path,)
+                ).fetchall()
+            return files, self._children.get(dir_path, [])
+
+        listing = list_audio_directory(dir_path, self.is_audio_file)
+
+        with self.index._lock:
+            if listing is None:
+                self.index._remove_subtree(dir_path, self.delta)
+                return None
+
+            files, subdirs = listing
+            stored = {
+                path: (size, mtime)
+                for path, size, mtime in conn.execute(
+                    "SELECT path, size, mtime FROM tracks WHERE directory = ?", (dir_path,)
+                )
+            }
+
+            updates = []
+            for path, size, mtime in files:
+                old = stored.pop(path, None)
+                if old is None:
+                    self.delta['added'].append(path)
+                elif old != (size, mtime):
+                    self.delta['changed'].append(path)
+                else:
+                    continue
+                updates.append((path, dir_path, size, mtime))
+
+            if updates:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO tracks (path, directory, size, mtime) VALUES (?, ?, ?, ?)",
+                    updates
+                )
+
+            # stored中剩下的就是已被删除的文件
+            if stored:
+                conn.executemany("DELETE FROM tracks WHERE path = ?", [(p,) for p in stored])
+                self.delta['removed'].extend(stored)
+
+            # 删除已经不存在的子目录
+            current = set(subdirs)
+            for old_dir in self._children.get(dir_path, []):
+                if old_dir not in current:
+                    self.index._remove_subtree(old_dir, self.delta)
+
+            # 先登记子目录（修改时间未知），即使扫描中途停止，下次也能找到并读取它们
+            conn.executemany(
+                "INSERT OR IGNORE INTO directories (path, parent, mtime) VALUES (?, ?, NULL)",
+                [(subdir, dir_path) for subdir in subdirs]
+            )
+
+            # 记录读取前的修改时间，读取过程中发生的变化会在下次扫描时发现
+            conn.execute(
+                "INSERT OR REPLACE INTO directories (path, parent, mtime) VALUES (?, ?, ?)",
+                (dir_path, os.path.dirname(dir_path), dir_stat.st_mtime)
+            )
+
+        return listing
+
+    def finish(self):
+        """
+        提交本次更新
+
+        Returns:
+            dict: 本次扫描的变化，包含added、changed、removed三个路径列表
+        """
+        with self.index._lock:
+            self.index._conn.commit()
+        return self.delta
@@ -0,0 +1,199 @@
+import os
+import time
+import bisect
+from array import array
+from modules.track_store import TrackStore
+
+
+class LibrarySnapshot:
+    """
+    音乐库快照
+
+    保存一次扫描得到的所有音乐文件及其大小、修改时间，在此基础上提供
+    总大小、按艺术家分组、按文件夹分组和按修改时间排序等派生视图。
+    派生视图在第一次使用时计算并缓存，快照更新时只让受影响的视图失效：
+    文件增删会让所有视图失效，文件内容变化不影响按文件夹分组的视图。
+
+    文件只以TrackStore中的歌曲ID保存，大小和修改时间放在按行排列的数组中。
+    """
+
+    # 文件增删影响所有视图；文件内容变化影响大小、修改时间和标签相关的视图
+    _MEMBERSHIP_VIEWS = ('total_size', 'by_mtime', 'by_artist', 'by_folder')
+    _CONTENT_VIEWS = ('total_size', 'by_mtime', 'by_artist')
+
+    def __init__(self, folder_path, entries, artist_lookup, store=None):
+        """
+        Args:
+            folder_path: 根文件夹路径
+            entries: (路径, 大小, 修改时间) 元组
+            artist_lookup: 根据路径列表返回 {路径: 艺术家} 字典的函数
+            store: 共用的路径存储，为None时单独创建
+        """
+        self.folder_path = folder_path
+        self.artist_lookup = artist_lookup
+        self.store = store if store is not None else TrackStore()
+
+        self._tracks = array('i')       # 行 -> 歌曲ID
+        self._sizes = array('q')        # 行 -> 文件大小
+        self._mtimes = array('d')       # 行 -> 修改时间
+        self._rows = array('i')         # 歌曲ID -> 行，不在快照中为-1
+        self._views = {}
+
+        for path, size, mtime in entries:
+            self._set(path, size, mtime)
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def __contains__(self, path):
+        track_id = self.store.lookup(path)
+        return track_id is not None and self._row(track_id) >= 0
+
+    def _row(self, track_id):
+        return self._rows[track_id] if track_id < len(self._rows) else -1
+
+    def _set(self, path, size, mtime):
+        """添加或更新一个文件，返回 'added'、'changed' 或 None（没有变化）"""
+        track_id = self.store.add(path)
+        if track_id >= len(self._rows):
+            self._rows.extend([-1] * (len(self.store) - len(self._rows)))
+
+        row = self._rows[track_id]
+        if row < 0:
+            self._rows[track_id] = len(self._tracks)
+            self._tracks.append(track_id)
+            self._sizes.append(size)
+            self._mtimes.append(mtime)
+            return 'added'
+        if self._sizes[row] == size and self._mtimes[row] == mtime:
+            return None
+        self._sizes[row] = size
+        self._mtimes[row] = mtime
+        return 'changed'
+
+    def _remove(self, path):
+        """删除一个文件：与最后一行交换后弹出"""
+        track_id = self.store.lookup(path)
+        if track_id is None or self._row(track_id) < 0:
+            return False
+        row = self._rows[track_id]
+        self._rows[track_id] = -1
+
+        last_track = self._tracks.pop()
+        last_size = self._sizes.pop()
+        last_mtime = self._mtimes.pop()
+        if last_track != track_id:
+            self._tracks[row] = last_track
+            self._sizes[row] = last_size
+            self._mtimes[row] = last_mtime
+            self._rows[last_track] = row
+        return True
+
+    def paths(self):
+        """返回按文件名排序的所有音乐文件路径"""
+        store = self.store
+        return sorted((store.path(t) for t in self._tracks), key=lambda x: os.path.basename(x).lower())
+
+    def update(self, entries=(), removed=()):
+        """
+        更新快照
+
+        Args:
+            entries: 新增或修改的 (路径, 大小, 修改时间) 元组
+            removed: 删除的文件路径
+        """
+        membership_changed = False
+        content_changed = False
+
+        for path, size, mtime in entries:
+            result = self._set(path, size, mtime)
+            if result == 'added':
+                membership_changed = True
+            elif result == 'changed':
+                content_changed = True
+
+        for path in removed:
+            if self._remove(path):
+                membership_changed = True
+
+        if membership_changed:
+            invalidated = self._MEMBERSHIP_VIEWS
+        elif content_changed:
+            invalidated = self._CONTENT_VIEWS
+        else:
+            return
+        for name in invalidated:
+            self._views.pop(name, None)
+
+    def _view(self, name, compute):
+        if name not in self._views:
+            self._views[name] = compute()
+        return self._views[name]
+
+    @property
+    def total_size(self):
+        """所有音乐文件的总大小（字节）"""
+        return self._view('total_size', lambda: sum(self._sizes))
+
+    def by_artist(self):
+        """
+        按艺术家分组
+
+        Returns:
+            dict: 以艺术家为键，音乐文件列表为值的字典
+        """
+        def compute():
+            paths = self.paths()
+            artists = self.artist_lookup(paths)
+            organized = {}
+            for path in paths:
+                organized.setdefault(artists[path], []).append(path)
+            return organized
+
+        return self._view('by_artist', compute)
+
+    def by_folder(self):
+        """
+        按文件夹结构分组
+
+        Returns:
+            dict: 以相对文件夹路径为键，音乐文件列表为值的字典
+        """
+        def compute():
+            organized = {}
+            for path in self.paths():
+                relative_path = os.path.relpath(os.path.dirname(path), self.folder_path)
+                if relative_path == '.':
+                    relative_path = '根目录'
+                organized.setdefault(relative_path, []).append(path)
+            return organized
+
+        return self._view('by_folder', compute)
+
+    def recent(self, days=7, limit=None):
+        """
+        获取最近修改的音乐文件
+
+        Args:
+            days: 天数范围
+            limit: 最多返回的数量，为None时不限制
+
+        Returns:
+            list: 按修改时间倒序排列的音乐文件列表
+        """
+        # 缓存按修改时间倒序排列的歌曲ID和对应的负修改时间，不同的天数和数量只需要切片，
+        # 路径在返回时才拼接
+        neg_mtimes, track_ids = self._view('by_mtime', self._sort_by_mtime)
+
+        time_threshold = time.time() - (days * 24 * 3600)
+        end = bisect.bisect_left(neg_mtimes, -time_threshold)
+        if limit is not None:
+            end = min(end, limit)
+        return list(self.store.paths(track_ids[:end]))
+
+    def _sort_by_mtime(self):
+        store = self.store
+        rows = sorted(range(len(self._tracks)),
+                      key=lambda row: (-self._mtimes[row], store.path(self._tracks[row])))
+        return (array('d', (-self._mtimes[row] for row in rows)),
+                array('i', (self._tracks[row] for row in rows)))
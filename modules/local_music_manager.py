@@ -1,41 +1,185 @@
 import os
 import fnmatch
+import threading
+from modules.library_index import LibraryIndex
+from modules.folder_scanner import FolderScanner
+from modules.search_index import SearchIndex
+from modules.metadata_reader import MetadataReader
+from modules.library_snapshot import LibrarySnapshot
+from modules.track_store import TrackStore
 
 class LocalMusicManager:
-    def __init__(self):
+    def __init__(self, index_path=None):
         # 支持的音频文件格式
         self.supported_formats = [
             '*.mp3', '*.wav', '*.flac', '*.aac', '*.ogg', '*.wma',
             '*.m4a', '*.opus', '*.amr', '*.mid', '*.midi'
         ]
+        
+        # 持久化的音乐库索引，避免每次启动都完整遍历文件夹
+        self.library_index = LibraryIndex(index_path)
+        
+        # 并行扫描器，按设备限制并发读取的目录数
+        self.folder_scanner = FolderScanner()
+        
+        # 音频标签和时长读取器，结果缓存在音乐库索引中
+        self.metadata_reader = MetadataReader(self.library_index)
+        
+        # 音乐库快照、搜索索引和播放列表共用的紧凑路径存储
+        self.track_store = TrackStore()
+        
+        # 最近一次扫描的变化（新增、修改、删除的文件）
+        self.last_scan_delta = None
+        
+        # 文件名搜索索引，首次搜索时建立，之后随扫描结果增量更新
+        self.search_index = None
+        self._search_folder = None
+        
+        # 各文件夹的音乐库快照，用于统计和分组视图
+        self._snapshots = {}
+        
+        # 扫描线程和文件监视器在后台线程中更新搜索索引和快照，界面线程同时在查询，
+        # 所有读写都持有这个锁
+        self._library_lock = threading.RLock()
     
-    def scan_folder(self, folder_path):
+    def scan_folder(self, folder_path, incremental=True):
         """
         扫描指定文件夹中的所有音乐文件
         
+        默认使用增量扫描：修改时间未变化的目录直接从索引读取，
+        只有新增、修改或删除的文件才会更新索引。
+        
         Args:
             folder_path: 要扫描的文件夹路径
+            incremental: 为False时重新检查所有文件的大小和修改时间
             
         Returns:
             list: 音乐文件的完整路径列表
         """
-        if not os.path.exists(folder_path) or not os.path.isdir(folder_path):
-            raise ValueError(f"无效的文件夹路径: {folder_path}")
-        
         music_files = []
-        
-        # 遍历文件夹及其子文件夹
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if self._is_audio_file(file):
-                    full_path = os.path.join(root, file)
-                    music_files.append(full_path)
+        for batch in self.iter_scan_folder(folder_path, incremental):
+            music_files.extend(batch)
         
         # 按照文件名排序
         music_files.sort(key=lambda x: os.path.basename(x).lower())
         
         return music_files
     
+    def iter_scan_folder(self, folder_path, incremental=True, with_stats=False):
+        """
+        并行扫描文件夹，分批返回音乐文件
+        
+        结果按发现顺序返回，不做排序，适合在界面上逐步显示。
+        
+        Args:
+            folder_path: 要扫描的文件夹路径
+            incremental: 为False时重新检查所有文件的大小和修改时间
+            with_stats: 为True时返回 (路径, 大小, 修改时间) 元组
+            
+        Yields:
+            list: 一批音乐文件的完整路径
+        """
+        if not os.path.exists(folder_path) or not os.path.isdir(folder_path):
+            raise ValueError(f"无效的文件夹路径: {folder_path}")
+        
+        folder_path = os.path.abspath(folder_path)
+        
+        refresh = self.library_index.begin_refresh(
+            folder_path, self._is_audio_file, full=not incremental
+        )
+        try:
+            for batch in self.folder_scanner.scan(folder_path, refresh.list_directory):
+                if with_stats:
+                    yield batch
+                else:
+                    yield [path for path, size, mtime in batch]
+        finally:
+            self.last_scan_delta = refresh.finish()
+            delta = self.last_scan_delta
+            self.apply_file_changes(delta['added'], delta['removed'], delta['changed'])
+    
+    def refresh_folder(self, folder_path):
+        """
+        增量扫描文件夹，只返回变化的部分
+        
+        Args:
+            folder_path: 要扫描的文件夹路径
+            
+        Returns:
+            dict: 包含added、changed、removed三个路径列表的字典
+        """
+        for batch in self.iter_scan_folder(folder_path):
+            pass
+        return self.last_scan_delta
+    
+    def apply_file_changes(self, added=(), removed=(), changed=()):
+        """
+        把扫描或文件监视器发现的变化同步到搜索索引和音乐库快照
+        
+        Args:
+            added: 新增的文件路径
+            removed: 删除的文件路径
+            changed: 内容发生变化的文件路径
+        """
+        with self._library_lock:
+            if self.search_index is not None:
+                prefix = self._search_folder.rstrip(os.sep) + os.sep
+                self.search_index.update(
+                    [path for path in added if path.startswith(prefix)],
+                    [path for path in removed if path.startswith(prefix)]
+                )
+            if not self._snapshots:
+                return
+        
+        # 只有新增和修改的文件需要重新获取大小和修改时间（不持有锁）
+        entries = []
+        for path in list(added) + list(changed):
+            try:
+                stats = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stats.st_size, stats.st_mtime))
+        
+        with self._library_lock:
+            for folder_path, snapshot in self._snapshots.items():
+                prefix = folder_path.rstrip(os.sep) + os.sep
+                snapshot.update(
+                    [entry for entry in entries if entry[0].startswith(prefix)],
+                    [path for path in removed if path.startswith(prefix)]
+                )
+    
+    def get_snapshot(self, folder_path):
+        """
+        获取文件夹的音乐库快照
+        
+        第一次调用时遍历一次文件夹建立快照，之后由扫描和文件监视器增量更新。
+        
+        Args:
+            folder_path: 音乐文件夹路径
+            
+        Returns:
+            LibrarySnapshot: 音乐库快照
+        """
+        folder_path = os.path.abspath(folder_path)
+        with self._library_lock:
+            snapshot = self._snapshots.get(folder_path)
+        if snapshot is None:
+            # 扫描时不持有锁，扫描结束时的变化由apply_file_changes同步到已有的快照
+            entries = []
+            for batch in self.iter_scan_folder(folder_path, with_stats=True):
+                entries.extend(batch)
+            snapshot = LibrarySnapshot(folder_path, entries, self._lookup_artists, self.track_store)
+            with self._library_lock:
+                snapshot = self._snapshots.setdefault(folder_path, snapshot)
+        return snapshot
+    
+    def _lookup_artists(self, file_paths):
+        metadata = self.get_metadata_batch(file_paths)
+        return {
+            path: metadata[path]['artist'] if path in metadata else self._extract_artist(path)
+            for path in file_paths
+        }
+    
     def _is_audio_file(self, filename):
         """
         检查文件是否为支持的音频格式
@@ -76,12 +220,55 @@ class LocalMusicManager:
             'format': os.path.splitext(file_path)[1].lower()
         }
         
-        # 尝试获取音频元数据（这里只是基础实现，实际项目中可以使用mutagen等库）
-        info['title'] = self._extract_title(file_path)
-        info['artist'] = self._extract_artist(file_path)
+        # 读取音频标签，没有标签时从文件名推测标题和艺术家
+        metadata = self.metadata_reader.read(file_path)
+        info['title'] = metadata['title'] or self._extract_title(file_path)
+        info['artist'] = metadata['artist'] or self._extract_artist(file_path)
+        info['album'] = metadata['album']
+        info['duration'] = metadata['duration']
         
         return info
     
+    def read_ahead(self, file_path, max_bytes=64 * 1024 * 1024):
+        """
+        把音频文件提前读入系统缓存，开始播放时不需要等待磁盘
+        
+        Args:
+            file_path: 音频文件路径
+            max_bytes: 不支持posix_fadvise时最多读取的字节数
+        """
+        try:
+            with open(file_path, 'rb') as f:
+                if hasattr(os, 'posix_fadvise'):
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+                    return
+                remaining = max_bytes
+                while remaining > 0:
+                    chunk = f.read(min(remaining, 1024 * 1024))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+        except OSError as e:
+            print(f"预读文件 {file_path} 失败: {str(e)}")
+    
+    def get_metadata_batch(self, file_paths):
+        """
+        批量获取音频文件的标题、艺术家、专辑和时长
+        
+        已缓存且未修改的文件直接使用缓存，其余文件在进程池中并行解析。
+        
+        Args:
+            file_paths: 音频文件路径列表
+            
+        Returns:
+            dict: 以文件路径为键、元数据字典为值的字典
+        """
+        results = self.metadata_reader.read_batch(file_paths)
+        for path, metadata in results.items():
+            metadata['title'] = metadata['title'] or self._extract_title(path)
+            metadata['artist'] = metadata['artist'] or self._extract_artist(path)
+        return results
+    
     def _extract_title(self, file_path):
         """
         尝试从文件名提取歌曲标题
@@ -127,26 +314,33 @@ class LocalMusicManager:
         # 如果无法提取，返回"未知艺术家"
         return "未知艺术家"
     
-    def search_local_music(self, folder_path, keyword):
+    def search_local_music(self, folder_path, keyword, offset=0, limit=None):
         """
         在本地音乐库中搜索指定关键词的音乐
         
+        第一次搜索时扫描文件夹并建立搜索索引，之后的搜索直接查询索引。
+        
         Args:
             folder_path: 音乐文件夹路径
             keyword: 搜索关键词
+            offset: 分页起始位置
+            limit: 每页数量，为None时返回全部结果
             
         Returns:
-            list: 匹配的音乐文件路径列表
+            list: 按相关度排序的匹配音乐文件路径列表
         """
-        all_music = self.scan_folder(folder_path)
-        keyword = keyword.lower()
-        
-        results = []
-        for music_file in all_music:
-            filename = os.path.basename(music_file).lower()
-            if keyword in filename:
-                results.append(music_file)
-        
+        folder_path = os.path.abspath(folder_path)
+        with self._library_lock:
+            ready = self.search_index is not None and self._search_folder == folder_path
+        if not ready:
+            # 扫描时不持有锁
+            index = SearchIndex(self.scan_folder(folder_path), store=self.track_store)
+            with self._library_lock:
+                self.search_index = index
+                self._search_folder = folder_path
+        
+        with self._library_lock:
+            total, results = self.search_index.search(keyword, offset, limit)
         return results
     
     def get_folder_size(self, folder_path):
@@ -159,17 +353,9 @@ class LocalMusicManager:
         Returns:
             int: 文件夹总大小（字节）
         """
-        if not os.path.exists(folder_path) or not os.path.isdir(folder_path):
-            raise ValueError(f"无效的文件夹路径: {folder_path}")
-        
-        total_size = 0
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if self._is_audio_file(file):
-                    file_path = os.path.join(root, file)
-                    total_size += os.path.getsize(file_path)
-        
-        return total_size
+        snapshot = self.get_snapshot(folder_path)
+        with self._library_lock:
+            return snapshot.total_size
     
     def organize_music_by_artist(self, folder_path):
         """
@@ -181,16 +367,9 @@ class LocalMusicManager:
         Returns:
             dict: 以艺术家为键，音乐文件列表为值的字典
         """
-        all_music = self.scan_folder(folder_path)
-        organized = {}
-        
-        for music_file in all_music:
-            artist = self._extract_artist(music_file)
-            if artist not in organized:
-                organized[artist] = []
-            organized[artist].append(music_file)
-        
-        return organized
+        snapshot = self.get_snapshot(folder_path)
+        with self._library_lock:
+            return snapshot.by_artist()
     
     def organize_music_by_folder(self, folder_path):
         """
@@ -202,50 +381,22 @@ class LocalMusicManager:
         Returns:
             dict: 以相对文件夹路径为键，音乐文件列表为值的字典
         """
-        organized = {}
-        
-        for root, dirs, files in os.walk(folder_path):
-            # 获取相对路径
-            relative_path = os.path.relpath(root, folder_path)
-            if relative_path == '.':
-                relative_path = '根目录'
-            
-            # 收集此文件夹中的音频文件
-            music_files = []
-            for file in files:
-                if self._is_audio_file(file):
-                    full_path = os.path.join(root, file)
-                    music_files.append(full_path)
-            
-            if music_files:
-                organized[relative_path] = music_files
-        
-        return organized
+        snapshot = self.get_snapshot(folder_path)
+        with self._library_lock:
+            return snapshot.by_folder()
     
-    def get_recently_added(self, folder_path, days=7):
+    def get_recently_added(self, folder_path, days=7, limit=None):
         """
         获取最近添加的音乐文件
         
         Args:
             folder_path: 音乐文件夹路径
             days: 天数范围
+            limit: 最多返回的数量，为None时不限制
             
         Returns:
             list: 最近添加的音乐文件列表
         """
-        import time
-        
-        all_music = self.scan_folder(folder_path)
-        recent_files = []
-        
-        # 计算时间阈值
-        time_threshold = time.time() - (days * 24 * 3600)
-        
-        for music_file in all_music:
-            if os.path.getmtime(music_file) > time_threshold:
-                recent_files.append(music_file)
-        
-        # 按修改时间倒序排序
-        recent_files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-        
-        return recent_files
\ No newline at end of file
+        snapshot = self.get_snapshot(folder_path)
+        with self._library_lock:
+            return snapshot.recent(days, limit)
@@ -0,0 +1,596 @@
+import os
+import struct
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# 读取文件头部时的最大字节数，避免读入整首歌曲
+HEADER_READ_LIMIT = 256 * 1024
+TRAILER_READ_SIZE = 64 * 1024
+
+# MPEG音频帧头中的比特率表（kbps），按 [版本][层] 索引
+_MP3_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {
+    1: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    2.5: [11025, 12000, 8000],
+}
+# ADTS帧头中的采样率表，按采样率索引
+_AAC_SAMPLE_RATES = [96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350]
+
+
+def _empty_metadata():
+    return {'title': None, 'artist': None, 'album': None, 'duration': None}
+
+
+def _decode_text(data):
+    """解码没有声明编码的标签文本，兼容常见的GBK编码中文标签"""
+    data = data.split(b'\x00', 1)[0]
+    for encoding in ('utf-8', 'gbk', 'latin-1'):
+        try:
+            return data.decode(encoding).strip() or None
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+def _parse_mp3_frame_header(header):
+    """
+    解析MPEG音频帧头
+
+    Returns:
+        dict: 包含version、layer、bitrate、sample_rate、mono等字段，无效帧头返回None
+    """
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+
+    version_bits = (header[1] >> 3) & 0x03
+    layer_bits = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    version = {0: 2.5, 2: 2, 3: 1}[version_bits]
+    layer = 4 - layer_bits
+    bitrate = _MP3_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][sample_rate_index]
+    padding = (header[2] >> 1) & 0x01
+
+    if layer == 1:
+        samples_per_frame = 384
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples_per_frame = 1152 if (layer == 2 or version == 1) else 576
+        frame_length = samples_per_frame // 8 * bitrate // sample_rate + padding
+
+    return {
+        'version': version,
+        'layer': layer,
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'samples_per_frame': samples_per_frame,
+        'frame_length': frame_length,
+        'mono': (header[3] >> 6) == 3,
+    }
+
+
+def _read_id3v2(f, metadata):
+    """读取ID3v2标签中的标题、艺术家和专辑，返回音频数据的起始位置"""
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b'ID3':
+        return 0
+
+    major = header[3]
+    flags = header[5]
+    tag_size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    tag_end = 10 + tag_size + (10 if flags & 0x10 else 0)
+
+    if major == 2:
+        frame_ids = {b'TT2': 'title', b'TP1': 'artist', b'TAL': 'album'}
+        frame_header_size = 6
+    else:
+        frame_ids = {b'TIT2': 'title', b'TPE1': 'artist', b'TALB': 'album'}
+        frame_header_size = 10
+
+    if flags & 0x40 and major >= 3:
+        # 跳过扩展头
+        ext = f.read(4)
+        ext_size = struct.unpack('>I', ext)[0] if major == 3 else (
+            (ext[0] << 21) | (ext[1] << 14) | (ext[2] << 7) | ext[3])
+        f.seek(ext_size - (0 if major == 3 else 4), os.SEEK_CUR)
+
+    while f.tell() + frame_header_size <= 10 + tag_size:
+        frame_header = f.read(frame_header_size)
+        frame_id = frame_header[:3] if major == 2 else frame_header[:4]
+        if not frame_id.strip(b'\x00'):
+            break  # 遇到填充区
+
+        if major == 2:
+            size = struct.unpack('>I', b'\x00' + frame_header[3:6])[0]
+        elif major == 4:
+            b = frame_header[4:8]
+            size = (b[0] << 21) | (b[1] << 14) | (b[2] << 7) | b[3]
+        else:
+            size = struct.unpack('>I', frame_header[4:8])[0]
+
+        key = frame_ids.get(frame_id)
+        if key is None or size <= 1 or size > HEADER_READ_LIMIT:
+            # 跳过封面等不需要的帧，不读取内容
+            f.seek(size, os.SEEK_CUR)
+            continue
+
+        data = f.read(size)
+        encoding = data[0]
+        text = data[1:]
+        if encoding == 1:
+            value = text.decode('utf-16', errors='ignore')
+        elif encoding == 2:
+            value = text.decode('utf-16-be', errors='ignore')
+        elif encoding == 3:
+            value = text.decode('utf-8', errors='ignore')
+        else:
+            value = _decode_text(text)
+        if value:
+            value = value.split('\x00')[0].strip()
+        if value and not metadata[key]:
+            metadata[key] = value
+
+    return tag_end
+
+
+def _read_mp3(f, file_size, metadata):
+    audio_start = _read_id3v2(f, metadata)
+    audio_end = file_size
+
+    # ID3v1标签位于文件最后128字节
+    if file_size >= 128:
+        f.seek(file_size - 128)
+        trailer = f.read(128)
+        if trailer[:3] == b'TAG':
+            audio_end -= 128
+            for key, start in (('title', 3), ('artist', 33), ('album', 63)):
+                if not metadata[key]:
+                    metadata[key] = _decode_text(trailer[start:start + 30])
+
+    # 找到第一个有效的音频帧
+    f.seek(audio_start)
+    data = f.read(64 * 1024)
+    offset = 0
+    frame = None
+    while True:
+        offset = data.find(b'\xff', offset)
+        if offset < 0 or offset + 4 > len(data):
+            return
+        frame = _parse_mp3_frame_header(data[offset:offset + 4])
+        if frame:
+            break
+        offset += 1
+
+    # Xing/Info头（VBR或LAME编码的CBR）记录了总帧数
+    if frame['version'] == 1:
+        side_info = 17 if frame['mono'] else 32
+    else:
+        side_info = 9 if frame['mono'] else 17
+    xing_offset = offset + 4 + side_info
+    frames = None
+    if data[xing_offset:xing_offset + 4] in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', data[xing_offset + 4:xing_offset + 8])[0]
+        if flags & 0x01:
+            frames = struct.unpack('>I', data[xing_offset + 8:xing_offset + 12])[0]
+    elif data[offset + 36:offset + 40] == b'VBRI':
+        # VBRI头固定位于帧头后32字节
+        frames = struct.unpack('>I', data[offset + 50:offset + 54])[0]
+
+    if frames:
+        metadata['duration'] = frames * frame['samples_per_frame'] / frame['sample_rate']
+    elif frame['bitrate']:
+        # 没有VBR头时按CBR估算
+        audio_bytes = audio_end - (audio_start + offset)
+        metadata['duration'] = audio_bytes * 8 / frame['bitrate']
+
+
+def _parse_vorbis_comments(data, metadata):
+    """解析Vorbis注释（FLAC、Ogg Vorbis和Opus共用的标签格式）"""
+    fields = {'title': 'title', 'artist': 'artist', 'album': 'album'}
+    try:
+        vendor_length = struct.unpack('<I', data[:4])[0]
+        pos = 4 + vendor_length
+        count = struct.unpack('<I', data[pos:pos + 4])[0]
+        pos += 4
+        for _ in range(count):
+            if pos + 4 > len(data):
+                break
+            length = struct.unpack('<I', data[pos:pos + 4])[0]
+            comment = data[pos + 4:pos + 4 + length].decode('utf-8', errors='ignore')
+            pos += 4 + length
+            name, _, value = comment.partition('=')
+            key = fields.get(name.lower())
+            if key and value and not metadata[key]:
+                metadata[key] = value.strip()
+    except struct.error:
+        pass
+
+
+def _read_flac(f, metadata):
+    if f.read(4) != b'fLaC':
+        return
+
+    while True:
+        block_header = f.read(4)
+        if len(block_header) < 4:
+            return
+        is_last = block_header[0] & 0x80
+        block_type = block_header[0] & 0x7F
+        length = struct.unpack('>I', b'\x00' + block_header[1:4])[0]
+
+        if block_type == 0:
+            info = f.read(length)
+            sample_rate = (info[10] << 12) | (info[11] << 4) | (info[12] >> 4)
+            total_samples = ((info[13] & 0x0F) << 32) | struct.unpack('>I', info[14:18])[0]
+            if sample_rate and total_samples:
+                metadata['duration'] = total_samples / sample_rate
+        elif block_type == 4 and length <= HEADER_READ_LIMIT:
+            _parse_vorbis_comments(f.read(length), metadata)
+        else:
+            # 跳过封面、填充等数据块
+            f.seek(length, os.SEEK_CUR)
+
+        if is_last:
+            return
+
+
+def _read_ogg_packets(f, count, limit=HEADER_READ_LIMIT):
+    """按页读取Ogg流开头的若干个数据包"""
+    packets = []
+    current = b''
+    read = 0
+    while len(packets) < count and read < limit:
+        header = f.read(27)
+        if len(header) < 27 or header[:4] != b'OggS':
+            break
+        segments = f.read(header[26])
+        body = f.read(sum(segments))
+        read += 27 + len(segments) + len(body)
+
+        pos = 0
+        for lacing in segments:
+            current += body[pos:pos + lacing]
+            pos += lacing
+            if lacing < 255:
+                packets.append(current)
+                current = b''
+    if current and len(packets) < count:
+        # 超过读取上限的数据包按截断的内容处理
+        packets.append(current)
+    return packets
+
+
+def _read_ogg(f, file_size, metadata):
+    packets = _read_ogg_packets(f, 2)
+    if not packets:
+        return
+
+    ident = packets[0]
+    pre_skip = 0
+    if ident.startswith(b'\x01vorbis'):
+        sample_rate = struct.unpack('<I', ident[12:16])[0]
+        comment_prefix = b'\x03vorbis'
+    elif ident.startswith(b'OpusHead'):
+        # Opus的粒度位置总是以48kHz计
+        sample_rate = 48000
+        pre_skip = struct.unpack('<H', ident[10:12])[0]
+        comment_prefix = b'OpusTags'
+    else:
+        return
+
+    if len(packets) > 1 and packets[1].startswith(comment_prefix):
+        _parse_vorbis_comments(packets[1][len(comment_prefix):], metadata)
+
+    # 最后一页的粒度位置就是总采样数
+    f.seek(max(0, file_size - TRAILER_READ_SIZE))
+    trailer = f.read(TRAILER_READ_SIZE)
+    last_page = trailer.rfind(b'OggS')
+    if last_page >= 0 and last_page + 14 <= len(trailer) and sample_rate:
+        granule = struct.unpack('<q', trailer[last_page + 6:last_page + 14])[0]
+        if granule > 0:
+            metadata['duration'] = max(0, granule - pre_skip) / sample_rate
+
+
+def _read_wav(f, metadata):
+    header = f.read(12)
+    if header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        return
+
+    byte_rate = None
+    data_size = None
+    info_fields = {b'INAM': 'title', b'IART': 'artist', b'IPRD': 'album'}
+    while True:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            break
+        chunk_id = chunk_header[:4]
+        size = struct.unpack('<I', chunk_header[4:8])[0]
+        padded = size + (size & 1)
+
+        if chunk_id == b'fmt ':
+            fmt = f.read(padded)
+            byte_rate = struct.unpack('<I', fmt[8:12])[0]
+        elif chunk_id == b'data':
+            data_size = size
+            f.seek(padded, os.SEEK_CUR)
+        elif chunk_id == b'LIST' and size <= HEADER_READ_LIMIT:
+            chunk = f.read(padded)
+            if chunk[:4] == b'INFO':
+                pos = 4
+                while pos + 8 <= len(chunk):
+                    sub_id = chunk[pos:pos + 4]
+                    sub_size = struct.unpack('<I', chunk[pos + 4:pos + 8])[0]
+                    key = info_fields.get(sub_id)
+                    if key and not metadata[key]:
+                        metadata[key] = _decode_text(chunk[pos + 8:pos + 8 + sub_size])
+                    pos += 8 + sub_size + (sub_size & 1)
+        else:
+            f.seek(padded, os.SEEK_CUR)
+
+    if byte_rate and data_size is not None:
+        metadata['duration'] = data_size / byte_rate
+
+
+def _iter_mp4_atoms(data, start=0, end=None):
+    """遍历MP4数据块中的子atom，返回 (类型, 内容起始, 内容结束)"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, atom_type = struct.unpack('>I4s', data[pos:pos + 8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', data[pos + 8:pos + 16])[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size:
+            return
+        yield atom_type, pos + header_size, min(pos + size, end)
+        pos += size
+
+
+def _iter_mp4_file_atoms(f, start, end):
+    """遍历文件中一段范围内的atom，只读取atom头，返回 (类型, 内容起始, 内容结束)"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(16)
+        if len(header) < 8:
+            return
+        size, atom_type = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size:
+            return
+        yield atom_type, pos + header_size, min(pos + size, end)
+        pos += size
+
+
+def _read_m4a(f, file_size, metadata):
+    # 只读取各层atom的头部，跳过体积很大的mdat和封面图片，
+    # 实际读入内容的只有mvhd和需要的标签项
+    moov = None
+    for atom_type, start, end in _iter_mp4_file_atoms(f, 0, file_size):
+        if atom_type == b'moov':
+            moov = (start, end)
+            break
+    if moov is None:
+        return
+
+    item_fields = {b'\xa9nam': 'title', b'\xa9ART': 'artist', b'\xa9alb': 'album'}
+    for atom_type, start, end in _iter_mp4_file_atoms(f, *moov):
+        if atom_type == b'mvhd':
+            f.seek(start)
+            mvhd = f.read(min(end - start, 32))
+            if mvhd[0] == 1:
+                timescale, duration = struct.unpack('>IQ', mvhd[20:32])
+            else:
+                timescale, duration = struct.unpack('>II', mvhd[12:20])
+            if timescale:
+                metadata['duration'] = duration / timescale
+        elif atom_type == b'udta':
+            for meta_type, meta_start, meta_end in _iter_mp4_file_atoms(f, start, end):
+                if meta_type != b'meta':
+                    continue
+                # meta是full box，内容前有4字节的版本和标志
+                for ilst_type, ilst_start, ilst_end in _iter_mp4_file_atoms(f, meta_start + 4, meta_end):
+                    if ilst_type != b'ilst':
+                        continue
+                    for item_type, item_start, item_end in _iter_mp4_file_atoms(f, ilst_start, ilst_end):
+                        key = item_fields.get(item_type)
+                        if key is None or metadata[key]:
+                            continue
+                        f.seek(item_start)
+                        item = f.read(min(item_end - item_start, HEADER_READ_LIMIT))
+                        for data_type, data_start, data_end in _iter_mp4_atoms(item):
+                            if data_type == b'data' and not metadata[key]:
+                                value = item[data_start + 8:data_end].decode('utf-8', errors='ignore')
+                                metadata[key] = value.strip() or None
+
+
+def _read_aac(f, file_size, metadata):
+    """读取ADTS格式的AAC文件：可能带有ID3v2标签，时长按开头若干帧估算"""
+    audio_start = _read_id3v2(f, metadata)
+    f.seek(audio_start)
+    data = f.read(64 * 1024)
+    if audio_start == 0 and data[4:8] == b'ftyp':
+        # 扩展名为.aac的MP4文件
+        _read_m4a(f, file_size, metadata)
+        return
+
+    audio_end = file_size
+    if file_size >= 128:
+        f.seek(file_size - 128)
+        if f.read(3) == b'TAG':
+            audio_end -= 128
+
+    # 找到第一帧后逐帧统计帧长和采样数，帧序列中断时停止
+    offset = 0
+    first = None
+    sample_rate = None
+    frame_bytes = 0
+    samples = 0
+    while offset + 7 <= len(data):
+        header = data[offset:offset + 7]
+        rate_index = (header[2] >> 2) & 0x0F
+        frame_length = ((header[3] & 0x03) << 11) | (header[4] << 3) | (header[5] >> 5)
+        if (header[0] != 0xFF or header[1] & 0xF6 != 0xF0
+                or rate_index >= len(_AAC_SAMPLE_RATES) or frame_length < 7):
+            if first is not None:
+                break
+            offset += 1
+            continue
+        if first is None:
+            first = offset
+            sample_rate = _AAC_SAMPLE_RATES[rate_index]
+        frame_bytes += frame_length
+        samples += ((header[6] & 0x03) + 1) * 1024
+        offset += frame_length
+
+    if first is None:
+        return
+    # ADTS没有记录总帧数，按平均每字节的采样数估算
+    audio_bytes = audio_end - (audio_start + first)
+    metadata['duration'] = audio_bytes * samples / frame_bytes / sample_rate
+
+
+def read_metadata(file_path):
+    """
+    读取音频文件的标签和时长，只读取文件头部和尾部的少量数据
+
+    支持MP3（ID3v2/ID3v1、Xing/VBRI）、FLAC、Ogg Vorbis/Opus、WAV、M4A和ADTS格式的AAC。
+
+    Args:
+        file_path: 音频文件路径
+
+    Returns:
+        dict: 包含title、artist、album、duration的字典，无法识别的字段为None
+    """
+    metadata = _empty_metadata()
+    ext = os.path.splitext(file_path)[1].lower()
+
+    try:
+        file_size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            if ext == '.mp3':
+                _read_mp3(f, file_size, metadata)
+            elif ext == '.flac':
+                _read_flac(f, metadata)
+            elif ext in ('.ogg', '.opus'):
+                _read_ogg(f, file_size, metadata)
+            elif ext == '.wav':
+                _read_wav(f, metadata)
+            elif ext == '.m4a':
+                _read_m4a(f, file_size, metadata)
+            elif ext == '.aac':
+                _read_aac(f, file_size, metadata)
+    except (OSError, struct.error, IndexError, KeyError, ValueError) as e:
+        print(f"读取音频元数据失败 {file_path}: {str(e)}")
+
+    return metadata
+
+
+def _read_metadata_chunk(file_paths):
+    """进程池中执行的任务：读取一批文件的元数据"""
+    return [read_metadata(path) for path in file_paths]
+
+
+class MetadataReader:
+    """
+    批量读取音频元数据
+
+    结果按 (路径, 大小, 修改时间) 缓存在音乐库索引中，重新扫描时不会重复解析
+    未变化的文件；需要解析的文件较多时分批交给进程池并行处理。
+    """
+
+    def __init__(self, library_index=None, max_workers=None, chunk_size=64):
+        self.library_index = library_index
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # 界面进程中有多个线程，fork出的子进程可能继承被其他线程持有的锁，改用spawn
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def read(self, file_path):
+        """
+        读取单个文件的元数据（优先使用缓存）
+
+        Args:
+            file_path: 音频文件路径
+
+        Returns:
+            dict: 包含title、artist、album、duration的字典
+        """
+        return self.read_batch([file_path]).get(file_path, _empty_metadata())
+
+    def read_batch(self, file_paths):
+        """
+        批量读取元数据
+
+        Args:
+            file_paths: 音频文件路径列表
+
+        Returns:
+            dict: 以文件路径为键、元数据字典为值的字典
+        """
+        entries = []
+        for path in file_paths:
+            try:
+                stats = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stats.st_size, stats.st_mtime))
+
+        results = {}
+        if self.library_index is not None:
+            results = self.library_index.get_metadata(entries)
+        missing = [entry for entry in entries if entry[0] not in results]
+        if not missing:
+            return results
+
+        paths = [entry[0] for entry in missing]
+        if len(paths) <= self.chunk_size:
+            # 数量较少时直接在当前进程解析，省去进程间通信的开销
+            parsed = [read_metadata(path) for path in paths]
+        else:
+            chunks = [paths[i:i + self.chunk_size] for i in range(0, len(paths), self.chunk_size)]
+            parsed = []
+            for chunk_result in self._get_executor().map(_read_metadata_chunk, chunks):
+                parsed.extend(chunk_result)
+
+        for (path, size, mtime), metadata in zip(missing, parsed):
+            results[path] = metadata
+        if self.library_index is not None:
+            self.library_index.store_metadata(
+                [(path, size, mtime, metadata) for (path, size, mtime), metadata in zip(missing, parsed)]
+            )
+
+        return results
+
+    def close(self):
+        """关闭进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
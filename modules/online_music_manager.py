@@ -1,26 +1,190 @@
 import requests
-import json
 import os
 import re
 import time
 import random
+import hashlib
+import warnings
+import threading
 from urllib.parse import quote
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from modules.http_session import HttpSessionPool
+from modules.search_cache import SearchCache
+from modules.search_pages import SearchPages
+from modules.json_stream import iter_array_items
+from modules.host_policy import HostPolicy
+from modules.downloader import ResumableDownloader, parse_content_range
+from modules.download_scheduler import DownloadScheduler
+from modules.download_manifest import DownloadManifest
+from modules.stream_buffer import StreamBuffer
 
 class OnlineMusicManager:
-    def __init__(self):
+    def __init__(self, max_workers=3):
         # 初始化搜索API配置
         # 注意：这里使用的是示例API，实际项目中需要使用可靠的音乐API服务
         # 并且要确保遵守相关版权法规
         self.api_timeout = 30
+        self.connect_timeout = 5
         self.max_retries = 3
+        # 一次搜索的总时限（秒），所有搜索来源同时查询，超时未返回的来源被忽略
+        self.search_deadline = 10
+        
+        # 搜索来源，{keyword}替换为编码后的关键词，{offset}和{limit}替换为分页参数
+        # （没有{offset}的来源只提供第一页）
+        # 这里使用了免费的音乐搜索API示例，这些API可能不稳定或有使用限制
+        self.search_providers = [
+            "https://api.example.com/search?keyword={keyword}&offset={offset}&limit={limit}",
+            "https://api.demo.com/music/search?q={keyword}&offset={offset}&limit={limit}"
+        ]
+        # 每个来源每页的结果数，以及解析搜索响应时每次读取的字节数
+        self.search_page_size = 20
+        self.search_chunk_size = 16 * 1024
+        self._search_executor = None
+        self._search_executor_lock = threading.Lock()
+        
+        # 各来源的搜索结果缓存，同时进行的相同搜索共用一次请求
+        self.search_cache = SearchCache(max_entries=256, ttl=600)
+        
+        # 按主机限速、退避重试和熔断，搜索和下载共用
+        self.host_policy = HostPolicy(rate=5, burst=10, max_retries=self.max_retries)
+        
+        # 开始时同时下载的文件数（调度器会根据速度调整，最多加倍），
+        # 以及单个大文件分段下载时的最大连接数
+        self.max_workers = max_workers
+        self.download_segments = 4
+        # 下载时每次读取的字节数（每个连接一个同样大小的缓冲区），
+        # 以及刷盘策略：每次保存续传记录前刷盘，断电后也能从记录的进度继续
+        self.download_chunk_size = 1024 * 1024
+        self.download_fsync = ResumableDownloader.FSYNC_JOURNAL
+        # 边下载边播放时开始播放需要的缓冲字节数，剩余缓冲低于暂停水位时暂停等待
+        self.stream_start_bytes = 256 * 1024
+        self.stream_low_watermark = 64 * 1024
+        
+        # 所有搜索和下载共用的连接池，复用已建立的连接
+        self.http = HttpSessionPool(
+            pool_size=max_workers * 2 * self.download_segments + 1,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.api_timeout
+        )
+        
+        # 下载写入.part文件，重试或重新下载同一文件时从断点继续；
+        # 服务器支持Range的大文件分段并行下载
+        self.downloader = ResumableDownloader(
+            self.http, self.host_policy,
+            max_retries=self.max_retries,
+            chunk_size=self.download_chunk_size,
+            max_segments=self.download_segments,
+            fsync=self.download_fsync
+        )
+        
+        # 已下载歌曲的记录（按歌曲ID和内容哈希），以及正在下载的歌曲
+        self.manifest = DownloadManifest()
+        self._active_downloads = {}
+        self._download_lock = threading.Lock()
+        
+        # 所有下载入口共用的调度器：优先级队列、全局并发上限和带宽上限
+        self.scheduler = DownloadScheduler(
+            self.download_music,
+            max_concurrency=max_workers * 2,
+            initial_concurrency=max_workers
+        )
+    
+    def get_connection_stats(self):
+        """
+        获取连接池的统计数据
+        
+        Returns:
+            dict: 请求数、新建连接数、连接复用率和当前保持的连接数
+        """
+        return self.http.stats()
+    
+    def get_search_cache_stats(self):
+        """
+        获取搜索缓存的统计数据
+        
+        Returns:
+            dict: 命中次数、请求次数、合并的请求次数和缓存的结果数
+        """
+        return self.search_cache.stats()
+    
+    def get_host_status(self):
+        """
+        获取各主机的熔断状态
+        
+        Returns:
+            dict: 主机 -> closed（正常）、open（暂停访问）或half_open（试探中）
+        """
+        return self.host_policy.stats()
+    
+    def submit_download(self, music_info, download_folder, priority=1):
+        """
+        提交下载任务，由下载调度器在后台执行
+        
+        Args:
+            music_info: 包含音乐信息的字典
+            download_folder: 下载目录
+            priority: 优先级，数值大的先下载；批量下载使用0
+            
+        Returns:
+            DownloadJob: 下载任务
+        """
+        return self.scheduler.submit(music_info, download_folder, priority)
     
-    def search_music(self, keyword):
+    def stream_music(self, music_info, download_folder):
+        """
+        边下载边播放：以最高的优先级下载，下载的数据同时供播放读取
+        
+        Args:
+            music_info: 包含音乐信息的字典
+            download_folder: 下载目录，下载完成的文件和普通下载一样保存在这里
+            
+        Returns:
+            tuple: (DownloadJob, StreamBuffer)，缓冲ready后用它open()得到的文件对象播放
+        """
+        stream = StreamBuffer(self.stream_start_bytes, self.stream_low_watermark)
+        job = self.scheduler.submit(dict(music_info, stream_buffer=stream), download_folder, priority=2)
+        
+        def on_done(future):
+            if future.cancelled():
+                stream.fail(Exception("下载已取消"))
+            elif future.exception() is not None:
+                stream.fail(future.exception())
+            else:
+                stream.finish(future.result())
+        
+        job.future.add_done_callback(on_done)
+        return job, stream
+    
+    def poll_download_events(self):
+        """
+        取出自上次调用以来的下载进度和完成的任务
+        
+        Returns:
+            tuple: (进度字典 {任务ID: (已下载字节数, 总字节数)}, 按完成顺序排列的任务列表)
+        """
+        return self.scheduler.poll_events()
+    
+    def set_bandwidth_limit(self, bytes_per_second):
+        """设置所有下载共用的带宽上限（字节/秒），None表示不限"""
+        self.scheduler.set_bandwidth_limit(bytes_per_second)
+    
+    def close(self):
+        """取消排队中的下载，关闭连接池中的所有连接"""
+        self.scheduler.close()
+        if self._search_executor is not None:
+            self._search_executor.shutdown(wait=False)
+        self.http.close()
+    
+    def search_music(self, keyword, on_results=None, offset=0, limit=None):
         """
         搜索在线音乐
         
         Args:
             keyword: 搜索关键词
+            on_results: 每个搜索来源返回后以当前合并的结果列表调用，
+                        在搜索线程中执行；后一次的列表总是以前一次的列表开头
+            offset: 跳过每个来源的前offset条结果
+            limit: 每个来源最多返回的结果数，默认为search_page_size
             
         Returns:
             list: 音乐搜索结果列表
@@ -28,89 +192,215 @@ class OnlineMusicManager:
         if not keyword or len(keyword.strip()) == 0:
             raise ValueError("搜索关键词不能为空")
         
+        return self._search_page(keyword, on_results, offset, limit or self.search_page_size)
+    
+    def search_pages(self, keyword, page_size=None):
+        """
+        分页搜索在线音乐
+        
+        Args:
+            keyword: 搜索关键词
+            page_size: 每个来源每页的结果数，默认为search_page_size
+            
+        Returns:
+            SearchPages: next_page()逐页返回结果并在后台获取下一页，迭代时逐条返回结果；
+                         后面的页不包含前面的页已有的歌曲
+        """
+        if not keyword or len(keyword.strip()) == 0:
+            raise ValueError("搜索关键词不能为空")
+        
+        seen = set()
+        return SearchPages(
+            lambda offset, limit, on_results: self._fetch_search_page(keyword, on_results, offset, limit, seen),
+            page_size or self.search_page_size
+        )
+    
+    def _search_page(self, keyword, on_results, offset, limit):
         try:
             # 这里实现一个基础的搜索功能
             # 在实际项目中，你需要替换为真实的音乐API
-            results = self._search_music_demo(keyword)
+            results = self._search_music_demo(keyword, on_results, offset, limit)
             return results
         except Exception as e:
-            # 如果API调用失败，返回模拟数据作为演示
             print(f"搜索API调用失败: {str(e)}")
+            if offset:
+                return []
+            # 如果API调用失败，返回模拟数据作为演示
             return self._get_mock_search_results(keyword)
     
-    def _search_music_demo(self, keyword):
+    def _fetch_search_page(self, keyword, on_results, offset, limit, seen):
+        """
+        获取分页搜索的一页，供SearchPages调用
+        
+        Returns:
+            tuple: (这一页中之前的页没有的结果, 是否可能还有下一页)
+            
+        Raises:
+            Exception: 第二页起获取失败，SearchPages下次重新获取这一页
+        """
+        try:
+            results, has_more = self._query_sources(keyword, on_results, offset, limit, seen)
+        except Exception as e:
+            if offset:
+                raise
+            print(f"搜索API调用失败: {str(e)}")
+            results, has_more = [], False
+        if results or offset:
+            return results, has_more
+        # 第一页没有结果时与search_music一样返回模拟数据作为演示
+        return self._get_mock_search_results(keyword), False
+    
+    def _search_music_demo(self, keyword, on_results=None, offset=0, limit=None):
         """
         演示用的音乐搜索方法
         在实际项目中，这里应该调用真实的音乐搜索API
         """
-        # 构建搜索URL示例（这里使用了一个免费的音乐搜索API示例）
-        # 注意：这些API可能不稳定或有使用限制
-        search_urls = [
-            f"https://api.example.com/search?keyword={quote(keyword)}",
-            f"https://api.demo.com/music/search?q={quote(keyword)}"
-        ]
-        
-        for url in search_urls:
-            try:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-                
-                # 添加重试机制
-                for retry in range(self.max_retries):
-                    try:
-                        response = requests.get(url, headers=headers, timeout=self.api_timeout)
-                        if response.status_code == 200:
-                            data = response.json()
-                            # 解析API响应
-                            return self._parse_api_response(data)
-                        else:
-                            print(f"API返回非200状态码: {response.status_code}")
-                    except requests.exceptions.Timeout:
-                        print(f"请求超时，正在重试 ({retry+1}/{self.max_retries})...")
-                        time.sleep(2)
-                    except requests.exceptions.RequestException as e:
-                        print(f"请求异常: {str(e)}")
-                        break
-            except Exception as e:
-                print(f"搜索URL {url} 调用失败: {str(e)}")
-                # 尝试下一个URL
-                continue
-        
+        results, _ = self._query_sources(keyword, on_results, offset, limit)
+        if results or offset:
+            return results
         # 如果所有API都失败，返回模拟数据
         return self._get_mock_search_results(keyword)
     
-    def _parse_api_response(self, data):
+    def _query_sources(self, keyword, on_results=None, offset=0, limit=None, seen=None):
+        """
+        同时查询所有搜索来源，共用search_deadline秒的总时限
+        
+        先返回的来源的结果先交给on_results，按标题和艺术家去重后合并。
+        seen是之前的页已有的歌曲的键，这一页的歌曲会加入其中。
+        
+        Returns:
+            tuple: (合并后的结果, 是否可能还有下一页)。有来源返回了整页结果，
+                   或有来源失败、超时而无法确定时认为还有下一页
+            
+        Raises:
+            Exception: 有来源失败或超时，其余来源也没有返回任何结果
+        """
+        deadline = time.monotonic() + self.search_deadline
+        limit = limit or self.search_page_size
+        # 多余的空白不影响搜索结果，大小写不同的关键词共用缓存
+        keyword = " ".join(keyword.split())
+        cache_keyword = keyword.casefold()
+        executor = self._get_search_executor()
+        futures = {
+            executor.submit(
+                self.search_cache.get_or_fetch,
+                (template, cache_keyword, offset, limit),
+                lambda url=template.format(keyword=quote(keyword), offset=offset, limit=limit):
+                    self._query_provider(url, deadline, limit)
+            ): template
+            for template in self.search_providers
+            # 不支持分页的来源只有第一页
+            if offset == 0 or "{offset}" in template
+        }
+        
+        merged = []
+        if seen is None:
+            seen = set()
+        received = False    # 是否有来源返回了结果（去重前）
+        full_page = False   # 是否有来源返回了整页结果
+        error = None        # 最近一个失败或超时的来源的错误
+        pending = set(futures)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print(f"搜索来源 {futures[future]} 调用失败: {str(e)}")
+                    error = e
+                    continue
+                received = received or bool(results)
+                full_page = full_page or len(results) >= limit
+                added = False
+                for result in results:
+                    key = self._result_key(result)
+                    if key not in seen:
+                        seen.add(key)
+                        merged.append(result)
+                        added = True
+                if added and on_results:
+                    on_results(list(merged))
+        
+        for future in pending:
+            # 超过总时限的来源不再等待，已开始的请求由读取超时结束
+            future.cancel()
+            print(f"搜索来源 {futures[future]} 超时")
+            error = Exception(f"搜索来源 {futures[future]} 超时")
+        
+        if error is not None and not received:
+            raise error
+        return merged, full_page or error is not None
+    
+    def _get_search_executor(self):
+        with self._search_executor_lock:
+            if self._search_executor is None:
+                # 每个来源留两个线程，超时的请求尚未结束时下一次搜索也不用排队
+                self._search_executor = ThreadPoolExecutor(
+                    max_workers=max(1, len(self.search_providers) * 2),
+                    thread_name_prefix="search"
+                )
+            return self._search_executor
+    
+    def _query_provider(self, url, deadline, limit):
+        """
+        查询一个搜索来源，重试和等待都不超过总时限
+        
+        Returns:
+            list: 该来源的搜索结果
+            
+        Raises:
+            Exception: 请求失败或超时，失败的结果不会被缓存
+        """
+        def send():
+            remaining = max(0.1, deadline - time.monotonic())
+            return self.http.get(url, timeout=(min(self.connect_timeout, remaining), remaining), stream=True)
+        
+        response = self.host_policy.request(url, send, deadline)
+        with response:
+            if response.status_code != 200:
+                raise Exception(f"API返回非200状态码: {response.status_code}")
+            # 解析API响应
+            return self._parse_api_response(response, limit)
+    
+    def _result_key(self, result):
+        """用于去重的键：忽略大小写和首尾空白的标题和艺术家"""
+        return (
+            str(result.get('title', '')).strip().casefold(),
+            str(result.get('artist', '')).strip().casefold()
+        )
+    
+    def _parse_api_response(self, response, limit):
         """
         解析API响应数据
         不同的API可能有不同的响应格式，需要根据实际情况调整
+        
+        边接收边解析，取得limit条结果后不再读取和解析后面的数据
         """
         results = []
+        chunks = response.iter_content(chunk_size=self.search_chunk_size)
         
-        # 尝试解析常见的API响应格式
+        # 尝试解析常见的API响应格式（取第一个值为列表的字段）：
+        # 格式1: {"data": [{"title": "...", "artist": "...", ...}]}
+        # 格式2: {"songs": [{"name": "...", "singer": "...", ...}]}
+        # 格式3: {"result": [{"title": "...", "artist": "...", ...}]}
         try:
-            # 格式1: {"data": [{"title": "...", "artist": "...", ...}]}
-            if "data" in data and isinstance(data["data"], list):
-                for item in data["data"]:
-                    result = self._extract_music_info(item)
-                    if result:
-                        results.append(result)
-            # 格式2: {"songs": [{"name": "...", "singer": "...", ...}]}
-            elif "songs" in data and isinstance(data["songs"], list):
-                for item in data["songs"]:
-                    result = self._extract_music_info(item)
-                    if result:
-                        results.append(result)
-            # 格式3: {"result": [{"title": "...", "artist": "...", ...}]}
-            elif "result" in data and isinstance(data["result"], list):
-                for item in data["result"]:
-                    result = self._extract_music_info(item)
-                    if result:
-                        results.append(result)
-        except Exception as e:
+            for _, item in iter_array_items(chunks, ("data", "songs", "result")):
+                result = self._extract_music_info(item)
+                if result:
+                    results.append(result)
+                    if len(results) >= limit:
+                        break
+        except ValueError as e:
             print(f"解析API响应失败: {str(e)}")
         
-        return results[:20]  # 最多返回20条结果
+        # 只有读到响应末尾，urllib3才会把连接放回连接池；剩下的数据不超过一块时
+        # 多读一块通常就能读完（分块传输的响应可能还差结束标记）。
+        # 没有读完的响应在关闭时断开连接，不再接收后面的数据
+        next(chunks, None)
+        return results
     
     def _extract_music_info(self, item):
         """
@@ -181,19 +471,56 @@ class OnlineMusicManager:
         
         return results
     
-    def download_music(self, music_info, download_folder):
+    def download_music(self, music_info, download_folder, progress=None):
         """
         下载音乐文件
         
+        已经下载过的歌曲直接返回原来的文件；同一首歌同时只下载一次。
+        
         Args:
             music_info: 包含音乐信息的字典
             download_folder: 下载目录
+            progress: 以 (已下载字节数, 总字节数) 调用的进度回调
             
         Returns:
             str: 下载后的文件路径
         """
-        if not os.path.exists(download_folder):
-            os.makedirs(download_folder)
+        os.makedirs(download_folder, exist_ok=True)
+        
+        key = self._download_key(music_info)
+        if key is None:
+            return self._download_music(music_info, download_folder, None, progress)
+        
+        with self._download_lock:
+            event = self._active_downloads.get(key)
+            owner = event is None
+            if owner:
+                event = self._active_downloads[key] = threading.Event()
+        if not owner:
+            # 等待正在进行的下载完成后使用它的结果，它失败时重新下载
+            event.wait()
+            return self.download_music(music_info, download_folder, progress)
+        
+        try:
+            return self._download_music(music_info, download_folder, key, progress)
+        finally:
+            with self._download_lock:
+                del self._active_downloads[key]
+            event.set()
+    
+    def _download_key(self, music_info):
+        """下载记录中的键：来源和歌曲ID，没有ID时返回None"""
+        song_id = music_info.get("id")
+        if not song_id:
+            return None
+        return f"{music_info.get('source', '')}:{song_id}"
+    
+    def _download_music(self, music_info, download_folder, key, progress):
+        # 已经下载过的歌曲直接返回
+        if key is not None:
+            existing = self.manifest.find_complete(key)
+            if existing:
+                return existing
         
         # 生成文件名
         title = music_info.get("title", "未知歌曲")
@@ -201,31 +528,50 @@ class OnlineMusicManager:
         
         # 清理文件名中的非法字符
         filename = self._sanitize_filename(f"{artist} - {title}.mp3")
-        file_path = os.path.join(download_folder, filename)
         
-        # 检查文件是否已存在
-        if os.path.exists(file_path):
-            # 如果文件已存在，添加数字后缀
-            base_name, ext = os.path.splitext(file_path)
-            counter = 1
-            while os.path.exists(f"{base_name}({counter}){ext}"):
-                counter += 1
-            file_path = f"{base_name}({counter}){ext}"
+        # 上次没有下载完时使用同一路径，从.part文件继续；否则预留一个不重名的路径
+        file_path = self.manifest.find_partial(key) if key is not None else None
+        if file_path is None or os.path.dirname(file_path) != os.path.abspath(download_folder):
+            file_path = self.manifest.reserve_path(os.path.abspath(download_folder), filename)
+        if key is not None:
+            self.manifest.begin(key, file_path)
+        
+        # 边下载边播放时，播放从.part文件读取已下载的部分
+        stream = music_info.get("stream_buffer")
+        if stream is not None:
+            stream.begin(file_path + ResumableDownloader.PART_SUFFIX)
         
         try:
-            # 如果音乐信息中已有URL，可以直接下载
-            if music_info.get("url"):
-                return self._download_file(music_info["url"], file_path)
+            # 如果音乐信息中已有URL，可以直接下载，否则尝试获取下载链接
+            download_url = music_info.get("url") or self._get_download_url(music_info)
+            if download_url:
+                if stream is not None:
+                    tail_thread = threading.Thread(target=self._fetch_stream_tail, args=(download_url, stream))
+                    tail_thread.daemon = True
+                    tail_thread.start()
+                file_path, digest = self._download_file(
+                    download_url, file_path, progress, stream.update if stream is not None else None
+                )
             else:
-                # 否则，尝试获取下载链接
-                download_url = self._get_download_url(music_info)
-                if download_url:
-                    return self._download_file(download_url, file_path)
-                else:
-                    # 如果无法获取真实下载链接，创建一个模拟的音频文件
-                    return self._create_mock_audio_file(file_path, music_info)
+                # 如果无法获取真实下载链接，创建一个模拟的音频文件
+                file_path, digest = self._create_mock_audio_file(file_path, music_info)
         except Exception as e:
-            raise Exception(f"下载失败: {str(e)}")
+            # 还没有写入可以续传的数据时（例如请求就失败了）删除预留文件名的.part文件，
+            # 否则每次失败都会多占用一个文件名
+            if not self.downloader.can_resume(file_path):
+                self.downloader.discard(file_path)
+            raise Exception(f"下载失败: {str(e)}") from e
+        
+        # 内容相同的文件只保留一份（大文件分段下载时可能没有计算哈希）
+        size = os.path.getsize(file_path)
+        duplicate = self.manifest.find_by_hash(digest, size) if digest else None
+        if duplicate and duplicate != file_path:
+            os.remove(file_path)
+            file_path = duplicate
+        
+        if key is not None:
+            self.manifest.complete(key, file_path, size, digest)
+        return file_path
     
     def _get_download_url(self, music_info):
         """
@@ -235,39 +581,37 @@ class OnlineMusicManager:
         # 由于是演示，返回None以使用模拟下载
         return None
     
-    def _download_file(self, url, file_path):
-        """
-        下载文件
+    def _download_file(self, url, file_path, progress=None, available=None):
         """
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
+        下载文件，中断后再次下载同一文件时从断点继续
         
-        # 添加重试机制
-        for retry in range(self.max_retries):
-            try:
-                response = requests.get(url, headers=headers, stream=True, timeout=self.api_timeout)
-                response.raise_for_status()
-                
-                # 下载文件
-                with open(file_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                
-                # 验证文件是否成功下载
-                if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-                    return file_path
-                else:
-                    raise Exception("文件下载失败，文件大小为0")
-                    
-            except requests.exceptions.RequestException as e:
-                print(f"下载请求异常: {str(e)}")
-                if retry < self.max_retries - 1:
-                    print(f"正在重试 ({retry+1}/{self.max_retries})...")
-                    time.sleep(2)
-                else:
-                    raise
+        Returns:
+            tuple: (下载后的文件路径, 文件内容的SHA-256)
+        """
+        return self.downloader.download(url, file_path, progress, available)
+    
+    def _fetch_stream_tail(self, url, stream):
+        """
+        单独请求文件末尾的数据交给播放缓冲，解码器加载时读取末尾不需要等待下载完成
+        """
+        headers = {'Accept-Encoding': 'identity', 'Range': f'bytes=-{stream.tail_size}'}
+        try:
+            response = self.host_policy.request(url, lambda: self.http.get(url, headers=headers, stream=True))
+            with response:
+                content_range = parse_content_range(response.headers.get('Content-Range'))
+                if response.status_code != 206 or content_range is None or content_range[1] is None:
+                    # 服务器不支持Range，不读取完整的响应
+                    stream.set_tail(None, None)
+                    return
+                start, total = content_range
+                data = response.content
+            if start + len(data) != total:
+                raise requests.exceptions.ChunkedEncodingError(f"文件末尾的数据不完整: {len(data)} 字节")
+        except requests.exceptions.RequestException as e:
+            print(f"获取文件末尾失败: {str(e)}")
+            stream.set_tail(None, None)
+            return
+        stream.set_tail(start, data)
     
     def _create_mock_audio_file(self, file_path, music_info):
         """
@@ -275,15 +619,20 @@ class OnlineMusicManager:
         """
         # 在实际应用中，这里应该尝试真实的下载
         # 这里只是为了演示功能，创建一个文本文件作为模拟
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(f"这是一个模拟的音频文件\n")
-            f.write(f"标题: {music_info.get('title', '未知歌曲')}\n")
-            f.write(f"艺术家: {music_info.get('artist', '未知艺术家')}\n")
-            f.write(f"时长: {music_info.get('duration', '未知时长')}\n")
-            f.write(f"\n注意: 这是一个演示用的模拟文件。在实际应用中，")
-            f.write(f"这里应该包含真实的音频数据。")
+        content = (
+            f"这是一个模拟的音频文件\n"
+            f"标题: {music_info.get('title', '未知歌曲')}\n"
+            f"艺术家: {music_info.get('artist', '未知艺术家')}\n"
+            f"时长: {music_info.get('duration', '未知时长')}\n"
+            f"\n注意: 这是一个演示用的模拟文件。在实际应用中，"
+            f"这里应该包含真实的音频数据。"
+        ).encode('utf-8')
+        with open(file_path, 'wb') as f:
+            f.write(content)
         
-        return file_path
+        # 文件写好后再删除预留文件名的.part文件
+        self.downloader.discard(file_path)
+        return file_path, hashlib.sha256(content).hexdigest()
     
     def _sanitize_filename(self, filename):
         """
@@ -305,41 +654,47 @@ class OnlineMusicManager:
         
         return filename.strip()
     
-    def batch_download(self, music_list, download_folder, max_workers=3):
+    def batch_download(self, music_list, download_folder, max_workers=None, *, priority=0):
         """
         批量下载音乐
         
+        任务提交到下载调度器，与其他下载共用并发上限，结果按完成顺序收集。
+        
         Args:
             music_list: 音乐信息列表
             download_folder: 下载目录
-            max_workers: 最大工作线程数
+            max_workers: 已弃用，并发数由下载调度器统一控制，传入的值被忽略
+            priority: 优先级，默认低于单个下载
             
         Returns:
-            dict: 下载结果字典，键为音乐ID，值为下载状态和路径
+            dict: 下载结果字典，键为音乐ID，值为下载状态和路径（按完成顺序排列）
         """
+        if max_workers is not None:
+            warnings.warn("batch_download的max_workers参数已弃用，并发数由下载调度器统一控制",
+                          DeprecationWarning, stacklevel=2)
+        
         results = {}
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有下载任务
-            future_to_music = {
-                executor.submit(self.download_music, music_info, download_folder): music_info 
-                for music_info in music_list
-            }
-            
-            # 处理下载结果
-            for future in future_to_music:
-                music_info = future_to_music[future]
-                music_id = music_info.get('id', 'unknown')
-                try:
-                    file_path = future.result()
-                    results[music_id] = {
-                        'status': 'success',
-                        'path': file_path
-                    }
-                except Exception as e:
-                    results[music_id] = {
-                        'status': 'failed',
-                        'error': str(e)
-                    }
+        # 提交所有下载任务
+        future_to_music = {
+            self.scheduler.submit(music_info, download_folder, priority).future: music_info
+            for music_info in music_list
+        }
+        
+        # 处理下载结果，先完成的先处理
+        for future in as_completed(future_to_music):
+            music_info = future_to_music[future]
+            music_id = music_info.get('id', 'unknown')
+            try:
+                file_path = future.result()
+                results[music_id] = {
+                    'status': 'success',
+                    'path': file_path
+                }
+            except Exception as e:
+                results[music_id] = {
+                    'status': 'failed',
+                    'error': str(e)
+                }
         
         return results
\ No newline at end of file
@@ -0,0 +1,408 @@
+import random
+from array import array
+from modules.track_store import TrackStore
+
+
+class Playlist:
+    """
+    带播放位置的播放列表
+
+    每个条目有独立的ID，同一首歌出现多次也能区分。上一曲/下一曲通过
+    ID到位置的映射在O(1)内完成；该映射只在列表被修改后的第一次使用时重建。
+
+    随机播放使用按需进行的Fisher–Yates洗牌：每次下一曲从本轮尚未播放的
+    条目中随机抽取一个，一轮之内不会重复；新插入的条目直接加入待抽取的集合，
+    不需要重新洗牌。上一曲/下一曲还会记录播放历史，随机模式下也能回到
+    真正播放过的上一首。
+
+    条目只保存歌曲在TrackStore中的ID，所有按条目ID索引的数据都放在紧凑的
+    整数数组中，完整路径在读取时才拼接。
+    """
+
+    def __init__(self, paths=None, rng=None, store=None):
+        self._rng = rng or random.Random()
+        self.store = store if store is not None else TrackStore()
+
+        self._entries = array('i')          # 按显示顺序排列的条目ID
+        self._entry_tracks = array('i')     # 条目ID -> 歌曲ID，已删除的为-1
+        self._track_counts = array('I')     # 歌曲ID -> 在列表中出现的次数
+        self._positions = None              # 条目ID -> 位置，列表修改后置为None
+
+        self.current = None                 # 当前条目ID
+        # 当前条目被删除时它原来的位置，也就是原来的下一首现在的位置
+        self._removed_position = None
+        self.shuffle = False
+
+        # 随机播放：本轮尚未抽取的条目，以及条目在其中的位置（不在其中为-1）
+        self._pool = array('i')
+        self._pool_index = array('i')
+        self._upcoming = None               # 已经抽取但尚未播放的下一首
+
+        # 播放历史
+        self._history = []
+        self._forward = []
+
+        if paths:
+            self.extend(paths)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, index):
+        return self.store.path(self._entry_tracks[self._entries[index]])
+
+    def __iter__(self):
+        return self.store.paths(self._entry_tracks[entry_id] for entry_id in self._entries)
+
+    def __contains__(self, path):
+        track_id = self.store.lookup(path)
+        return track_id is not None and self._count(track_id) > 0
+
+    def track_ids(self):
+        """按显示顺序返回各条目的歌曲ID（复制的数组）"""
+        tracks = self._entry_tracks
+        return array('i', (tracks[entry_id] for entry_id in self._entries))
+
+    def entry_at(self, index):
+        """返回指定位置的条目ID，条目在插入、删除和排序后保持不变"""
+        return self._entries[index]
+
+    def index_of_entry(self, entry_id):
+        """返回条目的当前位置，条目已被删除时返回None"""
+        return self._position(entry_id)
+
+    @property
+    def current_path(self):
+        """当前播放条目的路径"""
+        if not self._is_valid(self.current):
+            return None
+        return self.store.path(self._entry_tracks[self.current])
+
+    def current_index(self):
+        """当前播放条目的位置，没有时返回None"""
+        return self._position(self.current)
+
+    def _is_valid(self, entry_id):
+        return entry_id is not None and self._entry_tracks[entry_id] >= 0
+
+    def _count(self, track_id):
+        return self._track_counts[track_id] if track_id < len(self._track_counts) else 0
+
+    def _position(self, entry_id):
+        if not self._is_valid(entry_id):
+            return None
+        if self._positions is None:
+            positions = array('i', [-1]) * len(self._entry_tracks)
+            for i, e in enumerate(self._entries):
+                positions[e] = i
+            self._positions = positions
+        return self._positions[entry_id]
+
+    # ---- 列表修改 ----
+
+    def _new_entry(self, path):
+        track_id = self.store.add(path)
+        counts = self._track_counts
+        if track_id >= len(counts):
+            counts.extend([0] * (len(self.store) - len(counts)))
+        counts[track_id] += 1
+
+        entry_id = len(self._entry_tracks)
+        self._entry_tracks.append(track_id)
+        self._pool_index.append(-1)
+        if self._positions is not None:
+            self._positions.append(-1)
+        if self.shuffle:
+            self._pool_add(entry_id)
+        return entry_id
+
+    def extend(self, paths):
+        """在列表末尾添加歌曲"""
+        start = len(self._entries)
+        new_entries = [self._new_entry(path) for path in paths]
+        self._entries.extend(new_entries)
+        if self._positions is not None:
+            for i, entry_id in enumerate(new_entries, start):
+                self._positions[entry_id] = i
+
+    def insert(self, index, path):
+        """在指定位置插入歌曲"""
+        if self._removed_position is not None and index < self._removed_position:
+            self._removed_position += 1
+        self._entries.insert(index, self._new_entry(path))
+        self._positions = None
+
+    def insert_sorted(self, paths, key, reverse=False):
+        """
+        把歌曲插入到按key排序的列表中，与已有歌曲的键相同时排在其后
+
+        歌曲较少时逐首二分查找位置，每首只需计算O(log n)次键；
+        较多时计算所有已有歌曲的键，一次合并。
+
+        Args:
+            paths: 要插入的路径
+            key: 以路径为参数的排序键函数，与列表当前的排序方式一致
+            reverse: 列表是否按倒序排列
+        """
+        if not paths:
+            return
+        store = self.store
+        tracks = self._entry_tracks
+        # 每次插入要移动数组，移动的代价远小于计算一个键，插入较多时才值得整体合并
+        if len(paths) * 256 <= len(self._entries):
+            for path in paths:
+                path_key = key(path)
+                low, high = 0, len(self._entries)
+                while low < high:
+                    middle = (low + high) // 2
+                    middle_key = key(store.path(tracks[self._entries[middle]]))
+                    if (middle_key < path_key) if reverse else (path_key < middle_key):
+                        high = middle
+                    else:
+                        low = middle + 1
+                self.insert(low, path)
+            return
+
+        added = sorted(((key(path), path) for path in paths), key=lambda item: item[0], reverse=reverse)
+        merged = array('i')
+        removed_position = self._removed_position
+        j = 0
+        for i, entry_id in enumerate(self._entries):
+            entry_key = key(store.path(tracks[entry_id]))
+            while j < len(added) and ((entry_key < added[j][0]) if reverse else (added[j][0] < entry_key)):
+                merged.append(self._new_entry(added[j][1]))
+                j += 1
+            if i == self._removed_position:
+                removed_position = len(merged)
+            merged.append(entry_id)
+        for _, path in added[j:]:
+            merged.append(self._new_entry(path))
+        self._entries = merged
+        self._positions = None
+        self._removed_position = removed_position
+
+    def remove_where(self, predicate):
+        """
+        删除满足条件的歌曲
+
+        Args:
+            predicate: 以路径为参数的判断函数
+
+        Returns:
+            list: 被删除的路径
+        """
+        removed = []
+        kept = array('i')
+        # 当前条目的位置；当前条目已被删除时是原来的下一首的位置
+        mark = self._position(self.current) if self._is_valid(self.current) else self._removed_position
+        removed_position = None
+        for i, entry_id in enumerate(self._entries):
+            if i == mark:
+                removed_position = len(kept)
+            path = self.store.path(self._entry_tracks[entry_id])
+            if predicate(path):
+                removed.append(path)
+                self._drop_entry(entry_id)
+            else:
+                kept.append(entry_id)
+
+        if removed:
+            if removed_position is None and mark is not None:
+                removed_position = len(kept)
+            self._entries = kept
+            self._positions = None
+            self._removed_position = removed_position
+        return removed
+
+    def _drop_entry(self, entry_id):
+        self._track_counts[self._entry_tracks[entry_id]] -= 1
+        self._entry_tracks[entry_id] = -1
+        self._pool_remove(entry_id)
+        if self._upcoming == entry_id:
+            self._upcoming = None
+        # 当前条目被删除后仍保留ID，下一曲从原来的位置附近继续
+
+    def rename(self, renamed):
+        """
+        更新被重命名的歌曲路径，位置和播放状态不变
+
+        Args:
+            renamed: 旧路径到新路径的字典
+        """
+        mapping = {}
+        for old_path, new_path in renamed.items():
+            old_id = self.store.lookup(old_path)
+            if old_id is not None and self._count(old_id):
+                mapping[old_id] = self.store.add(new_path)
+        if not mapping:
+            return
+
+        counts = self._track_counts
+        if len(counts) < len(self.store):
+            counts.extend([0] * (len(self.store) - len(counts)))
+        tracks = self._entry_tracks
+        for entry_id in self._entries:
+            new_id = mapping.get(tracks[entry_id])
+            if new_id is not None:
+                counts[tracks[entry_id]] -= 1
+                counts[new_id] += 1
+                tracks[entry_id] = new_id
+
+    def sort(self, key, reverse=False):
+        """按路径排序，不影响随机播放顺序和播放历史"""
+        store = self.store
+        tracks = self._entry_tracks
+        self._entries = array('i', sorted(
+            self._entries, key=lambda entry_id: key(store.path(tracks[entry_id])), reverse=reverse
+        ))
+        self._positions = None
+        # 已删除的当前条目在新的顺序中没有位置
+        self._removed_position = None
+
+    def clear(self):
+        """清空列表，保留随机播放设置和路径存储"""
+        shuffle = self.shuffle
+        self.__init__(rng=self._rng, store=self.store)
+        self.shuffle = shuffle
+
+    # ---- 随机播放 ----
+
+    def set_shuffle(self, enabled):
+        """开启或关闭随机播放，开启时开始新的一轮"""
+        self.shuffle = enabled
+        self._pool = array('i')
+        self._pool_index = array('i', [-1]) * len(self._entry_tracks)
+        self._upcoming = None
+        if enabled:
+            self._refill_pool()
+
+    def _refill_pool(self):
+        for entry_id in self._entries:
+            if entry_id != self.current:
+                self._pool_add(entry_id)
+
+    def _pool_add(self, entry_id):
+        self._pool_index[entry_id] = len(self._pool)
+        self._pool.append(entry_id)
+
+    def _pool_remove(self, entry_id):
+        """O(1)地从待抽取集合中删除：与最后一个元素交换后弹出"""
+        index = self._pool_index[entry_id]
+        if index < 0:
+            return
+        self._pool_index[entry_id] = -1
+        last = self._pool.pop()
+        if last != entry_id:
+            self._pool[index] = last
+            self._pool_index[last] = index
+
+    def _draw(self):
+        """Fisher–Yates洗牌的一步：从本轮剩余条目中随机取出一个"""
+        if not self._pool:
+            # 一轮结束，开始新的一轮（避免紧接着重复当前歌曲）
+            self._refill_pool()
+            if not self._pool:
+                return self.current
+        entry_id = self._pool[self._rng.randrange(len(self._pool))]
+        self._pool_remove(entry_id)
+        return entry_id
+
+    # ---- 播放位置 ----
+
+    def _valid_history(self, stack):
+        while stack and not self._is_valid(stack[-1]):
+            stack.pop()
+        return stack[-1] if stack else None
+
+    def peek_next(self):
+        """
+        预测下一曲但不移动播放位置
+
+        Returns:
+            int: 下一曲的位置，列表为空时返回None
+        """
+        if not self._entries:
+            return None
+
+        forward = self._valid_history(self._forward)
+        if forward is not None:
+            return self._position(forward)
+
+        if self.shuffle:
+            if not self._is_valid(self._upcoming):
+                self._upcoming = self._draw()
+            return self._position(self._upcoming)
+
+        index = self._position(self.current)
+        if index is None:
+            # 当前歌曲已被删除时从它原来的位置继续，没有当前歌曲时从列表开头开始
+            return (self._removed_position or 0) % len(self._entries)
+        return (index + 1) % len(self._entries)
+
+    def next(self):
+        """
+        移动到下一曲
+
+        Returns:
+            int: 下一曲的位置，列表为空时返回None
+        """
+        index = self.peek_next()
+        if index is None:
+            return None
+
+        entry_id = self._entries[index]
+        if self._forward and self._forward[-1] == entry_id:
+            self._forward.pop()
+        else:
+            self._forward = []
+        self._upcoming = None
+        self._move_to(entry_id)
+        return index
+
+    def previous(self):
+        """
+        回到上一曲：优先返回播放历史中的上一首
+
+        Returns:
+            int: 上一曲的位置，列表为空时返回None
+        """
+        if not self._entries:
+            return None
+
+        entry_id = self._valid_history(self._history)
+        if entry_id is not None:
+            self._history.pop()
+            if self._is_valid(self.current):
+                self._forward.append(self.current)
+            self.current = entry_id
+            return self._position(entry_id)
+
+        index = self._position(self.current)
+        if index is None:
+            # 当前歌曲已被删除时回到它原来的前一首，没有当前歌曲时从列表开头开始
+            index = 0 if self._removed_position is None else self._removed_position - 1
+        else:
+            index -= 1
+        index %= len(self._entries)
+        self.current = self._entries[index]
+        self._pool_remove(self.current)
+        return index
+
+    def jump(self, index):
+        """
+        直接播放指定位置的歌曲
+
+        Returns:
+            str: 该歌曲的路径
+        """
+        self._forward = []
+        self._move_to(self._entries[index])
+        return self.current_path
+
+    def _move_to(self, entry_id):
+        if self._is_valid(self.current) and self.current != entry_id:
+            self._history.append(self.current)
+        self.current = entry_id
+        self._pool_remove(entry_id)
+        if self._upcoming == entry_id:
+            self._upcoming = None
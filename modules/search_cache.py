@@ -0,0 +1,109 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class SearchCache:
+    """
+    搜索结果缓存
+
+    按最近使用顺序保存搜索结果，超过max_entries时淘汰最久未使用的结果，
+    超过ttl秒的结果视为过期。同一个键同时有多个线程查询时只有第一个线程
+    真正发出请求，其余线程等待并共用它的结果；请求失败时不缓存，
+    异常交给所有等待的线程。
+    """
+
+    def __init__(self, max_entries=256, ttl=600, clock=time.monotonic):
+        """
+        Args:
+            max_entries: 最多缓存的结果数
+            ttl: 结果的有效时间（秒）
+            clock: 返回当前时间（秒）的函数
+        """
+        if max_entries < 1:
+            raise ValueError(f"缓存大小必须大于0: {max_entries}")
+
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()   # 键 -> (过期时间, 结果)
+        self._in_flight = {}            # 键 -> 正在进行的请求的Future
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_fetch(self, key, fetch):
+        """
+        返回缓存的结果，没有或已过期时调用fetch获取并缓存
+
+        Args:
+            key: 缓存键
+            fetch: 没有参数的函数，返回要缓存的结果
+
+        Returns:
+            fetch返回的结果（缓存的结果与所有调用方共用，不要修改）
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                self.misses += 1
+                future = self._in_flight[key] = Future()
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._in_flight[key]
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        """清空缓存，正在进行的请求不受影响"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        缓存的统计数据
+
+        Returns:
+            dict: hits为命中次数，misses为发出请求的次数，
+                  coalesced为等待其他线程请求结果的次数，size为缓存的结果数
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'size': len(self._entries),
+            }
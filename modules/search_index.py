@@ -0,0 +1,253 @@
+import os
+import heapq
+import unicodedata
+from array import array
+from modules.track_store import TrackStore
+
+try:
+    # 可选依赖：用于为中文标题生成拼音首字母
+    from pypinyin import lazy_pinyin, Style
+except ImportError:
+    lazy_pinyin = None
+
+
+def normalize_text(text):
+    """
+    规范化搜索文本：统一全角/半角字符并忽略大小写
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        str: 规范化后的文本
+    """
+    return unicodedata.normalize('NFKC', text).casefold()
+
+
+def pinyin_initials(text):
+    """
+    获取文本中汉字的拼音首字母，未安装pypinyin时返回空字符串
+
+    Args:
+        text: 规范化后的文本
+
+    Returns:
+        str: 拼音首字母组成的字符串
+    """
+    if lazy_pinyin is None:
+        return ""
+    initials = "".join(lazy_pinyin(text, style=Style.FIRST_LETTER, errors='ignore'))
+    # 不含汉字的文本没有必要再索引一遍
+    return initials if initials != text else ""
+
+
+class SearchIndex:
+    """
+    基于n-gram倒排表的本地音乐搜索索引
+
+    对规范化后的文件名（含扩展名）建立二元和三元组倒排表，查询时选取
+    最短的倒排表作为候选集再做子串校验，不需要遍历整个音乐库。
+    倒排表使用紧凑的整数数组保存；删除的条目先标记为空，
+    积累到一定数量后再整体重建。路径保存在TrackStore中，
+    只在返回结果时拼接当前页的路径。
+    """
+
+    def __init__(self, paths=None, use_pinyin=True, store=None):
+        self.use_pinyin = use_pinyin and lazy_pinyin is not None
+        self.store = store if store is not None else TrackStore()
+
+        self._tracks = array('i')   # 文档ID -> 歌曲ID，已删除的为-1
+        self._names = []            # 文档ID -> 规范化后的文件名
+        self._initials = []         # 文档ID -> 拼音首字母
+        self._docs = array('i')     # 歌曲ID -> 文档ID，不在索引中为-1
+        self._postings = {}         # n-gram -> 文档ID数组
+        self._count = 0
+        self._removed_count = 0
+
+        # 最近一次查询的排序结果，用于分页
+        self._last_query = None
+        self._last_matches = None
+        self._last_sorted = False
+
+        if paths:
+            self.add(paths)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, path):
+        return self._doc_id(self.store.lookup(path)) >= 0
+
+    def _doc_id(self, track_id):
+        if track_id is None or track_id >= len(self._docs):
+            return -1
+        return self._docs[track_id]
+
+    @staticmethod
+    def _grams(text):
+        """返回文本中所有不重复的二元和三元组"""
+        grams = set()
+        for size in (2, 3):
+            for i in range(len(text) - size + 1):
+                grams.add(text[i:i + size])
+        return grams
+
+    def add(self, paths):
+        """
+        向索引中添加音乐文件
+
+        Args:
+            paths: 音乐文件路径列表
+        """
+        postings = self._postings
+        docs = self._docs
+        for path in paths:
+            track_id = self.store.add(path)
+            if track_id >= len(docs):
+                docs.extend([-1] * (len(self.store) - len(docs)))
+            elif docs[track_id] >= 0:
+                continue
+
+            doc_id = len(self._tracks)
+            # 扩展名也参与匹配，可以用"flac"、".mp3"搜索某种格式；拼音首字母只取主文件名
+            name = normalize_text(self.store.name(track_id))
+            initials = pinyin_initials(os.path.splitext(name)[0]) if self.use_pinyin else ""
+
+            self._tracks.append(track_id)
+            self._names.append(name)
+            self._initials.append(initials)
+            docs[track_id] = doc_id
+            self._count += 1
+
+            grams = self._grams(name)
+            if initials:
+                grams |= self._grams(initials)
+            for gram in grams:
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array('I')
+                posting.append(doc_id)
+
+        self._last_query = None
+
+    def remove(self, paths):
+        """
+        从索引中删除音乐文件
+
+        Args:
+            paths: 音乐文件路径列表
+        """
+        for path in paths:
+            track_id = self.store.lookup(path)
+            doc_id = self._doc_id(track_id)
+            if doc_id < 0:
+                continue
+            self._docs[track_id] = -1
+            self._tracks[doc_id] = -1
+            self._count -= 1
+            self._removed_count += 1
+
+        self._last_query = None
+
+        # 已删除条目超过一半时重建，回收倒排表空间
+        if self._removed_count > self._count:
+            self._rebuild()
+
+    def update(self, added=(), removed=()):
+        """
+        按扫描结果的变化增量更新索引
+
+        Args:
+            added: 新增的文件路径
+            removed: 删除的文件路径
+        """
+        self.remove(removed)
+        self.add(added)
+
+    def _rebuild(self):
+        paths = [self.store.path(track_id) for track_id in self._tracks if track_id >= 0]
+        self.__init__(paths, self.use_pinyin, self.store)
+
+    def _candidates(self, query):
+        """根据查询选取候选文档ID：查询中最罕见的n-gram对应的倒排表"""
+        if len(query) < 2:
+            # 单个字符没有对应的倒排表，只能逐个比较
+            return range(len(self._tracks))
+
+        size = 3 if len(query) >= 3 else 2
+        shortest = None
+        for i in range(len(query) - size + 1):
+            posting = self._postings.get(query[i:i + size])
+            if posting is None:
+                return ()
+            if shortest is None or len(posting) < len(shortest):
+                shortest = posting
+        return shortest
+
+    def _match(self, query):
+        """返回全部匹配结果的 (排序键, 文档ID) 列表，未排序"""
+        if query == self._last_query:
+            return self._last_matches
+
+        tracks = self._tracks
+        names = self._names
+        initials = self._initials
+        scored = []
+        for doc_id in self._candidates(query):
+            if tracks[doc_id] < 0:
+                continue
+
+            name = names[doc_id]
+            position = name.find(query)
+            if position < 0:
+                if query not in initials[doc_id]:
+                    continue
+                # 拼音首字母匹配排在文件名直接匹配之后
+                scored.append((4, 0, len(name), doc_id))
+                continue
+
+            if position == 0:
+                # 查询与不含扩展名的文件名完全相同时也算完全匹配
+                rank = 0 if len(query) in (len(name), len(os.path.splitext(name)[0])) else 1
+            elif not name[position - 1].isalnum():
+                # 匹配位置在单词开头，例如 "周杰伦 - 晴天" 中的 "晴天"
+                rank = 2
+            else:
+                rank = 3
+            scored.append((rank, position, len(name), doc_id))
+
+        self._last_query = query
+        self._last_matches = scored
+        self._last_sorted = False
+        return scored
+
+    def search(self, keyword, offset=0, limit=50):
+        """
+        搜索文件名中包含关键词的音乐，结果按相关度排序
+
+        Args:
+            keyword: 搜索关键词
+            offset: 分页起始位置
+            limit: 每页数量，为None时返回全部结果
+
+        Returns:
+            tuple: (匹配总数, 当前页的音乐文件路径列表)
+        """
+        query = normalize_text(keyword.strip())
+        if not query:
+            return 0, []
+
+        scored = self._match(query)
+        end = len(scored) if limit is None else min(offset + limit, len(scored))
+
+        if self._last_sorted or end * 8 >= len(scored):
+            # 需要大部分结果时整体排序一次，之后翻页直接切片
+            if not self._last_sorted:
+                scored.sort()
+                self._last_sorted = True
+            page = scored[offset:end]
+        else:
+            # 只需要前几页时用部分排序
+            page = heapq.nsmallest(end, scored)[offset:]
+
+        return len(scored), [self.store.path(self._tracks[item[3]]) for item in page]
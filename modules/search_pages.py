@@ -0,0 +1,92 @@
+import threading
+from concurrent.futures import Future
+
+
+class SearchPages:
+    """
+    分页的搜索结果
+
+    next_page()返回下一页的结果，同时在后台获取再下一页，用户浏览当前页时
+    下一页通常已经准备好；直接迭代时逐条返回结果，用到时才获取下一页。
+    fetch_page报告没有下一页（来源返回的结果不足一页）时结束；某一页的结果
+    都与前面的页重复时不算结束，接着获取下一页。
+    """
+
+    def __init__(self, fetch_page, page_size=20):
+        """
+        Args:
+            fetch_page: fetch_page(offset, limit, on_results)返回(从offset开始最多limit条的一页结果,
+                        是否可能还有下一页)，on_results与OnlineMusicManager.search_music的同名参数相同
+            page_size: 每页的结果数
+        """
+        if page_size < 1:
+            raise ValueError(f"每页的结果数必须大于0: {page_size}")
+
+        self.page_size = page_size
+        self._fetch_page = fetch_page
+        self._offset = 0
+        self._prefetch = None       # 后台获取下一页的Future
+        self._exhausted = False
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self):
+        """是否已确定没有更多结果（后台获取的下一页为空且是最后一页时也算）"""
+        prefetch = self._prefetch
+        if prefetch is not None and prefetch.done() and prefetch.exception() is None:
+            page, has_more = prefetch.result()
+            return not page and not has_more
+        return self._exhausted
+
+    def next_page(self, on_results=None):
+        """
+        获取下一页的结果，后台获取尚未完成时等待
+
+        Args:
+            on_results: 每个搜索来源返回后以这一页当前合并的结果调用；
+                        这一页已在后台获取完成时以整页结果调用一次
+
+        Returns:
+            list: 这一页的结果，没有更多结果时为空列表；
+                  结果都与前面的页重复的页被跳过，不会返回空列表
+
+        Raises:
+            Exception: 获取失败，下次调用重新获取这一页
+        """
+        with self._lock:
+            while not self._exhausted:
+                if self._prefetch is not None:
+                    prefetch, self._prefetch = self._prefetch, None
+                    page, has_more = prefetch.result()
+                    if page and on_results:
+                        on_results(list(page))
+                else:
+                    page, has_more = self._fetch_page(self._offset, self.page_size, on_results)
+
+                self._offset += self.page_size
+                self._exhausted = not has_more
+                if page:
+                    if has_more:
+                        self._start_prefetch()
+                    return page
+            return []
+
+    def _start_prefetch(self):
+        future = Future()
+        offset = self._offset
+
+        def run():
+            try:
+                future.set_result(self._fetch_page(offset, self.page_size, None))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="search-prefetch", daemon=True).start()
+        self._prefetch = future
+
+    def __iter__(self):
+        while True:
+            page = self.next_page()
+            if not page:
+                return
+            yield from page
@@ -0,0 +1,322 @@
+import os
+import io
+import struct
+import hashlib
+from array import array
+from modules.library_index import DEFAULT_CACHE_DIR
+from modules.metadata_reader import _parse_mp3_frame_header, _read_id3v2, _empty_metadata
+
+# 索引中相邻两项的时间间隔（秒）
+DEFAULT_STEP = 0.1
+# 建立索引的格式，FLAC和Ogg直接由解码器跳转
+SUPPORTED_EXTENSIONS = ('.mp3',)
+SCAN_CHUNK_SIZE = 1024 * 1024
+
+# 索引缓存文件头: 标识, 版本, 格式, 文件大小, 修改时间, 采样率, 总采样数, 间隔, 项数
+_SIDECAR_HEADER = struct.Struct('<4sH4sqdIQdI')
+_SIDECAR_MAGIC = b'SKIX'
+_SIDECAR_VERSION = 1
+
+
+class SeekIndex:
+    """
+    音频文件的时间到字节位置索引
+
+    按固定的时间间隔保存一张表，第i项是在 i*step 秒或之前开始的最后一个
+    音频帧的起始采样数和字节位置。跳转时直接按下标取出，不需要从头解码或二分查找。
+    """
+
+    def __init__(self, file_format, sample_rate, total_samples, step, samples, offsets):
+        self.format = file_format
+        self.sample_rate = sample_rate
+        self.total_samples = total_samples
+        self.step = step
+        self.samples = samples      # array('Q')
+        self.offsets = offsets      # array('Q')
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def duration(self):
+        """精确的总时长（秒）"""
+        return self.total_samples / self.sample_rate if self.sample_rate else 0
+
+    def lookup(self, seconds):
+        """
+        查找跳转位置
+
+        Args:
+            seconds: 目标时间（秒）
+
+        Returns:
+            tuple: (字节位置, 该位置对应的准确时间)，索引为空时返回None
+        """
+        if not self.offsets:
+            return None
+        i = min(max(0, int(seconds / self.step)), len(self.offsets) - 1)
+        return self.offsets[i], self.samples[i] / self.sample_rate
+
+    def save(self, sidecar_path, file_size, file_mtime):
+        """保存到索引缓存文件（先写临时文件再替换）"""
+        temp_path = sidecar_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(_SIDECAR_HEADER.pack(
+                _SIDECAR_MAGIC, _SIDECAR_VERSION, self.format.encode('ascii').ljust(4, b'\x00'),
+                file_size, file_mtime, self.sample_rate, self.total_samples,
+                self.step, len(self.offsets)
+            ))
+            self.samples.tofile(f)
+            self.offsets.tofile(f)
+        os.replace(temp_path, sidecar_path)
+
+    @classmethod
+    def load(cls, sidecar_path, file_size, file_mtime):
+        """读取索引缓存文件，文件不存在、损坏或音频文件已修改时返回None"""
+        try:
+            with open(sidecar_path, 'rb') as f:
+                header = f.read(_SIDECAR_HEADER.size)
+                if len(header) < _SIDECAR_HEADER.size:
+                    return None
+                (magic, version, file_format, size, mtime, sample_rate,
+                 total_samples, step, count) = _SIDECAR_HEADER.unpack(header)
+                if (magic != _SIDECAR_MAGIC or version != _SIDECAR_VERSION
+                        or size != file_size or mtime != file_mtime):
+                    return None
+                samples = array('Q')
+                offsets = array('Q')
+                samples.fromfile(f, count)
+                offsets.fromfile(f, count)
+        except (OSError, EOFError, struct.error):
+            return None
+        return cls(file_format.rstrip(b'\x00').decode('ascii'), sample_rate,
+                   total_samples, step, samples, offsets)
+
+    @classmethod
+    def build(cls, file_path, step=DEFAULT_STEP):
+        """
+        扫描音频文件建立索引
+
+        Returns:
+            SeekIndex: 不支持的格式或无法解析时返回None
+        """
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext not in SUPPORTED_EXTENSIONS:
+            return None
+
+        try:
+            file_size = os.path.getsize(file_path)
+            with open(file_path, 'rb') as f:
+                result = _scan_mp3(f, file_size)
+        except (OSError, struct.error, IndexError) as e:
+            print(f"建立跳转索引失败 {file_path}: {str(e)}")
+            return None
+        if result is None:
+            return None
+
+        sample_rate, total_samples, points = result
+        samples, offsets = _to_grid(points, sample_rate, total_samples, step)
+        return cls(ext.lstrip('.'), sample_rate, total_samples, step, samples, offsets)
+
+
+def _to_grid(points, sample_rate, total_samples, step):
+    """
+    把按采样数递增的 (采样数, 字节位置) 序列转换为固定间隔的表，
+    每一项取在该时间点或之前开始的最后一个点
+    """
+    samples = array('Q')
+    offsets = array('Q')
+    previous = None
+    for sample, offset in points:
+        while previous is not None and sample > round(len(offsets) * step * sample_rate):
+            samples.append(previous[0])
+            offsets.append(previous[1])
+        previous = (sample, offset)
+    if previous is not None:
+        while round(len(offsets) * step * sample_rate) <= total_samples:
+            samples.append(previous[0])
+            offsets.append(previous[1])
+    return samples, offsets
+
+
+class _ChunkReader:
+    """按块读取文件，支持在当前块内随机访问"""
+
+    def __init__(self, f):
+        self.f = f
+        self.base = 0
+        self.data = b''
+
+    def get(self, pos, length):
+        if pos < self.base or pos + length > self.base + len(self.data):
+            self.f.seek(pos)
+            self.data = self.f.read(max(length, SCAN_CHUNK_SIZE))
+            self.base = pos
+        start = pos - self.base
+        return self.data[start:start + length]
+
+    def find(self, pattern, pos, end):
+        """从pos开始查找字节串，找不到时返回end"""
+        while pos < end:
+            self.get(pos, len(pattern))
+            index = self.data.find(pattern, pos - self.base)
+            if index >= 0:
+                return min(self.base + index, end)
+            if len(self.data) < len(pattern):
+                break
+            # 下一块与本块重叠，避免漏掉跨越块边界的字节串
+            pos = self.base + len(self.data) - len(pattern) + 1
+        return end
+
+    def find_sync(self, pos, end):
+        """从pos开始查找下一个可能的帧同步字节"""
+        return self.find(b'\xff', pos, end)
+
+
+def _scan_mp3(f, file_size):
+    """逐帧扫描MPEG音频，返回 (采样率, 总采样数, 帧位置生成器)"""
+    audio_start = _read_id3v2(f, _empty_metadata())
+    audio_end = file_size
+    if file_size >= 128:
+        f.seek(file_size - 128)
+        if f.read(3) == b'TAG':
+            audio_end -= 128
+
+    reader = _ChunkReader(f)
+    pos = reader.find_sync(audio_start, audio_end)
+    frame = None
+    while pos + 4 <= audio_end:
+        frame = _parse_mp3_frame_header(reader.get(pos, 4))
+        if frame and frame['frame_length'] > 0:
+            break
+        pos = reader.find_sync(pos + 1, audio_end)
+    else:
+        return None
+
+    sample_rate = frame['sample_rate']
+
+    # 先扫描一遍得到帧列表，总采样数需要在转换为固定间隔的表之前确定
+    frames = array('Q')
+    first = True
+    while pos + 4 <= audio_end:
+        frame = _parse_mp3_frame_header(reader.get(pos, 4))
+        if not frame or frame['frame_length'] <= 0 or frame['sample_rate'] != sample_rate:
+            # 帧头损坏时重新同步
+            pos = reader.find_sync(pos + 1, audio_end)
+            continue
+
+        if first:
+            first = False
+            # Xing/Info/VBRI帧不含音频数据，解码器会跳过它
+            if _is_vbr_header_frame(reader.get(pos, 64), frame):
+                pos += frame['frame_length']
+                continue
+
+        frames.append(pos)
+        frames.append(frame['samples_per_frame'])
+        pos += frame['frame_length']
+
+    def points():
+        sample = 0
+        for i in range(0, len(frames), 2):
+            yield sample, frames[i]
+            sample += frames[i + 1]
+
+    total_samples = sum(frames[1::2])
+    return sample_rate, total_samples, points()
+
+
+def _is_vbr_header_frame(data, frame):
+    if frame['version'] == 1:
+        side_info = 17 if frame['mono'] else 32
+    else:
+        side_info = 9 if frame['mono'] else 17
+    return data[4 + side_info:8 + side_info] in (b'Xing', b'Info') or data[36:40] == b'VBRI'
+
+
+class OffsetStream(io.RawIOBase):
+    """
+    从文件中间某个字节位置开始的只读文件对象
+
+    交给pygame加载时，解码器看到的就是从该帧开始的音频流。
+    """
+
+    def __init__(self, file_path, start):
+        self._file = open(file_path, 'rb')
+        self._start = start
+        self._size = os.fstat(self._file.fileno()).st_size - start
+        self._file.seek(start)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self._file.readinto(buffer)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            position = offset
+        elif whence == os.SEEK_CUR:
+            position = self.tell() + offset
+        else:
+            position = self._size + offset
+        self._file.seek(self._start + max(0, position))
+        return self.tell()
+
+    def tell(self):
+        return self._file.tell() - self._start
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class SeekIndexCache:
+    """
+    跳转索引的缓存
+
+    索引第一次使用时扫描文件建立，保存在缓存目录下以路径哈希命名的小文件中，
+    音频文件的大小或修改时间变化后重新建立。
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = os.path.join(cache_dir or DEFAULT_CACHE_DIR, 'seek_index')
+
+    def _sidecar_path(self, file_path):
+        digest = hashlib.sha1(os.path.abspath(file_path).encode('utf-8', 'surrogatepass')).hexdigest()
+        return os.path.join(self.cache_dir, digest + '.idx')
+
+    def get(self, file_path):
+        """
+        获取文件的跳转索引
+
+        Args:
+            file_path: 音频文件路径
+
+        Returns:
+            SeekIndex: 不支持的格式返回None
+        """
+        # 不读取以前为其他格式保存的索引
+        if os.path.splitext(file_path)[1].lower() not in SUPPORTED_EXTENSIONS:
+            return None
+        try:
+            stats = os.stat(file_path)
+        except OSError:
+            return None
+
+        sidecar_path = self._sidecar_path(file_path)
+        index = SeekIndex.load(sidecar_path, stats.st_size, stats.st_mtime)
+        if index is not None:
+            return index
+
+        index = SeekIndex.build(file_path)
+        if index is not None:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                index.save(sidecar_path, stats.st_size, stats.st_mtime)
+            except OSError as e:
+                print(f"保存跳转索引失败: {str(e)}")
+        return index
@@ -0,0 +1,274 @@
+import io
+import os
+import time
+import threading
+
+
+class StreamBuffer:
+    """
+    边下载边播放的缓冲
+
+    下载线程把文件写入.part文件，并报告从文件开头起已连续写入的字节数；
+    播放时通过open()得到的文件对象读取，读到尚未下载的位置时等待。
+    解码器加载时会读取文件末尾（MP3的标签、Ogg的最后一页），文件末尾的
+    tail_size个字节单独请求后保存在内存中，不需要等整个文件下载完。
+
+    已连续下载start_bytes个字节（且文件末尾已取得）后可以开始播放；
+    播放中剩余的缓冲少于low_watermark时应暂停，再次达到start_bytes后继续。
+    播放的数据就是下载的文件本身，下载完成后文件照常保存。
+    """
+
+    def __init__(self, start_bytes=256 * 1024, low_watermark=64 * 1024, tail_size=128 * 1024,
+                 clock=time.perf_counter):
+        """
+        Args:
+            start_bytes: 开始播放和恢复播放需要的缓冲字节数
+            low_watermark: 剩余缓冲少于此字节数时暂停播放
+            tail_size: 单独请求的文件末尾字节数
+            clock: 返回当前时间（秒）的函数，用于测量开始播放的耗时
+        """
+        if low_watermark >= start_bytes:
+            raise ValueError(f"暂停的缓冲大小必须小于开始播放的缓冲大小: {low_watermark} >= {start_bytes}")
+
+        self.start_bytes = start_bytes
+        self.low_watermark = low_watermark
+        self.tail_size = tail_size
+        self._clock = clock
+        # 请求播放和缓冲足够开始播放的时刻
+        self.requested_at = clock()
+        self.ready_at = None
+
+        self._path = None           # 正在写入的.part文件，下载完成后为目标文件
+        self._available = 0         # 从文件开头起已连续写入的字节数
+        self._total = None
+        self._tail_start = None     # 内存中文件末尾数据的起始位置
+        self._tail = None
+        self._complete = False
+        self.error = None
+        self._closed = False
+        self._cond = threading.Condition()
+
+    # ---- 下载线程调用 ----
+
+    def begin(self, part_path):
+        """下载开始写入part_path"""
+        with self._cond:
+            self._path = part_path
+            self._cond.notify_all()
+
+    def update(self, available, total=None):
+        """
+        报告已连续写入的字节数
+
+        下载从头重新开始时数值会变小，之前的数据不能再读取。
+        """
+        with self._cond:
+            self._available = available
+            if total is not None:
+                self._total = total
+            self._check_ready()
+            self._cond.notify_all()
+
+    def set_tail(self, start, data):
+        """
+        保存文件末尾的数据
+
+        Args:
+            start: 数据在文件中的起始位置，无法单独取得末尾时为None
+            data: 从start到文件结尾的数据
+        """
+        with self._cond:
+            if start is not None:
+                self._tail_start = start
+                self._tail = data
+                self._total = start + len(data)
+            self._check_ready()
+            self._cond.notify_all()
+
+    def finish(self, file_path):
+        """下载完成，之后从file_path读取"""
+        with self._cond:
+            self._path = file_path
+            try:
+                self._total = os.path.getsize(file_path)
+            except OSError as e:
+                self.error = e
+            else:
+                self._available = self._total
+                self._complete = True
+            self._check_ready()
+            self._cond.notify_all()
+
+    def fail(self, error):
+        """下载失败，正在等待数据的读取返回文件结尾"""
+        with self._cond:
+            self.error = error
+            self._cond.notify_all()
+
+    def _check_ready(self):
+        if self.ready_at is None and self._is_ready():
+            self.ready_at = self._clock()
+
+    def _is_ready(self):
+        if self._complete:
+            return True
+        # 文件末尾拿不到时，解码器加载时就要等到下载完成
+        if self._tail_start is None:
+            return False
+        return self._has_enough(0)
+
+    def _has_enough(self, position):
+        """从position开始已缓冲start_bytes个字节，或已缓冲到文件结尾（调用时已持有锁）"""
+        wanted = self.start_bytes
+        if self._total is not None:
+            wanted = min(wanted, self._total - position)
+        return self._readable_from(position) >= wanted
+
+    def _readable_from(self, position):
+        """从position开始不需要等待就能读到的字节数（调用时已持有锁）"""
+        if self._complete:
+            return max(0, self._total - position)
+        tail_start = self._tail_start
+        if tail_start is not None and (position >= tail_start or self._available >= tail_start):
+            return self._total - position
+        return max(0, self._available - position)
+
+    # ---- 界面线程调用 ----
+
+    @property
+    def ready(self):
+        """缓冲是否已足够开始播放"""
+        return self.ready_at is not None
+
+    @property
+    def complete(self):
+        """文件是否已下载完成"""
+        return self._complete
+
+    def buffered_ahead(self, position):
+        """
+        从播放位置往后已缓冲的字节数
+
+        Args:
+            position: 解码器读到的位置（StreamReader.tell()）
+
+        Returns:
+            int: 字节数，下载完成后为剩余的全部字节数
+        """
+        with self._cond:
+            return self._readable_from(position)
+
+    def should_pause(self, position):
+        """剩余缓冲是否已低于暂停的水位"""
+        with self._cond:
+            return not self._complete and self._readable_from(position) < self.low_watermark
+
+    def can_resume(self, position):
+        """暂停后缓冲是否已足够继续播放"""
+        with self._cond:
+            if self._complete or self.error is not None:
+                return True
+            return self._has_enough(position)
+
+    def open(self):
+        """
+        打开用于播放的文件对象
+
+        Returns:
+            StreamReader: 只读的文件对象，可以交给pygame加载
+        """
+        return StreamReader(self)
+
+    def close(self):
+        """停止播放，正在等待数据的读取立即返回"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    # ---- StreamReader调用 ----
+
+    def size(self):
+        """文件的总大小，尚不知道时等待；无法得知时返回None"""
+        with self._cond:
+            while self._total is None and not self._complete and self.error is None and not self._closed:
+                self._cond.wait()
+            return self._total
+
+    def read_at(self, position, buffer):
+        """
+        从文件的position位置读取数据到buffer，数据尚未下载时等待
+
+        Returns:
+            int: 读取的字节数，文件结尾、下载失败或已关闭时为0
+        """
+        view = memoryview(buffer)
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed or self.error is not None:
+                        return 0
+                    if self._complete:
+                        limit = self._total
+                        break
+                    if self._tail_start is not None and position >= self._tail_start:
+                        data = self._tail[position - self._tail_start:position - self._tail_start + len(view)]
+                        view[:len(data)] = data
+                        return len(data)
+                    if position < self._available:
+                        limit = self._available
+                        break
+                    self._cond.wait()
+                path = self._path
+
+            count = min(len(view), limit - position)
+            if count <= 0:
+                return 0
+            # 每次读取时打开文件，不妨碍下载完成后改名（Windows不能改名已打开的文件）
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(position)
+                    return f.readinto(view[:count])
+            except FileNotFoundError:
+                # 刚好在改名或重新开始下载，等状态更新后再读
+                with self._cond:
+                    self._cond.wait(0.05)
+
+
+class StreamReader(io.RawIOBase):
+    """
+    边下载边播放时交给pygame的文件对象
+
+    读到尚未下载的位置时等待数据，tell()就是解码器读到的位置。
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self._stream.read_at(self._position, buffer)
+        self._position += count
+        return count
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            position = offset
+        elif whence == os.SEEK_CUR:
+            position = self._position + offset
+        else:
+            position = (self._stream.size() or 0) + offset
+        self._position = max(0, position)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        self._stream.close()
+        super().close()
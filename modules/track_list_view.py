@@ -0,0 +1,226 @@
+from tkinter import ttk
+
+
+class VirtualTrackList(ttk.Frame):
+    """
+    虚拟化的歌曲列表控件
+
+    只为当前可见的行创建Treeview条目，滚动时复用这些条目并替换内容，
+    因此内存占用和绘制时间与音乐库大小无关。数据由外部通过两个函数提供：
+    row_count() 返回总行数，get_row(index) 返回某一行各列的值。
+
+    数据插入、删除或排序后行的位置会变化。提供 row_key(index) 和
+    find_row(key) 时，选中行记录为行的键，刷新时发现该位置上已经换成
+    别的行，就按键找回它新的位置（已被删除时取消选中）。
+    """
+
+    COLUMNS = (
+        ('title', "标题", 320),
+        ('artist', "艺术家", 160),
+        ('duration', "时长", 70),
+        ('format', "格式", 60),
+    )
+    ROW_HEIGHT = 22
+
+    def __init__(self, master, row_count, get_row, on_activate=None, on_sort=None,
+                 row_key=None, find_row=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.row_count = row_count
+        self.get_row = get_row
+        self.row_key = row_key
+        self.find_row = find_row
+        self.on_activate = on_activate
+        self.on_sort = on_sort
+
+        self._top = 0               # 第一行可见行对应的数据位置
+        self._visible = 0           # 当前可见的行数
+        self._selected = None       # 选中行的数据位置
+        self._selected_key = None   # 选中行的键，用于在数据变化后找回它
+        self._sort_column = None
+        self._sort_descending = False
+
+        style = ttk.Style(self)
+        style.configure("TrackList.Treeview", rowheight=self.ROW_HEIGHT, font=("SimHei", 10))
+
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.tree = ttk.Treeview(
+            self, columns=[c[0] for c in self.COLUMNS], show="headings",
+            selectmode="browse", style="TrackList.Treeview"
+        )
+        for column, text, width in self.COLUMNS:
+            self.tree.heading(column, text=text, command=lambda c=column: self._on_heading(c))
+            self.tree.column(column, width=width, stretch=(column == 'title'))
+        self.tree.pack(fill="both", expand=True)
+
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Button-1>", self._on_click)
+        self.tree.bind("<Double-1>", self._on_double_click)
+        self.tree.bind("<Return>", lambda e: self._activate())
+        self.tree.bind("<Up>", lambda e: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self._move_selection(-max(1, self._visible - 1)))
+        self.tree.bind("<Next>", lambda e: self._move_selection(max(1, self._visible - 1)))
+        self.tree.bind("<Home>", lambda e: self._move_selection(-self.row_count()))
+        self.tree.bind("<End>", lambda e: self._move_selection(self.row_count()))
+
+    def _on_configure(self, event):
+        # 根据控件高度调整可见行数（减去表头的高度）
+        visible = max(1, (event.height - self.ROW_HEIGHT - 4) // self.ROW_HEIGHT)
+        if visible != self._visible:
+            self._visible = visible
+            self.refresh()
+
+    def _set_selected(self, index):
+        self._selected = index
+        if index is not None and self.row_key:
+            self._selected_key = self.row_key(index)
+        else:
+            self._selected_key = None
+
+    def _sync_selection(self):
+        """数据变化后更新选中行的位置"""
+        if self._selected is None:
+            return
+        count = self.row_count()
+        if not self.row_key:
+            if self._selected >= count:
+                self._selected = None
+            return
+        if self._selected < count and self.row_key(self._selected) == self._selected_key:
+            return
+        index = self.find_row(self._selected_key)
+        if index is None:
+            self._set_selected(None)
+        else:
+            self._selected = index
+
+    def refresh(self):
+        """按当前数据重新填充可见行"""
+        self._sync_selection()
+        count = self.row_count()
+        self._top = max(0, min(self._top, count - self._visible))
+
+        items = self.tree.get_children()
+        needed = min(self._visible, count - self._top)
+
+        # 只在可见行数变化时增删条目，滚动时复用已有条目
+        for iid in items[needed:]:
+            self.tree.delete(iid)
+        for i in range(len(items), needed):
+            self.tree.insert("", "end", iid=f"row{i}")
+
+        for i in range(needed):
+            self.tree.item(f"row{i}", values=self.get_row(self._top + i))
+
+        if self._selected is not None and self._top <= self._selected < self._top + needed:
+            self.tree.selection_set(f"row{self._selected - self._top}")
+        else:
+            self.tree.selection_set(())
+
+        if count:
+            self.scrollbar.set(self._top / count, min(1.0, (self._top + needed) / count))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll(self, rows):
+        """滚动指定的行数"""
+        self._top += rows
+        self._top = max(0, self._top)
+        self.refresh()
+
+    def see(self, index):
+        """滚动使指定的数据位置可见"""
+        if index < self._top:
+            self._top = index
+        elif index >= self._top + self._visible:
+            self._top = index - self._visible + 1
+        self.refresh()
+
+    def select(self, index):
+        """选中指定的数据位置，None表示取消选中"""
+        self._set_selected(index)
+        self.refresh()
+
+    def selected_index(self):
+        """返回选中行的数据位置，没有选中时返回None"""
+        self._sync_selection()
+        return self._selected
+
+    def _on_scrollbar(self, action, *args):
+        count = self.row_count()
+        if action == "moveto":
+            self._top = int(float(args[0]) * count)
+        elif action == "scroll":
+            amount = int(args[0])
+            if args[1] == "pages":
+                amount *= max(1, self._visible - 1)
+            self._top += amount
+        self._top = max(0, self._top)
+        self.refresh()
+
+    def _on_mousewheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _row_at(self, y):
+        iid = self.tree.identify_row(y)
+        if not iid:
+            return None
+        return self._top + self.tree.index(iid)
+
+    def _on_click(self, event):
+        if self.tree.identify_region(event.x, event.y) == "heading":
+            return None
+        index = self._row_at(event.y)
+        if index is not None:
+            self._set_selected(index)
+        self.tree.focus_set()
+        self.refresh()
+        return "break"
+
+    def _on_double_click(self, event):
+        if self.tree.identify_region(event.x, event.y) == "heading":
+            return None
+        index = self._row_at(event.y)
+        if index is not None:
+            self._set_selected(index)
+            self._activate()
+        return "break"
+
+    def _activate(self):
+        if self.on_activate and self.selected_index() is not None:
+            self.on_activate(self._selected)
+        return "break"
+
+    def _move_selection(self, delta):
+        count = self.row_count()
+        if not count:
+            return "break"
+        self._sync_selection()
+        current = self._selected if self._selected is not None else self._top - 1
+        self._set_selected(max(0, min(count - 1, current + delta)))
+        self.see(self._selected)
+        return "break"
+
+    def _on_heading(self, column):
+        """点击表头时排序，再次点击同一列时反向排序"""
+        if self._sort_column == column:
+            self._sort_descending = not self._sort_descending
+        else:
+            self._sort_column = column
+            self._sort_descending = False
+
+        for name, text, width in self.COLUMNS:
+            arrow = ""
+            if name == column:
+                arrow = " ▼" if self._sort_descending else " ▲"
+            self.tree.heading(name, text=text + arrow)
+
+        if self.on_sort:
+            self.on_sort(column, self._sort_descending)
+        self.refresh()
@@ -0,0 +1,75 @@
+import math
+import threading
+from array import array
+from modules.track_store import TrackStore
+
+
+class TrackMetadata:
+    """
+    按歌曲ID保存的标题、艺术家和时长
+
+    与TrackStore共用歌曲ID，不保存路径字符串，也不为每首歌保存一个字典：
+    标题放在按歌曲ID索引的列表中，艺术家在艺术家表中只保存一次，
+    每首歌只记录艺术家ID，时长放在浮点数组中（未知为NaN）。
+
+    更新操作加锁，可以在后台线程中读取标签时写入；一首歌的各列写完后
+    才标记为已读取，所以界面线程读取不需要加锁。
+    """
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else TrackStore()
+        self._known = bytearray()       # 歌曲ID -> 是否已读取标签
+        self._titles = []               # 歌曲ID -> 标题
+        self._track_artists = array('i')    # 歌曲ID -> 艺术家ID
+        self._durations = array('d')    # 歌曲ID -> 时长（秒），未知为NaN
+        self._artists = []              # 艺术家ID -> 艺术家
+        self._artist_ids = {}           # 艺术家 -> 艺术家ID
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._known.count(1)
+
+    def _grow(self, size):
+        missing = size - len(self._known)
+        if missing > 0:
+            # 先扩展数据列，最后扩展标记，读取方不会看到没有数据的位置
+            self._titles.extend([None] * missing)
+            self._track_artists.extend([-1] * missing)
+            self._durations.extend([math.nan] * missing)
+            self._known.extend(bytes(missing))
+
+    def update(self, results):
+        """
+        保存读取到的标签
+
+        Args:
+            results: 以路径为键、包含title、artist、duration的字典为值的字典
+        """
+        with self._lock:
+            track_ids = self.store.add_many(list(results))
+            self._grow(len(self.store))
+            for track_id, metadata in zip(track_ids, results.values()):
+                artist = metadata['artist']
+                artist_id = self._artist_ids.get(artist)
+                if artist_id is None:
+                    artist_id = self._artist_ids[artist] = len(self._artists)
+                    self._artists.append(artist)
+                self._titles[track_id] = metadata['title']
+                self._track_artists[track_id] = artist_id
+                duration = metadata['duration']
+                self._durations[track_id] = math.nan if duration is None else duration
+                self._known[track_id] = 1
+
+    def get(self, path):
+        """
+        返回歌曲的 (标题, 艺术家, 时长)
+
+        Returns:
+            tuple: 时长未知时为None；标签尚未读取时返回None
+        """
+        track_id = self.store.lookup(path)
+        if track_id is None or track_id >= len(self._known) or not self._known[track_id]:
+            return None
+        duration = self._durations[track_id]
+        return (self._titles[track_id], self._artists[self._track_artists[track_id]],
+                None if math.isnan(duration) else duration)
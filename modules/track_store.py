@@ -0,0 +1,146 @@
+import os
+import threading
+from array import array
+
+# 哈希表中的空槽位
+_EMPTY = -1
+
+
+class TrackStore:
+    """
+    紧凑的音乐文件路径存储
+
+    同一目录下的文件共用一个目录前缀：目录路径在目录表中只保存一次，
+    每首歌只保存目录ID和UTF-8编码的文件名，都放在连续的数组里，
+    完整路径在需要时才拼接出来。路径到歌曲ID的查找使用开放寻址哈希表，
+    表中只保存歌曲ID，不保存完整路径字符串。
+
+    歌曲ID从0开始连续分配，同一路径总是得到同一个ID，添加后不会删除。
+    添加操作加锁，可以在扫描线程和界面线程中同时使用；新歌曲的数据先写入
+    各个数组，最后才放进哈希表，所以读取不需要加锁。
+    """
+
+    def __init__(self):
+        self._dirs = []                 # 目录ID -> 目录前缀（含末尾的分隔符）
+        self._dir_ids = {}              # 目录前缀 -> 目录ID
+        self._track_dirs = array('I')   # 歌曲ID -> 目录ID
+        self._name_offsets = array('Q', [0])
+        self._names = bytearray()       # 所有文件名依次拼接
+        self._hashes = array('I')       # 歌曲ID -> 路径哈希值的低32位
+        # 哈希表的大小是2的幂，扩容时整个替换，读取方只读取一次再用它的长度求掩码
+        self._table = array('i', [_EMPTY]) * 8
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._track_dirs)
+
+    def __contains__(self, path):
+        return self.lookup(path) is not None
+
+    @staticmethod
+    def _split(path):
+        # 按最后一个分隔符拆分，前缀保留分隔符，保证拼接后与原路径完全一致
+        index = path.rfind(os.sep)
+        if os.altsep:
+            index = max(index, path.rfind(os.altsep))
+        index += 1
+        return path[:index], path[index:]
+
+    def _find_slot(self, table, path, path_hash):
+        """返回路径在table中所在的槽位，或应插入的空槽位"""
+        mask = len(table) - 1
+        slot = path_hash & mask
+        while True:
+            track_id = table[slot]
+            if track_id == _EMPTY:
+                return slot
+            if self._hashes[track_id] == path_hash and self.path(track_id) == path:
+                return slot
+            slot = (slot + 1) & mask
+
+    def lookup(self, path):
+        """
+        查找路径对应的歌曲ID
+
+        Returns:
+            int: 歌曲ID，路径不存在时返回None
+        """
+        table = self._table
+        track_id = table[self._find_slot(table, path, hash(path) & 0xFFFFFFFF)]
+        return None if track_id == _EMPTY else track_id
+
+    def add(self, path):
+        """
+        添加路径，已存在时直接返回原来的ID
+
+        Returns:
+            int: 歌曲ID
+        """
+        with self._lock:
+            return self._add(path)
+
+    def _add(self, path):
+        path_hash = hash(path) & 0xFFFFFFFF
+        table = self._table
+        slot = self._find_slot(table, path, path_hash)
+        track_id = table[slot]
+        if track_id != _EMPTY:
+            return track_id
+
+        prefix, name = self._split(path)
+        dir_id = self._dir_ids.get(prefix)
+        if dir_id is None:
+            dir_id = self._dir_ids[prefix] = len(self._dirs)
+            self._dirs.append(prefix)
+
+        track_id = len(self._track_dirs)
+        self._track_dirs.append(dir_id)
+        self._names += name.encode('utf-8', 'surrogatepass')
+        self._name_offsets.append(len(self._names))
+        self._hashes.append(path_hash)
+        table[slot] = track_id
+
+        # 负载超过一半时扩容，用保存的哈希值重新插入，不需要拼接路径
+        if len(self._track_dirs) * 2 > len(self._table):
+            self._grow()
+        return track_id
+
+    def add_many(self, paths):
+        """
+        批量添加路径
+
+        Returns:
+            list: 与输入顺序对应的歌曲ID
+        """
+        with self._lock:
+            return [self._add(path) for path in paths]
+
+    def _grow(self):
+        size = len(self._table) * 2
+        table = array('i', [_EMPTY]) * size
+        mask = size - 1
+        for track_id, path_hash in enumerate(self._hashes):
+            slot = path_hash & mask
+            while table[slot] != _EMPTY:
+                slot = (slot + 1) & mask
+            table[slot] = track_id
+        self._table = table
+
+    def name(self, track_id):
+        """返回歌曲的文件名"""
+        start = self._name_offsets[track_id]
+        end = self._name_offsets[track_id + 1]
+        return self._names[start:end].decode('utf-8', 'surrogatepass')
+
+    def directory(self, track_id):
+        """返回歌曲所在目录的前缀（含末尾的分隔符）"""
+        return self._dirs[self._track_dirs[track_id]]
+
+    def path(self, track_id):
+        """拼接歌曲的完整路径"""
+        return self._dirs[self._track_dirs[track_id]] + self.name(track_id)
+
+    def paths(self, track_ids):
+        """按顺序逐个生成完整路径"""
+        for track_id in track_ids:
+            yield self.path(track_id)
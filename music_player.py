@@ -1,14 +1,28 @@
+import time
+
+# 启动计时的起点，放在其他导入之前以便统计导入耗时
+STARTUP_BEGIN = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
 import os
-import pygame
 import threading
-import time
-import json
+import queue
 from modules.local_music_manager import LocalMusicManager
-from modules.online_music_manager import OnlineMusicManager
+from modules.folder_watcher import FolderWatcher
+from modules.track_list_view import VirtualTrackList
+from modules.playlist import Playlist
+from modules.track_metadata import TrackMetadata
+from modules.seek_index import SeekIndexCache, OffsetStream
+from modules.config_store import ConfigStore
+
+# pygame在第一次播放时才导入（见MusicPlayer.ensure_mixer），缩短启动时间
+pygame = None
 
 class MusicPlayer:
+    # 后台读取标签时每批的歌曲数
+    METADATA_BATCH_SIZE = 4096
+    
     def __init__(self, root):
         # 初始化主窗口
         self.root = root
@@ -17,12 +31,20 @@ class MusicPlayer:
         self.root.resizable(True, True)
         self.root.configure(bg="#f0f0f0")
         
-        # 初始化pygame混音器
-        pygame.mixer.init()
+        # 启动各阶段的耗时（秒），窗口第一次显示时记录
+        self.startup_marks = {}
+        self.startup_reported = False
+        self.mark_startup("导入模块")
+        self.root.bind("<Map>", lambda e: self.mark_startup("窗口显示"), add="+")
         
-        # 初始化音乐管理器
+        # 混音器在第一次播放时才初始化
+        self.mixer_ready = False
+        self.end_event = None
+        
+        # 初始化音乐管理器，在线音乐管理器（及requests）在第一次使用时才创建
         self.local_music_manager = LocalMusicManager()
-        self.online_music_manager = OnlineMusicManager()
+        self._online_music_manager = None
+        self._online_lock = threading.Lock()
         
         # 当前播放状态
         self.current_song = None
@@ -31,57 +53,142 @@ class MusicPlayer:
         self.current_position = 0
         self.is_repeat = False
         self.is_shuffle = False
-        self.playlist = []
+        self.playlist = Playlist(store=self.local_music_manager.track_store)
+        # 当前的排序：(列名, 是否倒序)，列名为None时按文件名排序
+        self.playlist_sort = (None, False)
+        self.current_duration = 0
+        # 拖动进度条后get_pos不会重置，需要加上跳转造成的偏移
+        self.position_offset = 0
+        # 待执行的播放状态检查（Tk after任务ID）
+        self.playback_job = None
+        
+        # 已放入pygame播放队列的下一首歌曲，当前歌曲结束后立即开始播放
+        self.queued_song = None
+        # 最近一次检查时的 (时间, 播放位置)，用于估计歌曲结束的时刻
+        self.last_tick = None
+        self.track_ended_at = None
+        
+        # 当前歌曲的跳转索引 (路径, SeekIndex)，在后台建立
+        self.seek_index_cache = SeekIndexCache()
+        self.seek_index = None
+        # 从MP3中间位置开始播放或边下载边播放时交给pygame的文件对象
+        self.seek_stream = None
+        
+        # 音乐库中歌曲的标签和时长，扫描完成后在后台读取，按歌曲ID保存
+        self.track_metadata = TrackMetadata(self.local_music_manager.track_store)
+        self.metadata_updated = False
+        
+        # 后台扫描线程通过队列把结果交给界面线程
+        self.scan_queue = queue.Queue()
+        self.scan_generation = 0
+        
+        # 在线搜索结果，新的搜索开始后旧搜索的结果全部丢弃
+        self.search_results = []
+        self.search_generation = 0
+        # 最近一次搜索的分页结果（SearchPages），"更多结果"从中取下一页
+        self.search_pager = None
+        # 正在下载的任务：任务ID -> (列表中的行, 原来的文字, 搜索序号, 完成时是否提示)
+        self.download_rows = {}
+        self.download_poll_job = None
+        
+        # 边下载边播放：等待缓冲的 (StreamBuffer, 音乐信息)，正在播放的StreamBuffer和歌名，
+        # 缓冲不足时是否已暂停，以及是否已报告开始出声的耗时
+        self.pending_stream = None
+        self.stream_playback = None
+        self.stream_title = None
+        self.stream_stalled = False
+        self.stream_started_reported = False
+        
+        # 文件夹监视器，发现的变化通过队列交给界面线程
+        self.folder_watcher = None
+        self.watch_queue = queue.Queue()
         
         # 加载配置
         self.config = self.load_config()
         
         # 创建UI界面
         self.create_ui()
+        self.mark_startup("创建界面")
         
-        # 创建播放进度条更新线程
-        self.update_thread = None
-        self.stop_thread = False
-        
-        # 扫描默认音乐文件夹
+        # 先显示索引中缓存的音乐列表，再在后台检查文件夹的变化
         if 'default_music_folder' in self.config:
-            self.scan_music_folder(self.config['default_music_folder'])
+            self.scan_music_folder(self.config['default_music_folder'], use_cache=True)
+    
+    def mark_startup(self, name):
+        """记录启动阶段完成的时刻（从进程启动开始计算），只记录第一次"""
+        if not self.startup_reported and name not in self.startup_marks:
+            self.startup_marks[name] = time.perf_counter() - STARTUP_BEGIN
+    
+    def report_startup(self):
+        """启动完成后在控制台输出各阶段的耗时"""
+        if self.startup_reported:
+            return
+        self.startup_reported = True
+        if not self.config.get('startup_report'):
+            return
+        print("启动耗时:")
+        for name, elapsed in self.startup_marks.items():
+            print(f"  {name}: {elapsed * 1000:.0f} ms")
+    
+    def ensure_mixer(self):
+        """第一次播放时导入pygame并初始化混音器"""
+        global pygame
+        if self.mixer_ready:
+            return
+        import pygame as pygame_module
+        pygame = pygame_module
+        pygame.mixer.init()
+        pygame.mixer.music.set_volume(self.config['volume'])
+        
+        # 播放结束时由pygame发出事件，事件系统需要初始化显示模块（不会创建窗口）
+        try:
+            pygame.display.init()
+            self.end_event = pygame.USEREVENT + 1
+            pygame.mixer.music.set_endevent(self.end_event)
+        except pygame.error as e:
+            print(f"无法使用播放结束事件，改为检查播放状态: {str(e)}")
+        self.mixer_ready = True
+    
+    @property
+    def online_music_manager(self):
+        """在线音乐管理器，第一次使用时才导入和创建"""
+        with self._online_lock:
+            if self._online_music_manager is None:
+                from modules.online_music_manager import OnlineMusicManager
+                self._online_music_manager = OnlineMusicManager()
+            return self._online_music_manager
     
     def load_config(self):
-        """加载配置文件"""
-        config_file = "config.json"
+        """加载配置文件，之后读取配置不再访问磁盘"""
         default_config = {
             'default_music_folder': os.path.expanduser("~") + "\Music",
             'download_folder': os.path.expanduser("~") + "\Music\Downloads",
-            'volume': 0.7
+            'volume': 0.7,
+            # 为True时在控制台输出每次自动切换歌曲的间隙（毫秒）
+            'measure_transition_gap': False,
+            # 为True时在控制台输出启动各阶段的耗时
+            'startup_report': False,
+            # 为True时在控制台输出"立即播放"从点击到开始出声的耗时
+            'measure_time_to_first_sound': False
         }
         
-        if os.path.exists(config_file):
-            try:
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    # 合并默认配置和用户配置
-                    for key, value in default_config.items():
-                        if key not in config:
-                            config[key] = value
-                    return config
-            except:
-                return default_config
-        else:
+        # 用户配置覆盖默认配置；修改最多每秒写入一次，在后台线程中原子替换
+        config = ConfigStore("config.json", default_config, min_interval=1.0, fsync=True)
+        if not config.existed:
             # 创建默认下载文件夹
             os.makedirs(default_config['download_folder'], exist_ok=True)
-            return default_config
+        return config
     
     def save_config(self):
-        """保存配置文件"""
-        with open("config.json", 'w', encoding='utf-8') as f:
-            json.dump(self.config, f, ensure_ascii=False, indent=4)
+        """保存配置文件（合并后在后台写入）"""
+        self.config.save()
     
     def create_ui(self):
         """创建用户界面"""
         # 创建选项卡控件
         tab_control = ttk.Notebook(self.root)
         tab_control.pack(fill="both", expand=True, padx=10, pady=10)
+        self.tab_control = tab_control
         
         # 创建本地音乐选项卡
         self.local_tab = ttk.Frame(tab_control)
@@ -94,12 +201,19 @@ class MusicPlayer:
         # 创建本地音乐界面
         self.create_local_music_ui()
         
-        # 创建在线音乐界面
-        self.create_online_music_ui()
+        # 在线音乐界面在第一次切换到该选项卡时才创建
+        self.online_ui_created = False
+        tab_control.bind("<<NotebookTabChanged>>", self.on_tab_changed)
         
         # 创建底部控制栏
         self.create_control_bar()
     
+    def on_tab_changed(self, event):
+        """第一次切换到在线音乐选项卡时创建其界面"""
+        if not self.online_ui_created and self.tab_control.select() == str(self.online_tab):
+            self.online_ui_created = True
+            self.create_online_music_ui()
+    
     def create_local_music_ui(self):
         """创建本地音乐界面"""
         # 创建文件夹选择按钮
@@ -112,17 +226,68 @@ class MusicPlayer:
         list_frame = ttk.Frame(self.local_tab)
         list_frame.pack(fill="both", expand=True, padx=5, pady=5)
         
-        # 创建滚动条
-        scrollbar = ttk.Scrollbar(list_frame)
-        scrollbar.pack(side="right", fill="y")
+        # 创建虚拟化列表视图，只绘制可见的行，双击或回车播放
+        self.track_list = VirtualTrackList(
+            list_frame,
+            row_count=lambda: len(self.playlist),
+            get_row=self.get_track_row,
+            on_activate=self.play_selected_song,
+            on_sort=self.sort_playlist,
+            # 按条目ID记录选中行，列表插入、删除或排序后选中的仍是同一首
+            row_key=lambda index: self.playlist.entry_at(index),
+            find_row=lambda entry_id: self.playlist.index_of_entry(entry_id)
+        )
+        self.track_list.pack(fill="both", expand=True)
+    
+    def get_track_info(self, path):
+        """返回歌曲的标题、艺术家和时长，标签尚未读取时从文件名推测"""
+        info = self.track_metadata.get(path)
+        if info is not None:
+            return info
+        manager = self.local_music_manager
+        return manager._extract_title(path), manager._extract_artist(path), None
+    
+    def get_track_row(self, index):
+        """返回列表中一行的显示内容"""
+        path = self.playlist[index]
+        title, artist, duration = self.get_track_info(path)
+        duration_text = self.format_time(duration) if duration else ""
+        file_format = os.path.splitext(path)[1].lstrip(".").upper()
+        return (title, artist, duration_text, file_format)
+    
+    def playlist_sort_key(self, column=None):
+        """
+        返回按列排序的键函数
         
-        # 创建列表视图
-        self.song_listbox = tk.Listbox(list_frame, yscrollcommand=scrollbar.set, width=100, height=20, font=("SimHei", 10))
-        self.song_listbox.pack(fill="both", expand=True)
-        scrollbar.config(command=self.song_listbox.yview)
+        Args:
+            column: 列名，None表示默认的按文件名排序
+        """
+        if column is None:
+            return lambda path: os.path.basename(path).lower()
+        
+        def sort_key(path):
+            title, artist, duration = self.get_track_info(path)
+            if column == 'title':
+                return title.lower()
+            if column == 'artist':
+                return artist.lower()
+            if column == 'duration':
+                return duration or 0
+            return os.path.splitext(path)[1].lower()
+        return sort_key
+    
+    def sort_playlist(self, column, descending):
+        """按列排序播放列表，只重新绘制可见的行"""
+        # 之后新增的歌曲按同样的顺序插入
+        self.playlist_sort = (column, descending)
+        self.playlist.sort(key=self.playlist_sort_key(column), reverse=descending)
         
-        # 绑定双击事件
-        self.song_listbox.bind("<Double-1>", self.play_selected_song)
+        # 排序后保持当前播放的歌曲处于选中状态
+        index = self.playlist.current_index()
+        if index is not None:
+            self.track_list.select(index)
+            self.track_list.see(index)
+        self.preload_next()
     
     def create_online_music_ui(self):
         """创建在线音乐界面"""
@@ -147,9 +312,16 @@ class MusicPlayer:
         self.online_listbox = tk.Listbox(result_frame, yscrollcommand=scrollbar.set, width=100, height=15, font=("SimHei", 10))
         self.online_listbox.pack(fill="both", expand=True, side="left")
         scrollbar.config(command=self.online_listbox.yview)
+        # 双击边下载边播放
+        self.online_listbox.bind("<Double-1>", lambda e: self.play_selected_online())
         
-        # 创建下载按钮
-        ttk.Button(self.online_tab, text="下载选中音乐", command=self.download_selected_music).pack(pady=5)
+        # 创建播放和下载按钮
+        button_frame = ttk.Frame(self.online_tab)
+        button_frame.pack(pady=5)
+        ttk.Button(button_frame, text="立即播放", command=self.play_selected_online).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="下载选中音乐", command=self.download_selected_music).pack(side="left", padx=5)
+        self.more_button = ttk.Button(button_frame, text="更多结果", command=self.load_more_results, state="disabled")
+        self.more_button.pack(side="left", padx=5)
     
     def create_control_bar(self):
         """创建底部控制栏"""
@@ -213,53 +385,351 @@ class MusicPlayer:
             self.save_config()
             self.scan_music_folder(folder_path)
     
-    def scan_music_folder(self, folder_path):
-        """扫描音乐文件夹"""
-        self.song_listbox.delete(0, tk.END)
-        try:
-            self.playlist = self.local_music_manager.scan_folder(folder_path)
-            for song in self.playlist:
-                song_name = os.path.basename(song)
-                self.song_listbox.insert(tk.END, song_name)
-        except Exception as e:
-            messagebox.showerror("错误", f"扫描文件夹失败: {str(e)}")
+    def scan_music_folder(self, folder_path, use_cache=False):
+        """
+        扫描音乐文件夹（在后台线程中进行，结果分批显示）
+        
+        use_cache为True且索引中已有该文件夹时，先一次性显示索引中的列表，
+        再做增量扫描，只把变化的部分同步到列表。
+        """
+        self.playlist.clear()
+        # 清空后条目ID重新编号，原来的选中行不再有效
+        self.track_list.select(None)
+        
+        # 新的扫描开始后，旧扫描的结果全部丢弃
+        self.scan_generation += 1
+        generation = self.scan_generation
+        manager = self.local_music_manager
+        
+        def do_scan():
+            try:
+                if use_cache and os.path.isdir(folder_path):
+                    cached = manager.library_index.get_tracks(os.path.abspath(folder_path))
+                    if cached:
+                        paths = sorted((entry[0] for entry in cached), key=lambda x: os.path.basename(x).lower())
+                        self.scan_queue.put((generation, 'cached', paths))
+                        delta = manager.refresh_folder(folder_path)
+                        self.scan_queue.put((generation, 'revalidated', delta))
+                        return
+                
+                for batch in manager.iter_scan_folder(folder_path):
+                    if generation != self.scan_generation:
+                        return
+                    self.scan_queue.put((generation, 'batch', batch))
+                self.scan_queue.put((generation, 'done', None))
+            except Exception as e:
+                self.scan_queue.put((generation, 'error', str(e)))
+        
+        scan_thread = threading.Thread(target=do_scan)
+        scan_thread.daemon = True
+        scan_thread.start()
+        
+        self.root.after(20, self.process_scan_queue, generation)
+    
+    def process_scan_queue(self, generation):
+        """在界面线程中处理扫描结果，每次最多处理一小段时间，避免界面卡顿"""
+        if generation != self.scan_generation:
+            return
+        
+        deadline = time.perf_counter() + 0.03
+        while time.perf_counter() < deadline:
+            try:
+                batch_generation, kind, payload = self.scan_queue.get_nowait()
+            except queue.Empty:
+                break
+            
+            if batch_generation != generation:
+                continue
+            
+            if kind in ('batch', 'cached'):
+                self.playlist.extend(payload)
+                if kind == 'cached' and self.playlist_sort[0] is not None:
+                    self.playlist.sort(key=self.playlist_sort_key(self.playlist_sort[0]),
+                                       reverse=self.playlist_sort[1])
+                self.track_list.refresh()
+                if "显示音乐列表" not in self.startup_marks:
+                    self.mark_startup("显示音乐列表")
+                    # 列表显示后界面第一次空闲时即可操作
+                    self.root.after_idle(self.mark_startup, "可交互")
+            elif kind == 'revalidated':
+                # 增量扫描已经更新了音乐库，只需把变化同步到列表（修改过的文件按新增处理）
+                self.sync_playlist({
+                    'added': payload['added'] + payload['changed'],
+                    'removed': payload['removed'],
+                    'renamed': [],
+                    'removed_dirs': [],
+                })
+                self.finish_library_load()
+                return
+            elif kind == 'done':
+                self.finish_scan()
+                return
+            else:
+                messagebox.showerror("错误", f"扫描文件夹失败: {payload}")
+                return
+        
+        self.root.after(50, self.process_scan_queue, generation)
+    
+    def finish_scan(self):
+        """扫描完成后按当前的排序方式排序（默认按文件名，与scan_folder的结果顺序一致）"""
+        column, descending = self.playlist_sort
+        self.playlist.sort(key=self.playlist_sort_key(column), reverse=descending)
+        self.track_list.refresh()
+        self.finish_library_load()
     
-    def play_selected_song(self, event=None):
+    def finish_library_load(self):
+        """列表与文件夹一致后读取标签并开始监视文件夹"""
+        self.mark_startup("音乐库校验完成")
+        self.report_startup()
+        
+        # 在后台读取标签和时长，未修改的文件直接使用缓存；
+        # 分批读取，不需要同时保存整个音乐库的路径和元数据字典
+        track_ids = self.playlist.track_ids()
+        store = self.local_music_manager.track_store
+        
+        def load_metadata():
+            try:
+                for start in range(0, len(track_ids), self.METADATA_BATCH_SIZE):
+                    songs = list(store.paths(track_ids[start:start + self.METADATA_BATCH_SIZE]))
+                    self.track_metadata.update(self.local_music_manager.get_metadata_batch(songs))
+                    # 由界面线程在下一次检查时刷新列表
+                    self.metadata_updated = True
+            except Exception as e:
+                print(f"读取音乐元数据失败: {str(e)}")
+        
+        metadata_thread = threading.Thread(target=load_metadata)
+        metadata_thread.daemon = True
+        metadata_thread.start()
+        
+        self.start_folder_watcher()
+    
+    def start_folder_watcher(self):
+        """监视音乐文件夹和下载文件夹，新增或删除的文件直接同步到播放列表"""
+        if self.folder_watcher is not None:
+            self.folder_watcher.stop()
+        
+        manager = self.local_music_manager
+        self.folder_watcher = FolderWatcher(
+            manager._is_audio_file, self.watch_queue.put, manager.refresh_folder
+        )
+        watcher = self.folder_watcher
+        roots = [self.config['default_music_folder'], self.config['download_folder']]
+        
+        def do_start():
+            # 下载文件夹也需要建立索引，监视器才能直接使用索引中的子目录列表
+            directories = []
+            for root in roots:
+                if not os.path.isdir(root):
+                    continue
+                root = os.path.abspath(root)
+                if not manager.library_index.get_directories(root):
+                    try:
+                        manager.refresh_folder(root)
+                    except Exception as e:
+                        print(f"扫描 {root} 失败: {str(e)}")
+                directories.extend(manager.library_index.get_directories(root))
+            if watcher is self.folder_watcher:
+                watcher.start(roots, directories)
+        
+        start_thread = threading.Thread(target=do_start)
+        start_thread.daemon = True
+        start_thread.start()
+        
+        self.root.after(1000, self.process_watch_queue, watcher)
+    
+    def process_watch_queue(self, watcher):
+        """在界面线程中应用文件监视器发现的变化"""
+        if watcher is not self.folder_watcher:
+            return
+        
+        while True:
+            try:
+                delta = self.watch_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.apply_library_changes(delta)
+        
+        if self.metadata_updated:
+            self.metadata_updated = False
+            self.track_list.refresh()
+        
+        self.root.after(1000, self.process_watch_queue, watcher)
+    
+    def apply_library_changes(self, delta):
+        """把新增、删除和重命名的文件增量同步到播放列表、列表框和音乐库"""
+        added, removed_songs, changed = self.sync_playlist(delta)
+        self.local_music_manager.apply_file_changes(
+            added + [new for old, new in delta['renamed']],
+            removed_songs + [old for old, new in delta['renamed']],
+            changed
+        )
+    
+    def sync_playlist(self, delta):
+        """
+        把新增、删除和重命名的文件增量同步到播放列表和列表框
+        
+        Returns:
+            tuple: (新增的路径, 删除的路径, 内容变化的路径)
+        """
+        removed = set(delta['removed'])
+        dir_prefixes = tuple(d.rstrip(os.sep) + os.sep for d in delta['removed_dirs'])
+        renamed = dict(delta['renamed'])
+        
+        removed_songs = list(removed)
+        
+        # 删除和重命名不会打乱随机播放顺序和播放历史
+        for song in self.playlist.remove_where(
+                lambda song: song in removed or bool(dir_prefixes and song.startswith(dir_prefixes))):
+            if song not in removed:
+                removed_songs.append(song)
+        if renamed:
+            self.playlist.rename(renamed)
+            if self.current_song in renamed:
+                self.current_song = renamed[self.current_song]
+        
+        # 新文件按当前的排序方式插入到对应的位置
+        added = [path for path in delta['added'] if path not in self.playlist]
+        # 已在列表中的文件再次写入，说明内容发生了变化
+        changed = [path for path in delta['added'] if path in self.playlist]
+        if added:
+            column, descending = self.playlist_sort
+            self.playlist.insert_sorted(added, self.playlist_sort_key(column), descending)
+        
+        self.track_list.refresh()
+        # 列表变化可能改变下一首
+        self.preload_next()
+        return added, removed_songs, changed
+    
+    def play_selected_song(self, index=None):
         """播放选中的歌曲"""
-        selection = self.song_listbox.curselection()
-        if selection:
-            index = selection[0]
-            self.current_song = self.playlist[index]
+        if index is None:
+            index = self.track_list.selected_index()
+        if index is not None:
+            # 还在缓冲的在线歌曲不再播放
+            if self.pending_stream is not None:
+                self.pending_stream[0].close()
+                self.pending_stream = None
+            self.current_song = self.playlist.jump(index)
             self.play_music(self.current_song)
     
     def play_music(self, music_file):
         """播放音乐"""
         try:
+            self.ensure_mixer()
+            # 加载新歌曲会清空pygame的播放队列
+            self.queued_song = None
             pygame.mixer.music.load(music_file)
+            self.close_seek_stream()
             pygame.mixer.music.play()
-            self.is_playing = True
-            self.is_paused = False
-            self.play_button.config(text="暂停")
-            self.current_song_label.config(text=os.path.basename(music_file))
-            
-            # 启动进度更新线程
-            self.stop_thread = True
-            if self.update_thread and self.update_thread.is_alive():
-                self.update_thread.join()
-            self.stop_thread = False
-            self.update_thread = threading.Thread(target=self.update_progress)
-            self.update_thread.daemon = True
-            self.update_thread.start()
+            # 切换歌曲时停止上一首也会发出结束事件，丢弃它以免连跳两首
+            self.discard_end_events()
+            self.on_track_started(music_file, time.perf_counter())
         except Exception as e:
+            self.track_ended_at = None
             messagebox.showerror("错误", f"播放失败: {str(e)}")
     
+    def on_track_started(self, music_file, started_at):
+        """歌曲开始播放后更新界面状态，并预加载下一首"""
+        if self.track_ended_at is not None:
+            if self.config.get('measure_transition_gap'):
+                gap = (started_at - self.track_ended_at) * 1000
+                print(f"歌曲切换间隙: {gap:.0f} ms ({os.path.basename(music_file)})")
+            self.track_ended_at = None
+        
+        self.position_offset = 0
+        self.last_tick = None
+        self.is_playing = True
+        self.is_paused = False
+        self.stream_playback = None
+        self.stream_stalled = False
+        self.play_button.config(text="暂停")
+        self.current_song_label.config(text=os.path.basename(music_file))
+        
+        # 获取歌曲的真实时长，用于进度条，跳转索引建立后改用索引中的精确时长
+        info = self.track_metadata.get(music_file)
+        if info is not None:
+            duration = info[2]
+        else:
+            # 队列中的歌曲已经由pygame开始播放，文件在此之后被移走或标签损坏时按时长未知处理
+            try:
+                duration = self.local_music_manager.get_file_info(music_file)['duration']
+            except Exception as e:
+                print(f"读取歌曲信息失败: {str(e)}")
+                duration = None
+        self.current_duration = duration or 0
+        self.progress_scale.set(0)
+        self.load_seek_index(music_file)
+        
+        self.schedule_playback_tick()
+        self.preload_next()
+    
+    def load_seek_index(self, music_file):
+        """在后台读取或建立歌曲的跳转索引"""
+        self.seek_index = None
+        
+        def do_load():
+            index = self.seek_index_cache.get(music_file)
+            if index is not None:
+                self.seek_index = (music_file, index)
+        
+        index_thread = threading.Thread(target=do_load)
+        index_thread.daemon = True
+        index_thread.start()
+    
+    def current_seek_index(self):
+        """返回当前歌曲已建立的跳转索引，尚未建立时返回None"""
+        seek_index = self.seek_index
+        if seek_index is None or seek_index[0] != self.current_song:
+            return None
+        return seek_index[1]
+    
+    def close_seek_stream(self):
+        """关闭pygame已不再使用的文件对象"""
+        if self.seek_stream is not None:
+            self.seek_stream.close()
+            self.seek_stream = None
+    
+    def preload_next(self):
+        """
+        根据播放列表、重复和随机播放状态预测下一首，提前放入pygame的播放队列，
+        当前歌曲结束时由pygame直接开始播放，不需要等待检查和加载
+        """
+        # 没有结束事件时无法得知队列中的歌曲何时开始播放
+        if self.end_event is None or not self.is_playing or not self.current_song:
+            return
+        
+        if self.is_repeat:
+            next_song = self.current_song
+        else:
+            index = self.playlist.peek_next()
+            next_song = self.playlist[index] if index is not None else None
+        if next_song is None or next_song == self.queued_song:
+            return
+        
+        try:
+            # 再次调用会替换队列中原来的歌曲
+            pygame.mixer.music.queue(next_song)
+        except pygame.error as e:
+            print(f"预加载 {next_song} 失败: {str(e)}")
+            return
+        self.queued_song = next_song
+        
+        # 把文件读入系统缓存，切换时不需要等待磁盘
+        read_thread = threading.Thread(target=self.local_music_manager.read_ahead, args=(next_song,))
+        read_thread.daemon = True
+        read_thread.start()
+    
     def toggle_play_pause(self):
         """切换播放/暂停状态"""
         if self.is_playing:
             if self.is_paused:
-                pygame.mixer.music.unpause()
+                # 缓冲不足暂停时由播放状态检查在缓冲足够后继续
+                if not self.stream_stalled:
+                    pygame.mixer.music.unpause()
                 self.is_paused = False
                 self.play_button.config(text="暂停")
+                # 暂停期间不检查播放状态，继续播放时重新开始
+                self.schedule_playback_tick()
             else:
                 pygame.mixer.music.pause()
                 self.is_paused = True
@@ -272,80 +742,143 @@ class MusicPlayer:
         if not self.playlist or not self.current_song:
             return
         
-        current_index = self.playlist.index(self.current_song)
-        if self.is_shuffle:
-            import random
-            next_index = random.randint(0, len(self.playlist) - 1)
-        else:
-            next_index = (current_index + 1) % len(self.playlist)
-        
+        next_index = self.playlist.next()
         self.current_song = self.playlist[next_index]
         self.play_music(self.current_song)
-        self.song_listbox.selection_clear(0, tk.END)
-        self.song_listbox.selection_set(next_index)
-        self.song_listbox.see(next_index)
+        self.track_list.select(next_index)
+        self.track_list.see(next_index)
     
     def play_previous(self):
         """播放上一曲"""
         if not self.playlist or not self.current_song:
             return
         
-        current_index = self.playlist.index(self.current_song)
-        if self.is_shuffle:
-            import random
-            prev_index = random.randint(0, len(self.playlist) - 1)
-        else:
-            prev_index = (current_index - 1) % len(self.playlist)
-        
+        prev_index = self.playlist.previous()
         self.current_song = self.playlist[prev_index]
         self.play_music(self.current_song)
-        self.song_listbox.selection_clear(0, tk.END)
-        self.song_listbox.selection_set(prev_index)
-        self.song_listbox.see(prev_index)
+        self.track_list.select(prev_index)
+        self.track_list.see(prev_index)
     
     def set_volume(self, volume):
         """设置音量"""
         volume_value = float(volume)
-        pygame.mixer.music.set_volume(volume_value)
-        self.config['volume'] = volume_value
-        self.save_config()
-    
-    def update_progress(self):
-        """更新播放进度"""
-        while not self.stop_thread:
-            if self.is_playing and not self.is_paused:
-                # 获取当前播放位置
-                current_pos = pygame.mixer.music.get_pos() / 1000.0
-                # 获取音乐总时长
-                try:
-                    # 尝试使用pygame获取时长
-                    pygame.mixer.music.set_pos(0)
-                    pygame.mixer.music.set_pos(current_pos)
-                    # 由于pygame限制，我们使用一种估算方法
-                    # 实际项目中可能需要使用其他库来获取准确时长
-                    duration = 300  # 假设默认5分钟
-                    
-                    # 更新进度条
-                    self.root.after(0, lambda: self.update_progress_ui(current_pos, duration))
-                    
-                    # 检查是否播放结束
-                    if current_pos > 0 and pygame.mixer.music.get_busy() == False:
-                        if self.is_repeat:
-                            self.root.after(0, lambda: self.play_music(self.current_song))
-                        else:
-                            self.root.after(0, self.play_next)
-                except:
-                    pass
-            time.sleep(0.5)
+        if self.mixer_ready:
+            pygame.mixer.music.set_volume(volume_value)
+        # 创建音量条时也会调用这里，值没有变化时不需要保存
+        if volume_value != self.config['volume']:
+            self.config['volume'] = volume_value
+            self.save_config()
+    
+    def schedule_playback_tick(self, delay=0):
+        """安排下一次播放状态检查，同一时间只保留一个待执行的检查"""
+        if self.playback_job is not None:
+            self.root.after_cancel(self.playback_job)
+        self.playback_job = self.root.after(delay, self.playback_tick)
+    
+    def playback_tick(self):
+        """在界面线程中处理播放结束事件并更新进度，暂停或停止播放后不再继续"""
+        self.playback_job = None
+        
+        if self.check_track_end():
+            self.on_track_end()
+            return
+        if not self.is_playing or self.is_paused:
+            return
+        
+        index = self.current_seek_index()
+        if index is not None and index.duration > 0:
+            self.current_duration = index.duration
+        if self.stream_playback is not None:
+            self.check_stream_buffer()
+        
+        current_pos = self.get_play_position()
+        self.last_tick = (time.perf_counter(), current_pos)
+        self.update_progress_ui(current_pos, self.current_duration)
+        self.schedule_playback_tick(self.next_tick_delay(current_pos))
+    
+    def next_tick_delay(self, current_pos):
+        """窗口最小化时降低更新频率，但在歌曲快结束时及时醒来切换下一首"""
+        delay = 2000 if self.root.state() == "iconic" else 500
+        if self.stream_playback is not None and not self.stream_playback.complete:
+            # 边下载边播放时及时发现缓冲不足
+            delay = 100
+        if self.current_duration > 0:
+            remaining = int((self.current_duration - current_pos) * 1000) + 50
+            delay = max(50, min(delay, remaining))
+        return delay
+    
+    def check_track_end(self):
+        """检查当前歌曲是否已播放结束"""
+        if not self.is_playing:
+            return False
+        if self.end_event is None:
+            return not self.is_paused and not self.stream_stalled and not pygame.mixer.music.get_busy()
+        return any(event.type == self.end_event for event in pygame.event.get())
+    
+    def discard_end_events(self):
+        """丢弃尚未处理的播放结束事件"""
+        if self.end_event is not None:
+            pygame.event.clear(self.end_event)
+    
+    def on_track_end(self):
+        """歌曲播放结束：重复播放当前歌曲或播放下一曲"""
+        self.track_ended_at = self.estimate_track_end()
+        
+        if self.queued_song is not None:
+            self.advance_to_queued()
+        elif self.is_repeat and self.current_song:
+            self.play_music(self.current_song)
+        elif self.playlist and self.current_song:
+            self.play_next()
+        else:
+            self.is_playing = False
+            self.play_button.config(text="播放")
+    
+    def estimate_track_end(self):
+        """根据最近一次检查的播放位置和歌曲时长估计当前歌曲结束的时刻"""
+        if self.last_tick is None or self.current_duration <= 0:
+            return time.perf_counter()
+        tick_time, position = self.last_tick
+        return tick_time + max(0, self.current_duration - position)
+    
+    def advance_to_queued(self):
+        """队列中的下一首已经由pygame开始播放，只需要同步播放列表和界面"""
+        song = self.queued_song
+        self.queued_song = None
+        # pygame切换到队列中的歌曲时已经释放了上一首
+        self.close_seek_stream()
+        # get_pos已从新歌曲开始重新计时
+        started_at = time.perf_counter() - max(0, pygame.mixer.music.get_pos()) / 1000.0
+        
+        if not self.is_repeat:
+            index = self.playlist.next()
+            if index is not None:
+                if self.playlist[index] != song:
+                    # 预测已过期（例如列表在无法替换队列时被修改），按正常方式切换
+                    self.current_song = self.playlist[index]
+                    self.play_music(self.current_song)
+                    self.track_list.select(index)
+                    self.track_list.see(index)
+                    return
+                self.track_list.select(index)
+                self.track_list.see(index)
+        
+        self.current_song = song
+        self.on_track_started(song, started_at)
+    
+    def get_play_position(self):
+        """返回当前播放位置（秒）"""
+        return max(0, pygame.mixer.music.get_pos() / 1000.0 + self.position_offset)
     
     def update_progress_ui(self, current_pos, duration):
         """更新进度条UI"""
+        # 更新时间标签
+        self.time_label.config(text=self.format_time(current_pos))
+        
+        # 时长未知（例如MIDI文件）时只显示已播放时间
         if duration > 0:
             self.progress_scale.config(to=duration)
             self.progress_scale.set(current_pos)
-            
-            # 更新时间标签
-            self.time_label.config(text=self.format_time(current_pos))
             self.duration_label.config(text=self.format_time(duration))
     
     def format_time(self, seconds):
@@ -355,9 +888,41 @@ class MusicPlayer:
     
     def seek_position(self, event):
         """拖动进度条跳转播放位置"""
-        if self.is_playing:
-            position = self.progress_scale.get()
+        if not self.is_playing:
+            return
+        if self.stream_playback is not None and not self.stream_playback.complete:
+            # 跳转到尚未下载的位置会使解码器等待数据，下载完成前不能跳转
+            self.update_progress_ui(self.get_play_position(), self.current_duration)
+            return
+        position = self.progress_scale.get()
+        
+        index = self.current_seek_index()
+        if index is not None and index.format == 'mp3':
+            # MP3的set_pos对VBR文件不准确，直接从索引中对应的帧开始解码
+            offset, exact_position = index.lookup(position)
+            stream = OffsetStream(self.current_song, offset)
+            try:
+                pygame.mixer.music.load(stream, 'mp3')
+            except pygame.error as e:
+                stream.close()
+                print(f"跳转失败: {str(e)}")
+                return
+            self.close_seek_stream()
+            self.seek_stream = stream
+            self.queued_song = None
+            pygame.mixer.music.play()
+            self.discard_end_events()
+            if self.is_paused:
+                pygame.mixer.music.pause()
+            self.position_offset = exact_position
+            self.preload_next()
+        else:
+            # FLAC和Ogg由解码器使用文件中的seek表或粒度位置精确跳转
             pygame.mixer.music.set_pos(position)
+            self.position_offset = position - pygame.mixer.music.get_pos() / 1000.0
+        
+        self.last_tick = None
+        self.update_progress_ui(self.get_play_position(), self.current_duration)
     
     def set_position(self, position):
         """设置播放位置"""
@@ -367,10 +932,13 @@ class MusicPlayer:
     def toggle_repeat(self):
         """切换重复播放"""
         self.is_repeat = self.repeat_var.get()
+        self.preload_next()
     
     def toggle_shuffle(self):
         """切换随机播放"""
         self.is_shuffle = self.shuffle_var.get()
+        self.playlist.set_shuffle(self.is_shuffle)
+        self.preload_next()
     
     def search_online_music(self):
         """搜索在线音乐"""
@@ -379,41 +947,114 @@ class MusicPlayer:
             messagebox.showwarning("提示", "请输入搜索关键词")
             return
         
+        self.search_generation += 1
+        generation = self.search_generation
+        
         # 清空列表
+        self.search_results = []
+        self.search_pager = None
+        self.more_button.config(state="disabled")
         self.online_listbox.delete(0, tk.END)
         
         # 显示搜索中
         self.online_listbox.insert(tk.END, "正在搜索中...")
         
-        # 在新线程中执行搜索
+        # 每个搜索来源返回后先显示已有的结果
+        def on_results(results):
+            self.root.after(0, lambda: self.show_search_results(results, False, generation))
+        
+        # 在新线程中执行搜索，显示第一页时后台已开始获取第二页
         def do_search():
             try:
-                results = self.online_music_manager.search_music(keyword)
-                self.root.after(0, lambda: self.show_search_results(results))
+                pager = self.online_music_manager.search_pages(keyword)
+                results = pager.next_page(on_results)
+                self.root.after(0, lambda: self.show_search_page(pager, results, generation))
             except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("搜索失败", str(e)))
+                self.root.after(0, lambda error=str(e): messagebox.showerror("搜索失败", error))
         
         search_thread = threading.Thread(target=do_search)
         search_thread.daemon = True
         search_thread.start()
     
-    def show_search_results(self, results):
-        """显示搜索结果"""
-        self.online_listbox.delete(0, tk.END)
+    def load_more_results(self):
+        """在已显示的搜索结果后面追加下一页"""
+        pager = self.search_pager
+        if pager is None:
+            return
         
-        if not results:
-            self.online_listbox.insert(tk.END, "未找到相关音乐")
+        self.more_button.config(state="disabled")
+        generation = self.search_generation
+        shown = list(self.search_results)
+        self.online_listbox.insert(tk.END, "正在加载更多结果...")
+        
+        # 下一页通常已在后台取得，没有取得时在新线程中等待
+        def do_load():
+            try:
+                page = pager.next_page()
+                self.root.after(0, lambda: self.show_search_page(pager, shown + page, generation))
+            except Exception as e:
+                # except块结束后e会被删除，回调中只能使用事先取出的错误信息
+                error = str(e)
+                
+                def on_error():
+                    self.show_search_page(pager, shown, generation)
+                    messagebox.showerror("搜索失败", error)
+                self.root.after(0, on_error)
+        
+        load_thread = threading.Thread(target=do_load)
+        load_thread.daemon = True
+        load_thread.start()
+    
+    def show_search_page(self, pager, results, generation):
+        """
+        显示一页搜索完成后的结果
+        
+        Args:
+            pager: 搜索结果所在的SearchPages
+            results: 到这一页为止的全部结果
+            generation: 搜索的序号，不是最近一次搜索时忽略
+        """
+        if generation != self.search_generation:
+            return
+        self.show_search_results(results, True, generation)
+        self.search_pager = pager
+        self.more_button.config(state="disabled" if pager.exhausted else "normal")
+    
+    def show_search_results(self, results, finished=True, generation=None):
+        """
+        显示搜索结果
+        
+        Args:
+            results: 搜索结果列表
+            finished: 为False时还有搜索来源没有返回，在列表末尾显示搜索中
+            generation: 搜索的序号，不是最近一次搜索时忽略
+        """
+        if generation is not None and generation != self.search_generation:
             return
         
+        # 新的结果总是追加在已显示的结果之后，已显示的行（包括下载状态）保持不变；
+        # 所有来源都失败时返回的模拟结果与之前的结果无关，全部重新显示
+        shown = len(self.search_results)
+        if results[:shown] != self.search_results:
+            shown = 0
+        # 删除末尾的提示行
+        self.online_listbox.delete(shown, tk.END)
+        
         # 保存搜索结果
         self.search_results = results
         
         # 显示结果
-        for i, result in enumerate(results):
+        for i in range(shown, len(results)):
+            result = results[i]
             title = result.get('title', '未知标题')
             artist = result.get('artist', '未知艺术家')
             duration = result.get('duration', '未知时长')
             self.online_listbox.insert(tk.END, f"{i+1}. {title} - {artist} ({duration})")
+        
+        if not finished:
+            self.online_listbox.insert(tk.END, "正在搜索中...")
+        elif not results:
+            self.online_listbox.insert(tk.END, "未找到相关音乐")
     
     def download_selected_music(self):
         """下载选中的音乐"""
@@ -432,39 +1073,187 @@ class MusicPlayer:
                 return
             
             # 更新默认下载目录
-            self.config['download_folder'] = download_folder
-            self.save_config()
+            if download_folder != self.config['download_folder']:
+                self.config['download_folder'] = download_folder
+                self.save_config()
+                self.start_folder_watcher()
             
             # 显示下载中
-            self.online_listbox.itemconfig(index, fg="blue")
             original_text = self.online_listbox.get(index)
-            self.online_listbox.delete(index)
-            self.online_listbox.insert(index, f"{original_text} [下载中...]")
+            job = self.online_music_manager.submit_download(music_info, download_folder)
+            self.download_rows[job.id] = (index, original_text, self.search_generation, True)
+            self.update_download_row(job.id, "[下载中...]", "blue")
             
-            # 在新线程中执行下载
-            def do_download():
-                try:
-                    file_path = self.online_music_manager.download_music(music_info, download_folder)
-                    self.root.after(0, lambda: self.online_listbox.itemconfig(index, fg="green"))
-                    self.root.after(0, lambda idx=index: self.online_listbox.delete(idx))
-                    self.root.after(0, lambda idx=index, text=original_text: self.online_listbox.insert(idx, f"{text} [下载完成]"))
-                    self.root.after(0, lambda path=file_path: messagebox.showinfo("下载成功", f"音乐已下载到:\n{path}"))
-                except Exception as e:
-                    self.root.after(0, lambda: self.online_listbox.itemconfig(index, fg="red"))
-                    self.root.after(0, lambda idx=index: self.online_listbox.delete(idx))
-                    self.root.after(0, lambda idx=index, text=original_text: self.online_listbox.insert(idx, f"{text} [下载失败]"))
-                    self.root.after(0, lambda error=str(e): messagebox.showerror("下载失败", error))
-            
-            download_thread = threading.Thread(target=do_download)
-            download_thread.daemon = True
-            download_thread.start()
+            # 下载在调度器中排队执行，进度由界面线程定期取回
+            if self.download_poll_job is None:
+                self.download_poll_job = self.root.after(200, self.process_download_events)
+    
+    def play_selected_online(self):
+        """边下载边播放选中的在线音乐，下载完成的文件保存在默认下载目录中"""
+        selection = self.online_listbox.curselection()
+        if not selection or selection[0] >= len(self.search_results):
+            messagebox.showwarning("提示", "请先选择要播放的音乐")
+            return
+        
+        index = selection[0]
+        music_info = self.search_results[index]
+        original_text = self.online_listbox.get(index)
+        job, stream = self.online_music_manager.stream_music(music_info, self.config['download_folder'])
+        self.download_rows[job.id] = (index, original_text, self.search_generation, False)
+        self.update_download_row(job.id, "[缓冲中...]", "blue")
+        if self.download_poll_job is None:
+            self.download_poll_job = self.root.after(200, self.process_download_events)
+        
+        # 上一个还在缓冲的歌曲不再播放，它的下载继续进行
+        if self.pending_stream is not None:
+            self.pending_stream[0].close()
+        self.pending_stream = (stream, music_info)
+        self.current_song_label.config(text=f"正在缓冲: {music_info.get('title', '未知歌曲')}")
+        self.check_stream_ready()
+    
+    def check_stream_ready(self):
+        """等待缓冲足够后开始播放"""
+        if self.pending_stream is None:
+            return
+        stream, music_info = self.pending_stream
+        if stream.error is not None:
+            self.pending_stream = None
+            self.current_song_label.config(text="未播放")
+            messagebox.showerror("错误", f"播放失败: {str(stream.error)}")
+        elif stream.ready:
+            self.pending_stream = None
+            self.play_stream(stream, music_info)
+        else:
+            self.root.after(50, self.check_stream_ready)
+    
+    def play_stream(self, stream, music_info):
+        """从边下载边播放的缓冲开始播放"""
+        reader = stream.open()
+        try:
+            self.ensure_mixer()
+            self.queued_song = None
+            # 不指定格式，由pygame根据文件内容识别
+            pygame.mixer.music.load(reader)
+            self.close_seek_stream()
+            self.seek_stream = reader
+            pygame.mixer.music.play()
+            self.discard_end_events()
+        except Exception as e:
+            reader.close()
+            self.track_ended_at = None
+            messagebox.showerror("错误", f"播放失败: {str(e)}")
+            return
+        
+        # 这首歌不在播放列表中，播放结束后停止
+        self.current_song = None
+        self.track_ended_at = None
+        self.position_offset = 0
+        self.last_tick = None
+        self.is_playing = True
+        self.is_paused = False
+        self.stream_playback = stream
+        self.stream_stalled = False
+        self.stream_started_reported = False
+        self.play_button.config(text="暂停")
+        self.stream_title = f"{music_info.get('artist', '未知艺术家')} - {music_info.get('title', '未知歌曲')}"
+        self.current_song_label.config(text=self.stream_title)
+        self.current_duration = self.parse_duration(music_info.get('duration'))
+        self.progress_scale.set(0)
+        self.schedule_playback_tick()
+    
+    def check_stream_buffer(self):
+        """边下载边播放时按缓冲水位暂停和继续，并报告开始出声的耗时"""
+        stream = self.stream_playback
+        position = self.seek_stream.tell()
+        if self.stream_stalled:
+            if stream.can_resume(position):
+                pygame.mixer.music.unpause()
+                self.stream_stalled = False
+                self.current_song_label.config(text=self.stream_title)
+        elif stream.should_pause(position):
+            pygame.mixer.music.pause()
+            self.stream_stalled = True
+            self.current_song_label.config(text=f"{self.stream_title} [缓冲中...]")
+        
+        if not self.stream_started_reported and pygame.mixer.music.get_pos() > 0:
+            self.stream_started_reported = True
+            if self.config.get('measure_time_to_first_sound'):
+                # get_pos从开始出声时计时
+                first_sound = time.perf_counter() - pygame.mixer.music.get_pos() / 1000.0
+                print(f"立即播放: {(first_sound - stream.requested_at) * 1000:.0f} ms 后开始出声 "
+                      f"(缓冲 {(stream.ready_at - stream.requested_at) * 1000:.0f} ms)")
+    
+    def parse_duration(self, duration):
+        """把搜索结果中的时长（秒数或"分:秒"）转换为秒，无法解析时返回0"""
+        if isinstance(duration, (int, float)):
+            return max(0, duration)
+        try:
+            seconds = 0
+            for part in str(duration).split(':'):
+                seconds = seconds * 60 + int(part)
+            return seconds
+        except ValueError:
+            return 0
+    
+    def update_download_row(self, job_id, status, color):
+        """在搜索结果列表中显示下载状态，列表已被新的搜索替换时忽略"""
+        index, original_text, generation, notify = self.download_rows[job_id]
+        if generation != self.search_generation:
+            return
+        self.online_listbox.delete(index)
+        self.online_listbox.insert(index, f"{original_text} {status}")
+        self.online_listbox.itemconfig(index, fg=color)
+    
+    def process_download_events(self):
+        """取回下载进度和完成的任务并更新界面，还有下载时继续检查"""
+        self.download_poll_job = None
+        progress, finished = self.online_music_manager.poll_download_events()
+        
+        for job_id, (received, total) in progress.items():
+            if job_id in self.download_rows:
+                if total:
+                    status = f"[下载中 {received * 100 // total}%]"
+                else:
+                    status = f"[下载中 {received / 1024 / 1024:.1f} MB]"
+                self.update_download_row(job_id, status, "blue")
+        
+        for job in finished:
+            if job.id not in self.download_rows:
+                continue
+            notify = self.download_rows[job.id][3]
+            try:
+                file_path = job.future.result()
+            except Exception as e:
+                self.update_download_row(job.id, "[下载失败]", "red")
+                if notify:
+                    messagebox.showerror("下载失败", str(e))
+            else:
+                self.update_download_row(job.id, "[下载完成]", "green")
+                if notify:
+                    messagebox.showinfo("下载成功", f"音乐已下载到:\n{file_path}")
+            del self.download_rows[job.id]
+        
+        if self.download_rows:
+            self.download_poll_job = self.root.after(200, self.process_download_events)
     
     def on_closing(self):
         """关闭窗口时的清理工作"""
-        self.stop_thread = True
-        if self.update_thread and self.update_thread.is_alive():
-            self.update_thread.join(1.0)
-        pygame.mixer.quit()
+        if self.playback_job is not None:
+            self.root.after_cancel(self.playback_job)
+            self.playback_job = None
+        if self.download_poll_job is not None:
+            self.root.after_cancel(self.download_poll_job)
+            self.download_poll_job = None
+        if self.folder_watcher is not None:
+            self.folder_watcher.stop()
+        self.local_music_manager.metadata_reader.close()
+        if self._online_music_manager is not None:
+            self._online_music_manager.close()
+        if self.mixer_ready:
+            pygame.mixer.quit()
+        self.close_seek_stream()
+        # 写入尚未保存的配置修改
+        self.config.close()
         self.root.destroy()
 
 if __name__ == "__main__":
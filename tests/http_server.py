@@ -0,0 +1,108 @@
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class FileServer:
+    """
+    测试用的本机HTTP服务器，提供一个文件
+
+    支持Range、后缀范围和If-Range。可以让接下来的请求返回指定的状态码，
+    或在发送一定字节数后断开连接，模拟服务器错误和传输中断。
+    """
+
+    def __init__(self, data, etag='"v1"', ranges=True, block_size=64 * 1024, block_delay=0):
+        self.data = data
+        self.etag = etag
+        self.ranges = ranges
+        self.block_size = block_size
+        self.block_delay = block_delay
+        self.requests = []          # 每个请求的请求头（dict）
+        self.fail_statuses = []     # 接下来的请求依次返回的状态码
+        self.cut_after = []         # 接下来的响应依次在发送这么多字节后断开
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}/song.mp3'
+
+    def range_requests(self):
+        return [headers.get('Range') for headers in self.requests]
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _next(self, items):
+        with self._lock:
+            return items.pop(0) if items else None
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests.append(dict(self.headers))
+                status = server._next(server.fail_statuses)
+                if status is not None:
+                    self.send_response(status)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                data = server.data
+                size = len(data)
+                start, end = 0, size - 1
+                status = 200
+                range_header = self.headers.get('Range')
+                if_range = self.headers.get('If-Range')
+                if server.ranges and range_header and (if_range is None or if_range == server.etag):
+                    first, _, last = range_header[len('bytes='):].partition('-')
+                    if first:
+                        start = int(first)
+                        end = int(last) if last else size - 1
+                    else:
+                        start = max(0, size - int(last))
+                    if start >= size:
+                        self.send_response(416)
+                        self.send_header('Content-Range', f'bytes */{size}')
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    end = min(end, size - 1)
+                    status = 206
+
+                self.send_response(status)
+                self.send_header('Content-Length', str(end - start + 1))
+                if server.ranges:
+                    self.send_header('Accept-Ranges', 'bytes')
+                if server.etag:
+                    self.send_header('ETag', server.etag)
+                if status == 206:
+                    self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+                self.end_headers()
+
+                body = data[start:end + 1]
+                cut = server._next(server.cut_after)
+                if cut is not None:
+                    body = body[:cut]
+                try:
+                    for i in range(0, len(body), server.block_size):
+                        self.wfile.write(body[i:i + server.block_size])
+                        if server.block_delay:
+                            self.wfile.flush()
+                            threading.Event().wait(server.block_delay)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                if cut is not None:
+                    self.close_connection = True
+
+        return Handler
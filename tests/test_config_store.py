@@ -0,0 +1,57 @@
+import json
+import os
+import stat
+import tempfile
+import unittest
+
+from modules.config_store import ConfigStore
+
+
+class ConfigStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'config.json')
+
+    def tearDown(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def mode(self):
+        return stat.S_IMODE(os.stat(self.path).st_mode)
+
+    def test_flush_writes_config(self):
+        config = ConfigStore(self.path, {'volume': 0.5})
+        config['volume'] = 0.8
+        config.save()
+        config.close()
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f), {'volume': 0.8})
+        self.assertEqual(os.listdir(self.directory), ['config.json'])
+
+    @unittest.skipIf(os.name == 'nt', 'Windows没有完整的权限位')
+    def test_keeps_existing_file_mode(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{}')
+        os.chmod(self.path, 0o644)
+        config = ConfigStore(self.path)
+        config['volume'] = 0.8
+        config.save()
+        config.close()
+        self.assertEqual(self.mode(), 0o644)
+
+    @unittest.skipIf(os.name == 'nt', 'Windows没有完整的权限位')
+    def test_new_file_uses_umask(self):
+        umask = os.umask(0o022)
+        try:
+            config = ConfigStore(self.path)
+            config['volume'] = 0.8
+            config.save()
+            config.close()
+        finally:
+            os.umask(umask)
+        self.assertEqual(self.mode(), 0o644)
+
+
+if __name__ == '__main__':
+    unittest.main()
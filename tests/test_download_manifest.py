@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from modules.download_manifest import DownloadManifest
+from tests.http_server import FileServer
+
+
+class DownloadManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='manifest-test-')
+        self.manifest = DownloadManifest(':memory:')
+        self.addCleanup(self.manifest.close)
+        self.addCleanup(shutil.rmtree, self.workdir, True)
+
+    def write(self, name, data=b'data'):
+        path = os.path.join(self.workdir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_reserve_path_skips_existing_files_and_reservations(self):
+        self.write('a - t.mp3')
+        first = self.manifest.reserve_path(self.workdir, 'a - t.mp3')
+        second = self.manifest.reserve_path(self.workdir, 'a - t.mp3')
+        self.assertEqual(first, os.path.join(self.workdir, 'a - t(1).mp3'))
+        self.assertEqual(second, os.path.join(self.workdir, 'a - t(2).mp3'))
+        self.assertTrue(os.path.exists(first + '.part'))
+        self.assertTrue(os.path.exists(second + '.part'))
+
+    def test_concurrent_reservations_are_unique(self):
+        paths = []
+        lock = threading.Lock()
+
+        def reserve():
+            path = self.manifest.reserve_path(self.workdir, 'song.mp3')
+            with lock:
+                paths.append(path)
+
+        threads = [threading.Thread(target=reserve) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(paths)), 16)
+
+    def test_complete_and_partial(self):
+        path = self.write('song.mp3', b'12345')
+        self.manifest.begin('api:1', path)
+        self.assertIsNone(self.manifest.find_complete('api:1'))
+        self.assertIsNone(self.manifest.find_partial('api:1'))
+        self.write('song.mp3.part')
+        self.assertEqual(self.manifest.find_partial('api:1'), path)
+
+        self.manifest.complete('api:1', path, 5, 'abc')
+        self.assertEqual(self.manifest.find_complete('api:1'), path)
+        self.assertEqual(self.manifest.find_by_hash('abc', 5), path)
+        self.assertIsNone(self.manifest.find_by_hash('abc', 6))
+
+    def test_changed_or_missing_file_is_not_complete(self):
+        path = self.write('song.mp3', b'12345')
+        self.manifest.complete('api:1', path, 5, 'abc')
+        self.write('song.mp3', b'123')
+        self.assertIsNone(self.manifest.find_complete('api:1'))
+        os.remove(path)
+        self.assertIsNone(self.manifest.find_complete('api:1'))
+        self.assertIsNone(self.manifest.find_by_hash('abc', 5))
+
+
+class FailedDownloadTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='manager-test-')
+        self.addCleanup(shutil.rmtree, self.workdir, True)
+        # 下载记录写到临时目录，不使用用户目录
+        with mock.patch('modules.download_manifest.DEFAULT_CACHE_DIR', self.workdir):
+            from modules.online_music_manager import OnlineMusicManager
+            self.manager = OnlineMusicManager()
+        self.addCleanup(self.manager.close)
+        self.manager.host_policy.base_delay = 0.01
+        self.folder = os.path.join(self.workdir, 'downloads')
+        self.server = FileServer(b'x' * 4096)
+        self.addCleanup(self.server.close)
+
+    def music_info(self, song_id):
+        return {'id': song_id, 'source': 'test', 'title': 't', 'artist': 'a', 'url': self.server.url}
+
+    def test_failed_request_releases_reserved_name(self):
+        self.server.fail_statuses = [404] * 3
+        for song_id in ('1', '2', '3'):
+            with self.assertRaises(Exception):
+                self.manager.download_music(self.music_info(song_id), self.folder)
+        self.assertEqual(os.listdir(self.folder), [])
+
+        path = self.manager.download_music(self.music_info('4'), self.folder)
+        self.assertEqual(path, os.path.join(self.folder, 'a - t.mp3'))
+
+    def test_interrupted_download_keeps_partial_data(self):
+        self.manager.downloader.max_retries = 0
+        self.server.cut_after = [1000]
+        with self.assertRaises(Exception):
+            self.manager.download_music(self.music_info('1'), self.folder)
+        self.assertTrue(self.manager.downloader.can_resume(os.path.join(self.folder, 'a - t.mp3')))
+
+        path = self.manager.download_music(self.music_info('1'), self.folder)
+        self.assertEqual(path, os.path.join(self.folder, 'a - t.mp3'))
+        self.assertTrue(self.server.range_requests()[-1].startswith('bytes=1000-'))
+
+    def test_duplicate_content_is_stored_once(self):
+        first = self.manager.download_music(self.music_info('1'), self.folder)
+        second = self.manager.download_music(self.music_info('2'), self.folder)
+        self.assertEqual(first, second)
+        self.assertEqual(os.listdir(self.folder), ['a - t.mp3'])
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.manager.download_music(self.music_info('2'), self.folder), first)
+        self.assertEqual(len(self.server.requests), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import time
+import threading
+import unittest
+
+import requests
+
+from modules.download_scheduler import DownloadScheduler
+
+
+class DownloadSchedulerTest(unittest.TestCase):
+    def make_scheduler(self, download, **kwargs):
+        scheduler = DownloadScheduler(download, **kwargs)
+        self.addCleanup(scheduler.close)
+        return scheduler
+
+    def test_priority_order(self):
+        started = []
+        gate = threading.Event()
+
+        def download(music_info, download_folder, progress):
+            started.append(music_info['id'])
+            if music_info['id'] == 'first':
+                gate.wait(5)
+            return music_info['id']
+
+        scheduler = self.make_scheduler(download, max_concurrency=1, initial_concurrency=1)
+        first = scheduler.submit({'id': 'first'}, '/tmp')
+        while not started:
+            time.sleep(0.01)
+        jobs = [
+            scheduler.submit({'id': 'low'}, '/tmp', priority=0),
+            scheduler.submit({'id': 'high'}, '/tmp', priority=2),
+            scheduler.submit({'id': 'middle'}, '/tmp', priority=1),
+            scheduler.submit({'id': 'low2'}, '/tmp', priority=0),
+        ]
+        gate.set()
+        for job in [first] + jobs:
+            job.future.result(5)
+        self.assertEqual(started, ['first', 'high', 'middle', 'low', 'low2'])
+
+    def test_poll_events(self):
+        def download(music_info, download_folder, progress):
+            progress(10, 100)
+            progress(100, 100)
+            return f"{download_folder}/{music_info['id']}"
+
+        scheduler = self.make_scheduler(download)
+        job = scheduler.submit({'id': 'a'}, '/music')
+        self.assertEqual(job.future.result(5), '/music/a')
+        # 结果设置后任务才放入完成列表
+        while scheduler.stats()['running']:
+            time.sleep(0.01)
+        progress, finished = scheduler.poll_events()
+        self.assertEqual(finished, [job])
+        self.assertEqual(scheduler.poll_events(), ({}, []))
+        self.assertEqual(job.received, 100)
+
+    def test_resumed_prefix_not_charged_to_bandwidth(self):
+        offset = 50 * 1024 * 1024
+
+        def download(music_info, download_folder, progress):
+            progress(offset, offset + 20000)
+            for i in range(1, 5):
+                progress(offset + i * 5000, offset + 20000)
+            return 'done'
+
+        scheduler = self.make_scheduler(download, bandwidth_limit=1024 * 1024)
+        job = scheduler.submit({'id': 'resumed'}, '/tmp')
+        # 已有的50MB按1MB/s计入带宽时要等50秒
+        self.assertEqual(job.future.result(2), 'done')
+
+    def test_resumed_prefix_not_counted_in_throughput(self):
+        offset = 50 * 1024 * 1024
+
+        def download(music_info, download_folder, progress):
+            progress(offset, None)
+            progress(offset + 1000, None)
+            time.sleep(0.1)
+            progress(offset + 2000, None)
+            return 'done'
+
+        scheduler = self.make_scheduler(download, adjust_interval=0.05)
+        scheduler.submit({'id': 'resumed'}, '/tmp').future.result(5)
+        self.assertLess(scheduler.stats()['throughput'], 100 * 1024)
+
+    def test_connection_error_halves_concurrency(self):
+        def download(music_info, download_folder, progress):
+            raise requests.exceptions.ConnectionError("refused")
+
+        scheduler = self.make_scheduler(download, max_concurrency=8, initial_concurrency=4)
+        job = scheduler.submit({'id': 'a'}, '/tmp')
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            job.future.result(5)
+        self.assertEqual(scheduler.stats()['concurrency'], 2)
+
+    def test_other_errors_keep_concurrency(self):
+        def download(music_info, download_folder, progress):
+            raise ValueError("bad")
+
+        scheduler = self.make_scheduler(download, max_concurrency=8, initial_concurrency=4)
+        with self.assertRaises(ValueError):
+            scheduler.submit({'id': 'a'}, '/tmp').future.result(5)
+        self.assertEqual(scheduler.stats()['concurrency'], 4)
+
+    def test_concurrency_grows_while_throughput_scales(self):
+        lock = threading.Lock()
+        running = [0, 0]    # 当前、最大
+
+        def download(music_info, download_folder, progress):
+            with lock:
+                running[0] += 1
+                running[1] = max(running[1], running[0])
+            try:
+                for i in range(1, 31):
+                    time.sleep(0.01)
+                    progress(i * 10000, 300000)
+            finally:
+                with lock:
+                    running[0] -= 1
+            return 'done'
+
+        scheduler = self.make_scheduler(download, max_concurrency=3, initial_concurrency=1, adjust_interval=0.05)
+        jobs = [scheduler.submit({'id': i}, '/tmp') for i in range(12)]
+        for job in jobs:
+            job.future.result(10)
+        self.assertGreaterEqual(running[1], 2)
+
+    def test_close_cancels_queued_jobs(self):
+        gate = threading.Event()
+
+        def download(music_info, download_folder, progress):
+            gate.wait(5)
+            return 'done'
+
+        scheduler = DownloadScheduler(download, max_concurrency=1, initial_concurrency=1)
+        running = scheduler.submit({'id': 'a'}, '/tmp')
+        queued = scheduler.submit({'id': 'b'}, '/tmp')
+        time.sleep(0.05)
+        scheduler.close()
+        gate.set()
+        self.assertTrue(queued.future.cancelled())
+        self.assertEqual(running.future.result(5), 'done')
+        with self.assertRaises(RuntimeError):
+            scheduler.submit({'id': 'c'}, '/tmp')
+
+    def test_cancelled_queued_job_keeps_slot(self):
+        gate = threading.Event()
+
+        def download(music_info, download_folder, progress):
+            gate.wait(5)
+            return music_info['id']
+
+        scheduler = self.make_scheduler(download, max_concurrency=1, initial_concurrency=1)
+        first = scheduler.submit({'id': 'a'}, '/tmp')
+        cancelled = scheduler.submit({'id': 'b'}, '/tmp')
+        self.assertTrue(cancelled.future.cancel())
+        gate.set()
+        self.assertEqual(first.future.result(5), 'a')
+        # 取消的任务不占用并发名额，后面的任务仍能下载
+        self.assertEqual(scheduler.submit({'id': 'c'}, '/tmp').future.result(5), 'c')
+        self.assertEqual(scheduler.stats()['running'], 0)
+
+    def test_poll_events_keeps_every_finished_job(self):
+        scheduler = self.make_scheduler(lambda music_info, download_folder, progress: music_info['id'])
+        jobs = [scheduler.submit({'id': i}, '/tmp') for i in range(1500)]
+        for job in jobs:
+            job.future.result(10)
+        while scheduler.stats()['running']:
+            time.sleep(0.01)
+        # 界面线程很久没有取走事件时，完成的任务也不能丢失
+        finished = scheduler.poll_events()[1]
+        self.assertEqual(sorted(job.id for job in finished), [job.id for job in jobs])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,228 @@
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+from modules.http_session import HttpSessionPool
+from modules.host_policy import HostPolicy, CircuitOpenError
+from modules.downloader import ResumableDownloader, _ContentHasher
+from tests.http_server import FileServer
+
+
+class CountingPolicy(HostPolicy):
+    """记录计入熔断的失败次数"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('rate', 1000)
+        kwargs.setdefault('burst', 1000)
+        kwargs.setdefault('base_delay', 0.01)
+        super().__init__(**kwargs)
+        self.failures = 0
+
+    def record_failure(self, url):
+        self.failures += 1
+        super().record_failure(url)
+
+
+class DownloaderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='downloader-test-')
+        self.target = os.path.join(self.workdir, 'song.mp3')
+        self.http = HttpSessionPool(pool_size=8, read_timeout=5)
+        self.servers = []
+
+    def tearDown(self):
+        self.http.close()
+        for server in self.servers:
+            server.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def serve(self, data, **kwargs):
+        server = FileServer(data, **kwargs)
+        self.servers.append(server)
+        return server
+
+    def downloader(self, policy=None, **kwargs):
+        kwargs.setdefault('max_segments', 1)
+        return ResumableDownloader(self.http, policy or CountingPolicy(), **kwargs)
+
+    def assert_downloaded(self, result, data):
+        self.assertEqual(result, (self.target, hashlib.sha256(data).hexdigest()))
+        with open(self.target, 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertFalse(os.path.exists(self.target + ResumableDownloader.PART_SUFFIX))
+        self.assertFalse(os.path.exists(self.target + ResumableDownloader.JOURNAL_SUFFIX))
+
+
+class ResumableDownloaderTest(DownloaderTestCase):
+    def test_download(self):
+        data = os.urandom(300 * 1024)
+        server = self.serve(data)
+        progress = []
+        result = self.downloader().download(server.url, self.target, lambda received, total: progress.append(received))
+        self.assert_downloaded(result, data)
+        self.assertEqual(progress[-1], len(data))
+
+    def test_download_without_range_support(self):
+        data = os.urandom(200 * 1024)
+        server = self.serve(data, ranges=False)
+        self.assert_downloaded(self.downloader().download(server.url, self.target), data)
+
+    def test_interrupted_transfer_resumes(self):
+        data = os.urandom(500 * 1024)
+        server = self.serve(data)
+        server.cut_after = [100 * 1024]
+        policy = CountingPolicy()
+        result = self.downloader(policy, chunk_size=16 * 1024).download(server.url, self.target)
+        self.assert_downloaded(result, data)
+        ranges = server.range_requests()
+        self.assertEqual(len(ranges), 2)
+        self.assertEqual(ranges[0], 'bytes=0-')
+        self.assertEqual(ranges[1], f'bytes={100 * 1024}-{len(data) - 1}')
+        self.assertEqual(policy.failures, 0)
+
+    def test_resume_after_restart(self):
+        data = os.urandom(500 * 1024)
+        server = self.serve(data)
+        server.cut_after = [200 * 1024]
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            self.downloader(max_retries=0, chunk_size=16 * 1024).download(server.url, self.target)
+        self.assertTrue(self.downloader().has_partial(self.target))
+
+        result = self.downloader().download(server.url, self.target)
+        self.assert_downloaded(result, data)
+        self.assertEqual(server.requests[-1].get('If-Range'), server.etag)
+        self.assertTrue(server.range_requests()[-1].startswith(f'bytes={200 * 1024}-'))
+
+    def test_changed_file_restarts_from_beginning(self):
+        old = os.urandom(500 * 1024)
+        server = self.serve(old)
+        server.cut_after = [200 * 1024]
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            self.downloader(max_retries=0, chunk_size=16 * 1024).download(server.url, self.target)
+
+        new = os.urandom(400 * 1024)
+        server.data = new
+        server.etag = '"v2"'
+        self.assert_downloaded(self.downloader().download(server.url, self.target), new)
+
+    def test_segmented_download(self):
+        data = os.urandom(4 * 1024 * 1024)
+        server = self.serve(data, block_size=32 * 1024, block_delay=0.005)
+        downloader = self.downloader(
+            max_segments=4, segment_threshold=1024 * 1024, min_segment_size=128 * 1024,
+            probe_interval=0.05, chunk_size=32 * 1024
+        )
+        available = []
+        result = downloader.download(server.url, self.target, available=available.append)
+        self.assert_downloaded(result, data)
+        self.assertGreater(len(server.requests), 1)
+        self.assertEqual(available, sorted(available))
+        self.assertEqual(available[-1], len(data))
+
+    def test_segmented_download_hashes_without_reading_back(self):
+        data = os.urandom(2 * 1024 * 1024)
+        server = self.serve(data, block_size=32 * 1024, block_delay=0.005)
+        downloader = self.downloader(
+            max_segments=4, segment_threshold=1024 * 1024, min_segment_size=128 * 1024,
+            probe_interval=0.05, chunk_size=32 * 1024
+        )
+        with mock.patch.object(_ContentHasher, '_read_back', side_effect=AssertionError("读回了文件")):
+            self.assert_downloaded(downloader.download(server.url, self.target), data)
+        self.assertGreater(len(server.requests), 1)
+
+    def test_segmented_download_skips_hash_over_buffer_limit(self):
+        data = os.urandom(2 * 1024 * 1024)
+        server = self.serve(data, block_size=32 * 1024, block_delay=0.005)
+        downloader = self.downloader(
+            max_segments=4, segment_threshold=1024 * 1024, min_segment_size=128 * 1024,
+            probe_interval=0.05, chunk_size=32 * 1024, hash_buffer_size=64 * 1024
+        )
+        path, digest = downloader.download(server.url, self.target)
+        self.assertIsNone(digest)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_segmented_download_resumes_each_segment(self):
+        data = os.urandom(2 * 1024 * 1024)
+        server = self.serve(data, block_size=32 * 1024, block_delay=0.01)
+        server.cut_after = [300 * 1024]
+        downloader = self.downloader(
+            max_segments=2, segment_threshold=1024 * 1024, min_segment_size=128 * 1024,
+            probe_interval=0.05, chunk_size=32 * 1024
+        )
+        self.assert_downloaded(downloader.download(server.url, self.target), data)
+
+    def test_server_errors_counted_once(self):
+        server = self.serve(b'x' * 1024)
+        server.fail_statuses = [503] * 10
+        policy = CountingPolicy(max_retries=3)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.downloader(policy, max_retries=3).download(server.url, self.target)
+        self.assertEqual(len(server.requests), 4)
+        self.assertEqual(policy.failures, 4)
+
+    def test_connection_errors_counted_once(self):
+        server = self.serve(b'x')
+        url = server.url
+        server.close()
+        self.servers.remove(server)
+        policy = CountingPolicy(max_retries=2, failure_threshold=100)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.downloader(policy, max_retries=3).download(url, self.target)
+        self.assertEqual(policy.failures, 3)
+
+    def test_open_circuit_is_not_retried(self):
+        server = self.serve(b'x' * 1024)
+        server.fail_statuses = [503] * 10
+        policy = CountingPolicy(max_retries=1, failure_threshold=2, reset_timeout=60)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.downloader(policy).download(server.url, self.target)
+        self.assertEqual(policy.failures, 2)
+
+        began = time.monotonic()
+        with self.assertRaises(CircuitOpenError):
+            self.downloader(policy, max_retries=3).download(server.url, self.target)
+        self.assertLess(time.monotonic() - began, 0.5)
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(policy.failures, 2)
+
+
+class ContentHasherTest(unittest.TestCase):
+    def test_out_of_order_updates(self):
+        data = os.urandom(10000)
+        advances = []
+        hasher = _ContentHasher(os.devnull, advances.append)
+        buffer = bytearray(data[6000:])
+        hasher.update(6000, buffer)
+        buffer[:] = b'\0' * len(buffer)     # 缓冲区复用后内容已变化
+        hasher.update(3000, data[3000:6000])
+        self.assertEqual(hasher.position, 0)
+        hasher.update(0, data[:3000])
+        self.assertEqual(advances, [0, 10000])
+        self.assertEqual(hasher.hexdigest(10000), hashlib.sha256(data).hexdigest())
+
+    def test_gives_up_over_buffer_limit_but_tracks_position(self):
+        data = os.urandom(10000)
+        advances = []
+        hasher = _ContentHasher(os.devnull, advances.append, max_buffer=5000)
+        hasher.update(2000, data[2000:5000])
+        hasher.update(5000, data[5000:])
+        hasher.update(0, data[:2000])
+        self.assertEqual(advances, [0, 10000])
+        self.assertIsNone(hasher.hexdigest(10000))
+
+    def test_incomplete(self):
+        hasher = _ContentHasher(os.devnull)
+        hasher.update(10, b'x' * 10)
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            hasher.hexdigest(20)
+
+
+if __name__ == '__main__':
+    unittest.main()
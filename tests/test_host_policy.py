@@ -0,0 +1,89 @@
+import unittest
+
+import requests
+
+from modules.host_policy import HostPolicy, CircuitBreaker, CircuitOpenError
+
+URL = "http://music.example.com/song.mp3"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=self.clock)
+
+    def open(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_opens_after_threshold_and_probes_once(self):
+        self.open()
+        self.assertFalse(self.breaker.allow())
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_opens_again(self):
+        self.open()
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+        self.clock.now = 20
+        self.assertTrue(self.breaker.allow())
+
+    def test_failures_while_open_do_not_delay_probe(self):
+        self.open()
+        self.clock.now = 9
+        self.breaker.record_failure()
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow())
+
+
+class HostPolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.policy = HostPolicy(rate=1000, burst=1000, max_retries=0, failure_threshold=1, reset_timeout=0)
+
+    def break_host(self):
+        def fail():
+            raise requests.exceptions.ConnectionError("连接失败")
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.policy.request(URL, fail)
+        self.assertEqual(self.policy.stats()["music.example.com"], CircuitBreaker.OPEN)
+
+    def test_other_error_during_probe_releases_it(self):
+        self.break_host()
+
+        def invalid():
+            raise requests.exceptions.InvalidURL("无效的URL")
+
+        with self.assertRaises(requests.exceptions.InvalidURL):
+            self.policy.request(URL, invalid)
+        self.assertNotEqual(self.policy.stats()["music.example.com"], CircuitBreaker.HALF_OPEN)
+
+        response = requests.Response()
+        response.status_code = 200
+        self.assertIs(self.policy.request(URL, lambda: response), response)
+        self.assertEqual(self.policy.stats()["music.example.com"], CircuitBreaker.CLOSED)
+
+    def test_open_circuit_rejects_requests(self):
+        policy = HostPolicy(max_retries=0, failure_threshold=1, reset_timeout=60)
+        policy.record_failure(URL)
+        with self.assertRaises(CircuitOpenError):
+            policy.request(URL, lambda: self.fail("请求不应发出"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import json
+import unittest
+
+from modules.json_stream import iter_array_items
+
+KEYS = ("data", "songs", "result")
+
+DOCUMENTS = [
+    {"ratio": 0.75, "data": [{"title": "晴天", "n": 1e5}, 2, -3.5e-2, "x", None, True, [1, [2]]]},
+    {"data": [1e5, 12345, 0, -0.0, 1.5E+3]},
+    {"code": 200, "meta": {"data": [1, 2], "nested": {"a": "}]"}}, "songs": [{"name": "a\"b"}]},
+    {"songs": "不是列表", "result": [{"title": "夜曲"}], "data": [1]},
+    {"data": []},
+    {"count": 12},
+]
+
+
+def split_at(body, *offsets):
+    points = [0, *offsets, len(body)]
+    return [body[start:end] for start, end in zip(points, points[1:])]
+
+
+def expected_items(document):
+    for key, value in document.items():
+        if key in KEYS and isinstance(value, list):
+            return [(key, item) for item in value]
+    return []
+
+
+class IterArrayItemsTest(unittest.TestCase):
+    def test_split_at_every_offset(self):
+        for document in DOCUMENTS:
+            for indent in (None, 1):
+                body = json.dumps(document, ensure_ascii=False, indent=indent).encode('utf-8')
+                expected = expected_items(json.loads(body))
+                for offset in range(len(body) + 1):
+                    with self.subTest(document=document, indent=indent, offset=offset):
+                        self.assertEqual(list(iter_array_items(split_at(body, offset), KEYS)), expected)
+
+    def test_one_byte_chunks(self):
+        for document in DOCUMENTS:
+            body = json.dumps(document, ensure_ascii=False).encode('utf-8')
+            chunks = [body[i:i + 1] for i in range(len(body))]
+            self.assertEqual(list(iter_array_items(chunks, KEYS)), expected_items(document))
+
+    def test_numbers_split_after_dot_and_exponent(self):
+        chunks = [b'{"ratio": 0.', b'75, "data":[1e', b'5, 2.', b'5]}']
+        self.assertEqual(list(iter_array_items(chunks, KEYS)), [("data", 1e5), ("data", 2.5)])
+
+    def test_byte_order_mark(self):
+        body = b'\xef\xbb\xbf' + json.dumps({"data": [1, 2]}).encode('utf-8')
+        self.assertEqual([item for _, item in iter_array_items([body], KEYS)], [1, 2])
+
+    def test_stops_reading_when_caller_stops(self):
+        body = json.dumps({"data": list(range(100000))}).encode('utf-8')
+        read = []
+
+        def chunks():
+            for i in range(0, len(body), 100):
+                read.append(i)
+                yield body[i:i + 100]
+
+        items = iter_array_items(chunks(), KEYS)
+        self.assertEqual([next(items)[1] for _ in range(20)], list(range(20)))
+        self.assertLess(len(read), 5)
+
+    def test_top_level_not_object(self):
+        self.assertEqual(list(iter_array_items([b'[1, 2]'], KEYS)), [])
+
+    def test_invalid_documents(self):
+        for body in (b'', b'{"data":[1,2', b'{"data":[1 2]}', b'{1:2}', b'{"data":[1.x]}'):
+            with self.subTest(body=body):
+                with self.assertRaises(ValueError):
+                    list(iter_array_items(split_at(body, len(body) // 2), KEYS))
+
+    def test_items_before_error_are_returned(self):
+        items = iter_array_items([b'{"data":[1,2,', b'}'], KEYS)
+        self.assertEqual(next(items), ("data", 1))
+        self.assertEqual(next(items), ("data", 2))
+        with self.assertRaises(ValueError):
+            next(items)
+
+
+if __name__ == '__main__':
+    unittest.main()
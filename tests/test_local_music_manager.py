@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from modules.local_music_manager import LocalMusicManager
+
+
+class LocalMusicManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='local-music-test-')
+        self.addCleanup(shutil.rmtree, self.workdir, True)
+        self.folder = os.path.join(self.workdir, 'music')
+        os.makedirs(os.path.join(self.folder, 'sub'))
+        for name in ('周杰伦 - 晴天.mp3', 'sub/Artist - Song.flac', 'notes.txt'):
+            self.write(name)
+        self.manager = LocalMusicManager(os.path.join(self.workdir, 'library.db'))
+
+    def write(self, name, data=b'data'):
+        path = os.path.join(self.folder, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_scan_and_search(self):
+        songs = self.manager.scan_folder(self.folder)
+        self.assertEqual([os.path.basename(path) for path in songs], ['Artist - Song.flac', '周杰伦 - 晴天.mp3'])
+        self.assertEqual(self.manager.search_local_music(self.folder, '晴天'), [songs[1]])
+
+    def test_recently_added(self):
+        old = os.path.join(self.folder, 'sub', 'Artist - Song.flac')
+        os.utime(old, (0, 0))
+        newest = self.write('New - Track.mp3')
+        os.utime(newest, (time.time() + 60, time.time() + 60))
+        recent = self.manager.get_recently_added(self.folder)
+        self.assertEqual(recent, [newest, os.path.join(self.folder, '周杰伦 - 晴天.mp3')])
+        self.assertEqual(self.manager.get_recently_added(self.folder, limit=1), [newest])
+        self.assertEqual(self.manager.get_recently_added(self.folder, days=100000), recent + [old])
+
+    def test_subfolders_with_astral_characters(self):
+        added = self.write_in('🎵 收藏', 'Artist - Emoji.mp3')
+        self.assertIn(added, self.manager.scan_folder(self.folder))
+        # 重新打开后从索引中读取
+        reopened = LocalMusicManager(os.path.join(self.workdir, 'library.db'))
+        self.assertIn(added, reopened.scan_folder(self.folder))
+
+    def write_in(self, folder, name):
+        os.makedirs(os.path.join(self.folder, folder), exist_ok=True)
+        return self.write(os.path.join(folder, name))
+
+    def test_search_matches_extension(self):
+        songs = self.manager.scan_folder(self.folder)
+        self.assertEqual(self.manager.search_local_music(self.folder, 'flac'), [songs[0]])
+        self.assertEqual(self.manager.search_local_music(self.folder, '.MP3'), [songs[1]])
+        self.assertEqual(self.manager.search_local_music(self.folder, 'song.flac'), [songs[0]])
+
+    def test_changes_reach_search_index_and_snapshot(self):
+        self.manager.search_local_music(self.folder, 'x')
+        self.assertEqual(len(self.manager.get_snapshot(self.folder)), 2)
+        added = self.write('sub/New - Track.mp3')
+        os.remove(os.path.join(self.folder, '周杰伦 - 晴天.mp3'))
+        delta = self.manager.refresh_folder(self.folder)
+        self.assertEqual(delta['added'], [added])
+        self.assertEqual(self.manager.search_local_music(self.folder, 'track'), [added])
+        self.assertEqual(self.manager.search_local_music(self.folder, '晴天'), [])
+        self.assertEqual(sorted(self.manager.get_snapshot(self.folder).paths()),
+                         sorted([added, os.path.join(self.folder, 'sub', 'Artist - Song.flac')]))
+
+    def test_background_changes_while_searching(self):
+        self.manager.search_local_music(self.folder, 'x')
+        paths = [os.path.join(self.folder, f'song {i}.mp3') for i in range(200)]
+        errors = []
+        stop = threading.Event()
+
+        def churn():
+            # 模拟文件监视器在后台线程中反复增删文件
+            try:
+                while not stop.is_set():
+                    self.manager.apply_file_changes(added=paths)
+                    self.manager.apply_file_changes(removed=paths)
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=churn)
+        thread.start()
+        try:
+            for _ in range(300):
+                self.manager.search_local_music(self.folder, 's')
+                self.manager.search_local_music(self.folder, 'song 1')
+        finally:
+            stop.set()
+            thread.join()
+        self.assertEqual(errors, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import io
+import os
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+from modules import metadata_reader
+from modules.metadata_reader import read_metadata
+
+
+def atom(atom_type, payload):
+    return struct.pack('>I4s', 8 + len(payload), atom_type) + payload
+
+
+def tag_item(atom_type, text):
+    return atom(atom_type, atom(b'data', struct.pack('>II', 1, 0) + text.encode('utf-8')))
+
+
+def adts_frame(rate_index, length):
+    header = bytes([
+        0xFF, 0xF1,
+        (1 << 6) | (rate_index << 2),
+        0x80 | ((length >> 11) & 0x03),
+        (length >> 3) & 0xFF,
+        ((length & 0x07) << 5) | 0x1F,
+        0xFC,
+    ])
+    return header + bytes(length - 7)
+
+
+class CountingFile(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+class MetadataReaderTest(unittest.TestCase):
+    def write(self, name, data):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(lambda: (os.remove(path), os.rmdir(directory)))
+        path = os.path.join(directory, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def make_m4a(self, cover_size=0, mdat_size=0):
+        mvhd = atom(b'mvhd', struct.pack('>I', 0) + bytes(8) + struct.pack('>II', 1000, 185000) + bytes(80))
+        ilst = atom(b'ilst', atom(b'covr', bytes(cover_size))
+                    + tag_item(b'\xa9nam', '稻香') + tag_item(b'\xa9ART', '周杰伦'))
+        udta = atom(b'udta', atom(b'meta', bytes(4) + ilst))
+        return (atom(b'ftyp', b'M4A \x00\x00\x00\x00') + atom(b'mdat', bytes(mdat_size))
+                + atom(b'moov', mvhd + udta))
+
+    def test_m4a_tags_and_duration(self):
+        metadata = read_metadata(self.write('a.m4a', self.make_m4a(cover_size=1024)))
+        self.assertEqual(metadata['title'], '稻香')
+        self.assertEqual(metadata['artist'], '周杰伦')
+        self.assertAlmostEqual(metadata['duration'], 185.0)
+
+    def test_m4a_skips_cover_art_and_media_data(self):
+        data = self.make_m4a(cover_size=4 * 1024 * 1024, mdat_size=4 * 1024 * 1024)
+        f = CountingFile(data)
+        metadata = metadata_reader._empty_metadata()
+        metadata_reader._read_m4a(f, len(data), metadata)
+        self.assertEqual(metadata['title'], '稻香')
+        self.assertAlmostEqual(metadata['duration'], 185.0)
+        self.assertLess(f.bytes_read, 4096)
+
+    def test_adts_duration(self):
+        # 44100Hz，每帧1024个采样，共431帧，约10秒
+        frames = adts_frame(4, 400) * 431
+        metadata = read_metadata(self.write('a.aac', frames))
+        self.assertAlmostEqual(metadata['duration'], 431 * 1024 / 44100, places=3)
+
+    def test_adts_with_id3_tag(self):
+        text = b'\x03' + '发如雪'.encode('utf-8')
+        frame = b'TIT2' + struct.pack('>I', len(text)) + b'\x00\x00' + text
+        id3 = b'ID3\x03\x00\x00' + bytes([0, 0, 0, len(frame)]) + frame
+        frames = adts_frame(3, 300) * 100
+        metadata = read_metadata(self.write('a.aac', id3 + frames))
+        self.assertEqual(metadata['title'], '发如雪')
+        self.assertAlmostEqual(metadata['duration'], 100 * 1024 / 48000, places=3)
+
+    def test_aac_extension_with_mp4_container(self):
+        metadata = read_metadata(self.write('a.aac', self.make_m4a()))
+        self.assertEqual(metadata['title'], '稻香')
+        self.assertAlmostEqual(metadata['duration'], 185.0)
+
+    def test_executor_uses_spawn(self):
+        reader = metadata_reader.MetadataReader(max_workers=1)
+        with mock.patch.object(metadata_reader, 'ProcessPoolExecutor') as executor:
+            reader._get_executor()
+        self.assertEqual(executor.call_args.kwargs['mp_context'].get_start_method(), 'spawn')
+
+
+if __name__ == '__main__':
+    unittest.main()
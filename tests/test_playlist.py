@@ -0,0 +1,146 @@
+import os
+import random
+import unittest
+
+from modules.playlist import Playlist
+
+SONGS = [f"/music/{name}.mp3" for name in "abcdef"]
+
+
+class PlaylistTest(unittest.TestCase):
+    def make(self, paths=SONGS, shuffle=False):
+        playlist = Playlist(paths, rng=random.Random(1))
+        if shuffle:
+            playlist.set_shuffle(True)
+        return playlist
+
+    def test_next_and_previous_wrap_around(self):
+        playlist = self.make()
+        playlist.jump(len(SONGS) - 1)
+        self.assertEqual(playlist.next(), 0)
+        self.assertEqual(playlist.previous(), len(SONGS) - 1)
+
+        playlist = self.make()
+        playlist.jump(0)
+        # 没有播放历史时按列表顺序回到上一首
+        self.assertEqual(playlist.previous(), len(SONGS) - 1)
+
+    def test_removing_current_continues_from_its_position(self):
+        playlist = self.make()
+        playlist.jump(2)
+        self.assertEqual(playlist.remove_where(lambda path: path == SONGS[2]), [SONGS[2]])
+        self.assertIsNone(playlist.current_path)
+        self.assertEqual(playlist[playlist.peek_next()], SONGS[3])
+        self.assertEqual(playlist[playlist.next()], SONGS[3])
+
+    def test_previous_after_removing_current(self):
+        playlist = self.make()
+        playlist.jump(2)
+        playlist.remove_where(lambda path: path == SONGS[2])
+        self.assertEqual(playlist[playlist.previous()], SONGS[1])
+
+    def test_removed_position_follows_later_changes(self):
+        playlist = self.make()
+        playlist.jump(3)
+        playlist.remove_where(lambda path: path == SONGS[3])
+        # 再删除前面的歌曲、在前面插入歌曲，原来的下一首仍是下一曲
+        playlist.remove_where(lambda path: path in (SONGS[0], SONGS[4]))
+        playlist.insert(0, "/music/new.mp3")
+        self.assertEqual(playlist[playlist.next()], SONGS[5])
+
+    def test_removing_current_last_song_wraps(self):
+        playlist = self.make()
+        playlist.jump(len(SONGS) - 1)
+        playlist.remove_where(lambda path: path == SONGS[-1])
+        self.assertEqual(playlist.peek_next(), 0)
+
+    def test_removing_current_and_neighbours(self):
+        playlist = self.make()
+        playlist.jump(1)
+        playlist.remove_where(lambda path: path in SONGS[1:4])
+        self.assertEqual(playlist[playlist.next()], SONGS[4])
+
+    def test_insert_and_sort_keep_current(self):
+        playlist = self.make()
+        playlist.jump(1)
+        playlist.insert(0, "/music/z.mp3")
+        self.assertEqual(playlist.current_index(), 2)
+        playlist.sort(key=lambda path: path, reverse=True)
+        self.assertEqual(list(playlist), sorted(SONGS + ["/music/z.mp3"], reverse=True))
+        self.assertEqual(playlist.current_path, SONGS[1])
+        self.assertEqual(playlist[playlist.next()], SONGS[0])
+
+    def test_insert_sorted_matches_full_sort(self):
+        def key(path):
+            return os.path.basename(path)[0]
+
+        existing = [f"/music/{c}{i}.mp3" for i, c in enumerate("aaccceegg")]
+        added = ["/new/c.mp3", "/new/a.mp3", "/new/z.mp3", "/new/0.mp3", "/new/e.mp3", "/new/c2.mp3"]
+        for reverse in (False, True):
+            # 重复的列表让插入走逐首二分查找，单独的列表让插入走整体合并
+            for copies in (64, 1):
+                with self.subTest(reverse=reverse, copies=copies):
+                    playlist = self.make(sorted(existing * copies, key=key, reverse=reverse))
+                    expected = sorted(list(playlist) + added, key=key, reverse=reverse)
+                    playlist.insert_sorted(added, key, reverse)
+                    self.assertEqual(list(playlist), expected)
+
+    def test_insert_sorted_after_removing_current(self):
+        for count in (6, 600):
+            with self.subTest(count=count):
+                playlist = self.make([f"/music/{i:04d}.mp3" for i in range(count)])
+                playlist.jump(count // 2)
+                current = playlist.current_path
+                playlist.remove_where(lambda path: path == current)
+                playlist.insert_sorted(["/music/-.mp3", "/music/z.mp3"], key=lambda path: path)
+                self.assertEqual(playlist[playlist.peek_next()], f"/music/{count // 2 + 1:04d}.mp3")
+
+    def test_entry_ids_follow_rows(self):
+        playlist = self.make()
+        entry_id = playlist.entry_at(2)
+        playlist.insert(0, "/music/z.mp3")
+        self.assertEqual(playlist.index_of_entry(entry_id), 3)
+        playlist.sort(key=lambda path: path, reverse=True)
+        self.assertEqual(playlist[playlist.index_of_entry(entry_id)], SONGS[2])
+        playlist.remove_where(lambda path: path == SONGS[2])
+        self.assertIsNone(playlist.index_of_entry(entry_id))
+
+    def test_shuffle_plays_every_song_once_per_round(self):
+        playlist = self.make(shuffle=True)
+        playlist.jump(0)
+        played = [playlist[playlist.next()] for _ in range(len(SONGS) - 1)]
+        self.assertEqual(sorted(played), SONGS[1:])
+
+    def test_shuffle_previous_follows_history(self):
+        playlist = self.make(shuffle=True)
+        playlist.jump(0)
+        played = [playlist.current_path] + [playlist[playlist.next()] for _ in range(3)]
+        back = [playlist[playlist.previous()] for _ in range(3)]
+        self.assertEqual(back, played[-2::-1])
+        self.assertEqual([playlist[playlist.next()] for _ in range(3)], played[1:])
+
+    def test_rename_keeps_position(self):
+        playlist = self.make()
+        playlist.jump(2)
+        playlist.rename({SONGS[2]: "/music/renamed.mp3"})
+        self.assertEqual(playlist.current_path, "/music/renamed.mp3")
+        self.assertNotIn(SONGS[2], playlist)
+        self.assertIn("/music/renamed.mp3", playlist)
+
+    def test_duplicate_entries(self):
+        playlist = self.make([SONGS[0], SONGS[1], SONGS[0]])
+        playlist.jump(2)
+        self.assertEqual(playlist.next(), 0)
+        playlist.remove_where(lambda path: path == SONGS[0])
+        self.assertEqual(list(playlist), [SONGS[1]])
+        self.assertNotIn(SONGS[0], playlist)
+
+    def test_empty(self):
+        playlist = self.make([])
+        self.assertIsNone(playlist.peek_next())
+        self.assertIsNone(playlist.next())
+        self.assertIsNone(playlist.previous())
+
+
+if __name__ == '__main__':
+    unittest.main()
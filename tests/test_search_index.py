@@ -0,0 +1,37 @@
+import unittest
+
+from modules.search_index import SearchIndex
+
+PATHS = [
+    "/music/晴天 (Live).mp3",
+    "/music/周杰伦 - 晴天.flac",
+    "/music/晴天.mp3",
+    "/music/Sunny Day.ogg",
+]
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SearchIndex(PATHS, use_pinyin=False)
+
+    def test_ranking(self):
+        # 与主文件名完全相同的排在最前，其次是文件名开头，再其次是单词开头
+        self.assertEqual(self.index.search("晴天"), (3, [PATHS[2], PATHS[0], PATHS[1]]))
+
+    def test_extension_and_full_name(self):
+        self.assertEqual(self.index.search("FLAC"), (1, [PATHS[1]]))
+        self.assertEqual(self.index.search(".mp3")[0], 2)
+        self.assertEqual(self.index.search("晴天.mp3"), (1, [PATHS[2]]))
+
+    def test_normalization(self):
+        self.assertEqual(self.index.search("ＳＵＮＮＹ"), (1, [PATHS[3]]))
+        self.assertEqual(self.index.search("y"), (1, [PATHS[3]]))
+
+    def test_remove_and_paging(self):
+        self.index.remove([PATHS[2]])
+        self.assertEqual(self.index.search("晴天", offset=1, limit=1), (2, [PATHS[1]]))
+        self.assertNotIn(PATHS[2], self.index)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import threading
+import unittest
+from urllib.parse import urlsplit, parse_qs
+
+from modules.search_pages import SearchPages
+from modules.online_music_manager import OnlineMusicManager
+
+
+class FakeSource:
+    """按offset和limit切分固定的结果列表，可以让指定的页失败"""
+
+    def __init__(self, items, fail_offsets=()):
+        self.items = items
+        self.fail_offsets = set(fail_offsets)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, offset, limit, on_results):
+        with self.lock:
+            self.calls.append(offset)
+            if offset in self.fail_offsets:
+                self.fail_offsets.discard(offset)
+                raise ConnectionError(f"第 {offset} 条起获取失败")
+        page = self.items[offset:offset + limit]
+        return page, len(page) >= limit
+
+
+class SearchPagesTest(unittest.TestCase):
+    def test_pages_until_short_page(self):
+        pager = SearchPages(FakeSource(list(range(7))), page_size=3)
+        self.assertEqual(pager.next_page(), [0, 1, 2])
+        self.assertEqual(pager.next_page(), [3, 4, 5])
+        self.assertEqual(pager.next_page(), [6])
+        self.assertTrue(pager.exhausted)
+        self.assertEqual(pager.next_page(), [])
+
+    def test_iterate(self):
+        self.assertEqual(list(SearchPages(FakeSource(list(range(9))), page_size=3)), list(range(9)))
+
+    def test_page_without_new_items_does_not_end_paging(self):
+        pages = {0: ([1, 2], True), 2: ([], True), 4: ([], True), 6: ([3], False)}
+        pager = SearchPages(lambda offset, limit, on_results: pages[offset], page_size=2)
+        self.assertEqual(pager.next_page(), [1, 2])
+        self.assertFalse(pager.exhausted)
+        self.assertEqual(pager.next_page(), [3])
+        self.assertTrue(pager.exhausted)
+
+    def test_failed_page_is_fetched_again(self):
+        source = FakeSource(list(range(6)), fail_offsets=[2])
+        pager = SearchPages(source, page_size=2)
+        self.assertEqual(pager.next_page(), [0, 1])
+        with self.assertRaises(ConnectionError):
+            pager.next_page()
+        self.assertFalse(pager.exhausted)
+        self.assertEqual(pager.next_page(), [2, 3])
+        self.assertEqual(pager.next_page(), [4, 5])
+        self.assertEqual(source.calls.count(2), 2)
+
+    def test_invalid_page_size(self):
+        with self.assertRaises(ValueError):
+            SearchPages(FakeSource([]), page_size=0)
+
+
+class PagingManager(OnlineMusicManager):
+    """搜索来源的结果由测试提供，不发送请求"""
+
+    def __init__(self, sources):
+        super().__init__()
+        self.sources = sources
+        self.search_providers = [f"http://{name}/search?q={{keyword}}&offset={{offset}}&limit={{limit}}"
+                                 for name in sources]
+
+    def _query_provider(self, url, deadline, limit):
+        parts = urlsplit(url)
+        query = parse_qs(parts.query)
+        results = self.sources[parts.hostname](int(query['offset'][0]), int(query['limit'][0]))
+        return [{"title": title, "artist": "歌手", "source": "api"} for title in results]
+
+
+def titles(page):
+    return [result['title'] for result in page]
+
+
+class OnlineSearchPagesTest(unittest.TestCase):
+    def make_manager(self, **sources):
+        manager = PagingManager(sources)
+        self.addCleanup(manager.close)
+        return manager
+
+    def test_sources_merged_until_all_short(self):
+        same = [f"歌曲{i}" for i in range(4)]
+        manager = self.make_manager(
+            a=lambda offset, limit: same[offset:offset + limit],
+            b=lambda offset, limit: (same + ["独有"])[offset:offset + limit],
+        )
+        pager = manager.search_pages("歌曲", page_size=2)
+        self.assertEqual(titles(pager.next_page()), ["歌曲0", "歌曲1"])
+        self.assertEqual(titles(pager.next_page()), ["歌曲2", "歌曲3"])
+        self.assertEqual(titles(pager.next_page()), ["独有"])
+        self.assertEqual(pager.next_page(), [])
+
+    def test_duplicate_page_skipped(self):
+        first = [f"歌曲{i}" for i in range(4)]
+        later = ["歌曲0", "歌曲1", "新歌"]
+        manager = self.make_manager(
+            a=lambda offset, limit: first[:2] if offset == 0 else later[offset - 2:offset],
+        )
+        pager = manager.search_pages("歌曲", page_size=2)
+        self.assertEqual(titles(pager.next_page()), ["歌曲0", "歌曲1"])
+        # 第二页全部与第一页重复，接着获取第三页
+        self.assertEqual(titles(pager.next_page()), ["新歌"])
+        self.assertTrue(pager.exhausted)
+
+    def test_page_error_propagates_and_retries(self):
+        failures = [2]
+
+        def source(offset, limit):
+            if offset in failures:
+                failures.remove(offset)
+                raise ConnectionError("来源不可用")
+            return [f"歌曲{i}" for i in range(5)][offset:offset + limit]
+
+        pager = self.make_manager(a=source).search_pages("歌曲", page_size=2)
+        self.assertEqual(titles(pager.next_page()), ["歌曲0", "歌曲1"])
+        with self.assertRaises(ConnectionError):
+            pager.next_page()
+        self.assertEqual(titles(pager.next_page()), ["歌曲2", "歌曲3"])
+        self.assertEqual(titles(pager.next_page()), ["歌曲4"])
+        self.assertTrue(pager.exhausted)
+
+    def test_one_failed_source_keeps_paging(self):
+        def broken(offset, limit):
+            raise ConnectionError("来源不可用")
+
+        pager = self.make_manager(
+            a=lambda offset, limit: ["歌曲0"][offset:offset + limit], b=broken
+        ).search_pages("歌曲", page_size=2)
+        self.assertEqual(titles(pager.next_page()), ["歌曲0"])
+        # 另一个来源失败，不能确定已经没有更多结果
+        self.assertFalse(pager.exhausted)
+        with self.assertRaises(ConnectionError):
+            pager.next_page()
+
+
+if __name__ == '__main__':
+    unittest.main()
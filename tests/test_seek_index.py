@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from modules.seek_index import SeekIndex, SeekIndexCache, OffsetStream
+
+# MPEG-1 Layer III，128kbps，44100Hz，每帧417字节、1152个采样
+FRAME = b'\xff\xfb\x90\x00' + b'\x00' * 413
+FRAME_SECONDS = 1152 / 44100
+
+
+class SeekIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='seek-index-test-')
+        self.addCleanup(shutil.rmtree, self.workdir, True)
+
+    def write(self, name, data):
+        path = os.path.join(self.workdir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_mp3_lookup_lands_on_frame_start(self):
+        index = SeekIndex.build(self.write('song.mp3', FRAME * 200))
+        self.assertEqual(index.format, 'mp3')
+        self.assertAlmostEqual(index.duration, 200 * FRAME_SECONDS)
+        offset, position = index.lookup(1.0)
+        self.assertEqual(offset % len(FRAME), 0)
+        self.assertAlmostEqual(position, offset // len(FRAME) * FRAME_SECONDS)
+        self.assertLessEqual(position, 1.0)
+        self.assertGreater(position, 1.0 - FRAME_SECONDS - index.step)
+
+    def test_cache_round_trip(self):
+        path = self.write('song.mp3', FRAME * 50)
+        cache = SeekIndexCache(self.workdir)
+        built = cache.get(path)
+        loaded = SeekIndexCache(self.workdir).get(path)
+        self.assertEqual(list(loaded.offsets), list(built.offsets))
+        self.assertEqual(loaded.total_samples, built.total_samples)
+
+    def test_other_formats_not_indexed(self):
+        for name in ('song.flac', 'song.ogg', 'song.wav'):
+            path = self.write(name, b'fLaC' + b'\x00' * 100)
+            self.assertIsNone(SeekIndex.build(path))
+            self.assertIsNone(SeekIndexCache(self.workdir).get(path))
+
+    def test_offset_stream(self):
+        path = self.write('song.mp3', b'0123456789')
+        stream = OffsetStream(path, 4)
+        self.addCleanup(stream.close)
+        self.assertEqual(stream.read(), b'456789')
+        stream.seek(1)
+        self.assertEqual(stream.tell(), 1)
+        self.assertEqual(stream.read(2), b'56')
+
+
+if __name__ == '__main__':
+    unittest.main()
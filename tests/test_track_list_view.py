@@ -0,0 +1,46 @@
+import random
+import tkinter
+import unittest
+
+from modules.playlist import Playlist
+from modules.track_list_view import VirtualTrackList
+
+SONGS = [f"/music/{name}.mp3" for name in "abcdef"]
+
+
+class VirtualTrackListTest(unittest.TestCase):
+    def setUp(self):
+        try:
+            self.root = tkinter.Tk()
+        except tkinter.TclError as e:
+            self.skipTest(f"无法创建窗口: {e}")
+        self.addCleanup(self.root.destroy)
+        self.playlist = Playlist(SONGS, rng=random.Random(1))
+        self.view = VirtualTrackList(
+            self.root,
+            row_count=lambda: len(self.playlist),
+            get_row=lambda index: (self.playlist[index], "", "", ""),
+            row_key=self.playlist.entry_at,
+            find_row=self.playlist.index_of_entry,
+        )
+
+    def test_selection_follows_row_after_changes(self):
+        self.view.select(2)
+        self.playlist.insert(0, "/music/z.mp3")
+        self.view.refresh()
+        self.assertEqual(self.view.selected_index(), 3)
+
+        self.playlist.sort(key=lambda path: path, reverse=True)
+        self.assertEqual(self.playlist[self.view.selected_index()], SONGS[2])
+
+        self.playlist.remove_where(lambda path: path == SONGS[2])
+        self.assertIsNone(self.view.selected_index())
+
+    def test_select_none_clears_selection(self):
+        self.view.select(1)
+        self.view.select(None)
+        self.assertIsNone(self.view.selected_index())
+
+
+if __name__ == '__main__':
+    unittest.main()
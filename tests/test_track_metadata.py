@@ -0,0 +1,39 @@
+import unittest
+
+from modules.track_store import TrackStore
+from modules.track_metadata import TrackMetadata
+
+
+def info(title, artist, duration):
+    return {'title': title, 'artist': artist, 'album': None, 'duration': duration}
+
+
+class TrackMetadataTest(unittest.TestCase):
+    def test_update_and_get(self):
+        store = TrackStore()
+        store.add("/music/a.mp3")
+        metadata = TrackMetadata(store)
+        self.assertIsNone(metadata.get("/music/a.mp3"))
+        self.assertIsNone(metadata.get("/music/missing.mp3"))
+
+        metadata.update({
+            "/music/a.mp3": info("晴天", "周杰伦", 269.5),
+            "/music/b.mp3": info("夜曲", "周杰伦", None),
+        })
+        self.assertEqual(metadata.get("/music/a.mp3"), ("晴天", "周杰伦", 269.5))
+        self.assertEqual(metadata.get("/music/b.mp3"), ("夜曲", "周杰伦", None))
+        self.assertEqual(len(metadata), 2)
+        # 新路径加入共用的TrackStore，艺术家只保存一次
+        self.assertIn("/music/b.mp3", store)
+        self.assertEqual(len(metadata._artists), 1)
+
+    def test_update_replaces_changed_tags(self):
+        metadata = TrackMetadata()
+        metadata.update({"/music/a.mp3": info("旧标题", "歌手", 100)})
+        metadata.update({"/music/a.mp3": info("新标题", "另一位歌手", 200)})
+        self.assertEqual(metadata.get("/music/a.mp3"), ("新标题", "另一位歌手", 200))
+        self.assertEqual(len(metadata), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
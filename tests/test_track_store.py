@@ -0,0 +1,56 @@
+import os
+import threading
+import unittest
+
+from modules.track_store import TrackStore
+
+
+class TrackStoreTest(unittest.TestCase):
+    def test_add_and_lookup(self):
+        store = TrackStore()
+        paths = [os.path.join(os.sep, "music", f"dir{i % 7}", f"歌曲{i}.mp3") for i in range(1000)]
+        ids = store.add_many(paths)
+        self.assertEqual(ids, list(range(len(paths))))
+        self.assertEqual(store.add(paths[10]), 10)
+        self.assertEqual(list(store.paths(ids)), paths)
+        self.assertEqual([store.lookup(path) for path in paths], ids)
+        self.assertIsNone(store.lookup(os.path.join(os.sep, "music", "missing.mp3")))
+        self.assertEqual(store.name(3), "歌曲3.mp3")
+        self.assertEqual(store.directory(3), os.path.join(os.sep, "music", "dir3") + os.sep)
+
+    def test_paths_round_trip(self):
+        store = TrackStore()
+        for path in ("song.mp3", os.sep + "a.mp3", "dir" + os.sep, "bad\udcff.mp3"):
+            self.assertEqual(store.path(store.add(path)), path)
+
+    def test_lookup_while_growing(self):
+        store = TrackStore()
+        known = [f"/known/{i}.mp3" for i in range(50)]
+        store.add_many(known)
+        errors = []
+        done = threading.Event()
+
+        def read():
+            # 另一个线程扩容哈希表时，已有的路径必须始终能找到
+            try:
+                while not done.is_set():
+                    for track_id, path in enumerate(known):
+                        if store.lookup(path) != track_id:
+                            errors.append(path)
+                            return
+            except Exception as e:
+                errors.append(e)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        try:
+            for i in range(200000):
+                store.add(f"/new/{i}.mp3")
+        finally:
+            done.set()
+            reader.join()
+        self.assertEqual(errors, [])
+
+
+if __name__ == '__main__':
+    unittest.main()